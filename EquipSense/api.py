@@ -0,0 +1,321 @@
+# equipment/api.py
+"""
+JSON API для киосков и мобильных клиентов.
+
+    GET    api/<ресурс>/?fields=id,name&include=tags&limit=50&after=<курсор>
+    POST   api/<ресурс>/
+    GET    api/<ресурс>/<pk>/?fields=...&include=...
+    PATCH  api/<ресурс>/<pk>/
+    DELETE api/<ресурс>/<pk>/
+
+Ресурсы: equipment, categories, tags, requests. Списки листаются
+keyset‑курсорами (pagination.py). ``fields`` сужает SELECT через
+``.only()``, ``include`` подтягивает связи select_related/prefetch, так что
+число запросов списка не зависит от размера страницы. Запись проверяется
+теми же формами, что и HTML‑страницы; заявки создаются через
+services.create_reservation под блокировкой оборудования.
+"""
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, ProtectedError
+from django.forms import modelform_factory
+from django.forms.models import model_to_dict
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .forms import EquipmentCreateUpdateForm, RequestForm
+from .models import Category, Equipment, Request, Tag
+from .pagination import InvalidCursor, KeysetPaginator
+from .roles import in_group
+from .services import ReservationConflict, create_reservation
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _error(message, status):
+    return JsonResponse({'error': message}, status=status)
+
+
+def _form_errors(form):
+    return JsonResponse({'errors': {field: [e['message'] for e in errors]
+                                    for field, errors in form.errors.get_json_data().items()}},
+                        status=400)
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+class Resource:
+    """
+    Описание ресурса API.
+
+    ``fields`` – поля модели, доступные в ``?fields=`` (для FK отдаётся id);
+    ``computed`` – {имя: (функция(queryset) -> queryset, нужные поля)} для
+    вычисляемых полей; ``includes`` – {имя: (поле связи, поля связанной модели)}.
+    """
+
+    def __init__(self, model, fields, default_fields, includes=(), computed=None,
+                 form=None, ordering='pk'):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.includes = dict(includes)
+        self.computed = computed or {}
+        self.form = form
+        self.ordering = ordering
+        self.label = model._meta.model_name
+
+    def permission(self, action):
+        return f'{self.model._meta.app_label}.{action}_{self.label}'
+
+    def queryset(self, request):
+        return self.model.objects.all()
+
+    def parse(self, request):
+        """Поля и связи из ?fields= / ?include=; ValueError при неизвестных."""
+        fields = request.GET.get('fields')
+        fields = fields.split(',') if fields else list(self.default_fields)
+        unknown = [f for f in fields if f not in self.fields and f not in self.computed]
+        includes = [i for i in request.GET.get('include', '').split(',') if i]
+        unknown += [i for i in includes if i not in self.includes]
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(unknown)}")
+        return fields, includes
+
+    def narrow(self, queryset, fields, includes):
+        """SELECT только нужных колонок и связи без запросов на строку."""
+        concrete = {'pk', self.ordering.lstrip('-')} | {f for f in fields if f in self.fields}
+        for name in fields:
+            if name in self.computed:
+                annotate, needs = self.computed[name]
+                queryset = annotate(queryset)
+                concrete |= set(needs)
+        for name in includes:
+            relation, related_fields = self.includes[name]
+            field = self.model._meta.get_field(relation)
+            if field.many_to_many:
+                queryset = queryset.prefetch_related(Prefetch(
+                    relation, queryset=field.related_model.objects.only(*related_fields)))
+            else:
+                queryset = queryset.select_related(relation)
+                concrete |= {relation} | {f'{relation}__{f}' for f in related_fields}
+        return queryset.only(*concrete)
+
+    def serialize(self, obj, fields, includes):
+        data = {}
+        for name in fields:
+            if name in self.fields:
+                field = self.model._meta.get_field(name)
+                data[name] = _json_value(getattr(obj, field.attname))
+            else:
+                data[name] = getattr(obj, name)
+        for name in includes:
+            relation, related_fields = self.includes[name]
+            value = getattr(obj, relation)
+            if self.model._meta.get_field(relation).many_to_many:
+                data[name] = [{f: _json_value(getattr(o, f)) for f in related_fields}
+                              for o in value.all()]
+            else:
+                data[name] = (None if value is None else
+                              {f: _json_value(getattr(value, f)) for f in related_fields})
+        return data
+
+    # ---------------------------- запись ----------------------------
+
+    def create(self, request, data):
+        if not request.user.has_perm(self.permission('add')):
+            return _error('Недостаточно прав', 403)
+        # Незаданные поля – значения по умолчанию модели, как в HTML‑форме
+        defaults = {name: field.initial for name, field in self.form.base_fields.items()
+                    if field.initial is not None}
+        form = self.form(data={**defaults, **data})
+        if not form.is_valid():
+            return _form_errors(form)
+        return form.save()
+
+    def update(self, request, obj, data):
+        if not request.user.has_perm(self.permission('change')):
+            return _error('Недостаточно прав', 403)
+        # PATCH: недостающие поля берутся из текущего объекта
+        current = model_to_dict(obj, fields=self.form._meta.fields)
+        current = {name: [o.pk for o in value] if isinstance(value, list) else value
+                   for name, value in current.items()}
+        form = self.form(data={**current, **data}, instance=obj)
+        if not form.is_valid():
+            return _form_errors(form)
+        return form.save()
+
+    def delete(self, request, obj):
+        if not request.user.has_perm(self.permission('delete')):
+            return _error('Недостаточно прав', 403)
+        try:
+            obj.delete()
+        except ProtectedError:
+            # Request.equipment – PROTECT: история заявок не удаляется молча
+            return _error('Нельзя удалить: на объект ссылаются заявки', 409)
+
+
+def _with_quantity_available(queryset):
+    return queryset.with_availability().select_related(None).prefetch_related(None)
+
+
+class RequestResource(Resource):
+    def queryset(self, request):
+        qs = Request.objects.all()
+        if not in_group(request.user, 'manager', 'administrator'):
+            qs = qs.filter(user=request.user)
+        return qs
+
+    def create(self, request, data):
+        form = self.form(data=data)
+        if not form.is_valid():
+            return _form_errors(form)
+        cleaned = form.cleaned_data
+        try:
+            return create_reservation(request.user, cleaned['equipment'], cleaned['quantity'],
+                                      cleaned['start_dt'], cleaned['end_dt'],
+                                      cleaned.get('comment'))
+        except ValidationError as exc:
+            return JsonResponse({'errors': {'__all__': exc.messages}}, status=400)
+        except ReservationConflict:
+            return _error('Сервер занят, попробуйте ещё раз.', 409)
+
+    def update(self, request, obj, data):
+        return _error('Заявки меняются через одобрение/отклонение', 405)
+
+    def delete(self, request, obj):
+        # Как и cancel_request: отменить можно только свою заявку в ожидании
+        if obj.user_id != request.user.pk or obj.status != Request.Status.PENDING:
+            return _error('Отменить можно только свою заявку в ожидании', 409)
+        obj.delete()
+
+
+EQUIPMENT = Resource(
+    Equipment,
+    fields=('id', 'name', 'description', 'serial_number', 'model', 'category', 'location',
+            'status', 'quantity_total', 'photo_url', 'purchase_date', 'warranty_expiry',
+            'maintenance_interval_days', 'next_maintenance_due', 'updated_at'),
+    default_fields=('id', 'name', 'category', 'status', 'quantity_total'),
+    includes={'category': ('category', ('id', 'name')), 'tags': ('tags', ('id', 'name'))},
+    computed={'quantity_available': (_with_quantity_available, ('quantity_total',))},
+    form=EquipmentCreateUpdateForm,
+    ordering='name',
+)
+CATEGORIES = Resource(Category, fields=('id', 'name'), default_fields=('id', 'name'),
+                      form=modelform_factory(Category, fields=['name']), ordering='name')
+TAGS = Resource(Tag, fields=('id', 'name'), default_fields=('id', 'name'),
+                form=modelform_factory(Tag, fields=['name']), ordering='name')
+REQUESTS = RequestResource(
+    Request,
+    fields=('id', 'user', 'equipment', 'quantity', 'status', 'start_dt', 'end_dt',
+            'comment', 'created_at', 'updated_at'),
+    default_fields=('id', 'equipment', 'quantity', 'status', 'start_dt', 'end_dt'),
+    includes={'equipment': ('equipment', ('id', 'name')),
+              'user': ('user', ('id', 'username'))},
+    form=RequestForm,
+    ordering='-created_at',
+)
+
+
+# ----------------------------------------------------------------------
+# Представления
+# ----------------------------------------------------------------------
+
+def _api_view(view):
+    """Аутентификация сессией с ответом 401 вместо редиректа на логин."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Требуется вход', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        raise ValueError('Ожидается JSON‑объект')
+    return data
+
+
+def _collection(resource):
+    @_api_view
+    def view(request):
+        if request.method == 'POST':
+            try:
+                data = _body(request)
+            except ValueError as exc:
+                return _error(str(exc), 400)
+            result = resource.create(request, data)
+            if isinstance(result, JsonResponse):
+                return result
+            return JsonResponse(resource.serialize(result, resource.default_fields, ()),
+                                status=201)
+        if request.method != 'GET':
+            return _error('Метод не поддерживается', 405)
+
+        try:
+            fields, includes = resource.parse(request)
+            limit = min(max(int(request.GET.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError as exc:
+            return _error(str(exc), 400)
+        queryset = resource.narrow(resource.queryset(request), fields, includes)
+        paginator = KeysetPaginator(queryset, resource.ordering, limit)
+        try:
+            page = paginator.page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+        except InvalidCursor:
+            return _error('Неверный курсор', 400)
+        return JsonResponse({
+            'results': [resource.serialize(obj, fields, includes) for obj in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+    view.__name__ = f'{resource.label}_collection'
+    return view
+
+
+def _item(resource):
+    @_api_view
+    def view(request, pk):
+        if request.method == 'GET':
+            try:
+                fields, includes = resource.parse(request)
+            except ValueError as exc:
+                return _error(str(exc), 400)
+            obj = get_object_or_404(
+                resource.narrow(resource.queryset(request), fields, includes), pk=pk)
+            return JsonResponse(resource.serialize(obj, fields, includes))
+
+        obj = get_object_or_404(resource.queryset(request), pk=pk)
+        if request.method == 'PATCH':
+            try:
+                data = _body(request)
+            except ValueError as exc:
+                return _error(str(exc), 400)
+            result = resource.update(request, obj, data)
+            if isinstance(result, JsonResponse):
+                return result
+            return JsonResponse(resource.serialize(result, resource.default_fields, ()))
+        if request.method == 'DELETE':
+            return resource.delete(request, obj) or HttpResponse(status=204)
+        return _error('Метод не поддерживается', 405)
+    view.__name__ = f'{resource.label}_item'
+    return view
+
+
+equipment_collection = _collection(EQUIPMENT)
+equipment_item = _item(EQUIPMENT)
+category_collection = _collection(CATEGORIES)
+category_item = _item(CATEGORIES)
+tag_collection = _collection(TAGS)
+tag_item = _item(TAGS)
+request_collection = _collection(REQUESTS)
+request_item = _item(REQUESTS)
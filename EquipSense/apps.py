@@ -1,6 +1,43 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class EquipsenseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'EquipSense'
+
+    def ready(self):
+        from . import signals  # noqa: F401  регистрация обработчиков
+        from .db import connect_signals
+        connect_signals()
+        post_migrate.connect(create_search_index, sender=self)
+        post_migrate.connect(reconcile_counters, sender=self)
+
+
+def create_search_index(using, **kwargs):
+    """Таблица полнотекстового индекса создаётся вне миграций (FTS5/tsvector)."""
+    from .search import create_index_table
+    create_index_table(using)
+
+
+def reconcile_counters(sender, using, **kwargs):
+    """
+    После миграций счётчики дашбордов приводятся к фактическим значениям
+    в той же БД. Пропускается для чужих приложений и пока таблиц счётчиков,
+    оборудования, заявок и пользователей нет (откат миграций, частичный
+    migrate, БД без этих моделей по роутеру).
+    """
+    from django.contrib.auth.models import User
+    from django.db import connections, router
+
+    from .counters import reconcile
+    from .models import Counter, Equipment, Request
+
+    if sender.name != EquipsenseConfig.name:
+        return
+    models = (Counter, Equipment, Request, User)
+    if not all(router.allow_migrate_model(using, model) for model in models):
+        return
+    tables = set(connections[using].introspection.table_names())
+    if all(model._meta.db_table in tables for model in models):
+        reconcile(using)
@@ -0,0 +1,149 @@
+# equipment/async_views.py
+"""
+Асинхронные версии «читающих» страниц для запуска под ASGI (asgi.py).
+
+Пока идёт запрос к БД, воркер не занят: данные читаются async ORM, а
+независимые запросы (счётчики и списки дашбордов, валидатор условного
+GET) запускаются вместе через ``asyncio.gather``. Шаблоны и
+контекст‑процессоры читают ``request.user`` и роли синхронно, поэтому
+пользователь и его роли загружаются заранее (:func:`_user`). Всё, что
+по‑прежнему требует синхронного ORM (рендер фрагментов с тегами, форма
+заявки со списком оборудования, создание заявки под блокировкой),
+выполняется через ``sync_to_async``.
+
+Маршруты подключаются вместо синхронных при EQUIPSENSE_ASYNC_VIEWS
+(см. urls.py и settings.py).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.shortcuts import render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.vary import vary_on_cookie
+
+from . import conditional, counters, fragments, roles, views
+from .forms import RequestForm
+from .models import Equipment, Request
+from .pagination import InvalidCursor
+from .roles import in_group
+
+
+async def _user(request):
+    """
+    Пользователь запроса с загруженными ролями. Подменяет ленивый
+    ``request.user``, чтобы шаблоны не обращались к БД из цикла событий.
+    """
+    user = await request.auser()
+    await roles.aresolve(user)
+    request.user = user
+    return user
+
+
+async def _keyset_page(request, paginator):
+    try:
+        return await paginator.apage(after=request.GET.get('after'),
+                                     before=request.GET.get('before'))
+    except InvalidCursor:
+        return await paginator.apage()
+
+
+async def _list(queryset):
+    return [obj async for obj in queryset]
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@conditional.async_condition(conditional.acatalogue_state)
+async def equip_list(request):
+    await _user(request)
+    page = await _keyset_page(request, views.equip_list_paginator(request))
+    cards = await sync_to_async(fragments.equipment_cards)(page.object_list)
+    return render(request, 'equipment/equip_list.html', views.equip_list_context(page, cards))
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@conditional.async_condition(conditional.aequipment_state)
+async def equip_detail(request, pk):
+    if request.method not in ('GET', 'HEAD'):
+        # Создание заявки – транзакция с блокировкой строки, остаётся синхронным
+        return await sync_to_async(views.equip_detail)(request, pk=pk)
+
+    user = await _user(request)
+
+    async def get_equipment():
+        try:
+            return await (Equipment.objects.with_availability().prefetch_related(None)
+                          .aget(pk=pk))
+        except Equipment.DoesNotExist:
+            raise Http404("Оборудование не найдено")
+
+    equipment, user_requests = await asyncio.gather(
+        get_equipment(),
+        _list(Request.objects.filter(user=user, equipment_id=pk).order_by('-created_at')),
+    )
+    panel = await sync_to_async(fragments.equipment_panel)(equipment)
+    # Выпадающий список формы читает оборудование при рендеринге – в потоке
+    return await sync_to_async(render)(request, 'equipment/equip_detail.html', {
+        'equipment': equipment,
+        'panel': panel,
+        'form': RequestForm(initial={'equipment': equipment}),
+        'user_requests': user_requests,
+    })
+
+
+@login_required
+async def my_requests(request):
+    """Страница «Мои одобренные запросы»."""
+    user = await _user(request)
+    approved = await _list(Request.objects
+                           .filter(user=user,
+                                   status__in=[Request.Status.APPROVED, Request.Status.IN_USE])
+                           .select_related('equipment', 'user'))
+    return render(request, 'equipment/my_requests.html', {'requests': approved})
+
+
+@login_required
+@permission_required('auth.view_user')
+async def admin_dashboard(request):
+    await _user(request)
+    values, managers = await asyncio.gather(
+        counters.aget_many([counters.EQUIPMENT, counters.USERS,
+                            counters.request_key(Request.Status.PENDING)]),
+        _list(User.objects.filter(groups__name='manager').order_by('first_name', 'last_name')),
+    )
+    return render(request, 'equipment/admin_dashboard.html', {
+        'equipment_count': values[counters.EQUIPMENT],
+        'user_count': values[counters.USERS],
+        'pending_requests_count': values[counters.request_key(Request.Status.PENDING)],
+        'managers': managers,
+    })
+
+
+@login_required
+async def manager_dashboard(request):
+    user = await _user(request)
+    pending, approved = (counters.request_key(Request.Status.PENDING),
+                         counters.request_key(Request.Status.APPROVED))
+    values, pending_requests = await asyncio.gather(
+        counters.aget_many([pending, approved]),
+        _list(Request.objects.filter(status='P').select_related('user', 'equipment')),
+    )
+    return render(request, 'equipment/manager_dashboard.html', {
+        'user': user,
+        'pending_count': values[pending],
+        'approved_count': values[approved],
+        'pending_requests': pending_requests,
+    })
+
+
+@login_required
+@user_passes_test(lambda u: in_group(u, 'employee'))
+async def employee_dashboard(request):
+    await _user(request)
+    return render(request, 'equipment/employee_dashboard.html')
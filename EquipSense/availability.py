@@ -0,0 +1,241 @@
+# equipment/availability.py
+"""
+Расчёт занятости оборудования по временным окнам.
+
+Одобренная заявка занимает единицы оборудования на интервале
+[start_dt, end_dt), выданная (IN_USE) – с start_dt до возврата, даже если
+срок уже прошёл (как в :meth:`Request.occupied_at`). Пиковая занятость в
+окне считается «заметающей прямой» по пересекающимся с окном заявкам,
+которые выбираются одним запросом по индексу уникальности
+(equipment, start_dt, end_dt).
+
+Если окно занято, :func:`nearest_free_windows` предлагает ближайшие окна
+той же длины, а :func:`free_alternatives` – свободное на этом окне
+оборудование той же категории.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Equipment, Request
+
+# Оборудование в этих статусах не предлагается взамен
+UNAVAILABLE_EQUIPMENT = ('maintenance', 'lost', 'retired')
+# Насколько далеко от запрошенного окна искать свободные окна
+SUGGEST_HORIZON = timedelta(days=14)
+
+
+def sweep_peak(intervals, start, end):
+    """
+    Максимальное число одновременно занятых единиц в окне [start, end).
+
+    ``intervals`` – итерируемое из (start_dt, end_dt, quantity).
+    Интервалы полуоткрытые: заявка, закончившаяся ровно в момент начала
+    другой, с ней не пересекается.
+    """
+    events = []
+    for i_start, i_end, qty in intervals:
+        lo, hi = max(i_start, start), min(i_end, end)
+        if lo < hi:
+            events.append((lo, qty))
+            events.append((hi, -qty))
+    # При равном времени сначала освобождаем (-qty), потом занимаем
+    events.sort(key=lambda ev: (ev[0], ev[1]))
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def occupancy_segments(intervals, start, end):
+    """
+    Занятость в окне [start, end) в виде отрезков (начало, конец, единиц),
+    соседние отрезки с одинаковой занятостью склеиваются, свободные – опускаются.
+    """
+    deltas = defaultdict(int)
+    for i_start, i_end, qty in intervals:
+        lo, hi = max(i_start, start), min(i_end, end)
+        if lo < hi:
+            deltas[lo] += qty
+            deltas[hi] -= qty
+    segments = []
+    current, previous = 0, None
+    for moment in sorted(deltas):
+        if current > 0 and previous < moment:
+            merge_segment(segments, (previous, moment, current))
+        current += deltas[moment]
+        previous = moment
+    return segments
+
+
+def merge_segment(segments, segment):
+    """Добавить отрезок, склеив его с последним при совпадении занятости."""
+    if segments and segments[-1][1] == segment[0] and segments[-1][2] == segment[2]:
+        segments[-1] = (segments[-1][0], segment[1], segment[2])
+    else:
+        segments.append(segment)
+
+
+def _overlapping(start, end):
+    return Q(start_dt__lt=end) & (Q(status=Request.Status.IN_USE)
+                                  | Q(status=Request.Status.APPROVED, end_dt__gt=start))
+
+
+def _occupied(i_start, i_end, status, end):
+    """Конец занятости: выданная заявка не освобождается раньше конца окна."""
+    if status == Request.Status.IN_USE:
+        i_end = max(i_end, end)
+    return i_start, i_end
+
+
+def peak_booked(equipment_id, start, end, exclude_pk=None):
+    """Пиковое количество занятых единиц оборудования в окне [start, end)."""
+    qs = Request.objects.filter(_overlapping(start, end), equipment_id=equipment_id)
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    rows = qs.order_by().values_list('start_dt', 'end_dt', 'status', 'quantity')
+    return sweep_peak([(*_occupied(i_start, i_end, status, end), qty)
+                       for i_start, i_end, status, qty in rows], start, end)
+
+
+def peak_booked_many(windows):
+    """
+    Пакетный вариант :func:`peak_booked`.
+
+    ``windows`` – последовательность (equipment_id, start, end).
+    Все пересекающиеся заявки выбираются одним запросом, результат –
+    словарь {(equipment_id, start, end): пиковая занятость}.
+    """
+    windows = list(windows)
+    if not windows:
+        return {}
+    by_equipment = booked_intervals(windows)
+    return {
+        (equipment_id, start, end): sweep_peak(by_equipment[equipment_id], start, end)
+        for equipment_id, start, end in windows
+    }
+
+
+def booked_intervals(windows):
+    """
+    Занятые интервалы, пересекающиеся с окнами ``windows``
+    ((equipment_id, start, end)), одним запросом.
+    Результат – {equipment_id: [(start_dt, end_dt, quantity), ...]}.
+
+    Условие запроса не зависит от числа окон: оборудование – одним IN,
+    время – одним диапазоном от самого раннего начала до самого позднего
+    конца. Лишние интервалы между окнами отсекает заметающая прямая.
+    """
+    windows = list(windows)
+    if not windows:
+        return defaultdict(list)
+    return booked_in_range({equipment_id for equipment_id, _, _ in windows},
+                           min(start for _, start, _ in windows),
+                           max(end for _, _, end in windows))
+
+
+def booked_in_range(equipment_ids, start, end):
+    """
+    Занятые интервалы оборудования ``equipment_ids``, пересекающиеся с
+    [start, end): {equipment_id: [(start_dt, end_dt, quantity), ...]}.
+    """
+    by_equipment = defaultdict(list)
+    rows = (Request.objects.filter(_overlapping(start, end), equipment_id__in=list(equipment_ids))
+            .order_by().values_list('equipment_id', 'start_dt', 'end_dt', 'status', 'quantity'))
+    for equipment_id, i_start, i_end, status, qty in rows:
+        by_equipment[equipment_id].append((*_occupied(i_start, i_end, status, end), qty))
+    return by_equipment
+
+
+def available_quantity(equipment, start, end, exclude_pk=None):
+    """Сколько единиц ``equipment`` свободно на всём окне [start, end)."""
+    return equipment.quantity_total - peak_booked(equipment.pk, start, end, exclude_pk)
+
+
+def free_stretches(intervals, limit, start, end):
+    """
+    Отрезки [a, b) внутри [start, end), где занято не больше ``limit``
+    единиц, в порядке времени. Один проход по отрезкам занятости.
+    """
+    stretches = []
+    cursor = start
+    for seg_start, seg_end, units in occupancy_segments(intervals, start, end):
+        if units > limit:
+            if cursor < seg_start:
+                stretches.append((cursor, seg_start))
+            cursor = max(cursor, seg_end)
+    if cursor < end:
+        stretches.append((cursor, end))
+    return stretches
+
+
+def _placements(stretch, start, duration, k):
+    """
+    До ``k`` непересекающихся окон длины ``duration`` в отрезке ``stretch``
+    в каждую сторону от самого близкого к ``start``.
+    """
+    a, b = stretch
+    latest = b - duration
+    if latest < a:
+        return []
+    closest = min(max(start, a), latest)
+    result = [closest]
+    for n in range(1, k):
+        if closest - n * duration >= a:
+            result.append(closest - n * duration)
+        if closest + n * duration <= latest:
+            result.append(closest + n * duration)
+    return result
+
+
+def nearest_free_windows(equipment, quantity, start, end, k=3,
+                         horizon=SUGGEST_HORIZON, now=None):
+    """
+    ``k`` ближайших к [start, end) окон той же длины, в которых свободно
+    не меньше ``quantity`` единиц ``equipment``: [(начало, конец), ...]
+    по удалённости от ``start``. Занятость на [start − horizon,
+    end + horizon] загружается одним запросом, окна ищутся в прошлом не
+    раньше текущей минуты.
+    """
+    limit = equipment.quantity_total - quantity
+    duration = end - start
+    now = now or timezone.now()
+    lower = max(start - horizon, now.replace(second=0, microsecond=0) + timedelta(minutes=1))
+    upper = end + horizon
+    if limit < 0 or duration <= timedelta(0) or upper - lower < duration:
+        return []
+
+    intervals = booked_intervals([(equipment.pk, lower, upper)])[equipment.pk]
+    candidates = [moment
+                  for stretch in free_stretches(intervals, limit, lower, upper)
+                  for moment in _placements(stretch, start, duration, k)]
+    candidates.sort(key=lambda moment: (abs(moment - start), moment))
+    return [(moment, moment + duration) for moment in candidates[:k]]
+
+
+def peak_booked_in(equipment_ids, start, end):
+    """{equipment_id: пиковая занятость} на одном окне [start, end) одним запросом."""
+    return {equipment_id: sweep_peak(intervals, start, end)
+            for equipment_id, intervals in booked_in_range(equipment_ids, start, end).items()}
+
+
+def free_alternatives(equipment, quantity, start, end, limit=5):
+    """
+    Оборудование той же категории, где на [start, end) свободно не меньше
+    ``quantity`` единиц: [(оборудование, свободно), ...] по названию.
+    Занятость всех кандидатов считается одним запросом.
+    """
+    if equipment.category_id is None:
+        return []
+    candidates = list(Equipment.objects
+                      .filter(category_id=equipment.category_id, quantity_total__gte=quantity)
+                      .exclude(pk=equipment.pk)
+                      .exclude(status__in=UNAVAILABLE_EQUIPMENT)
+                      .order_by('name', 'pk'))
+    peaks = peak_booked_in([candidate.pk for candidate in candidates], start, end)
+    free = [(candidate, candidate.quantity_total - peaks.get(candidate.pk, 0))
+            for candidate in candidates]
+    return [(candidate, units) for candidate, units in free if units >= quantity][:limit]
@@ -0,0 +1,31 @@
+# equipment/caching.py
+"""
+Общий ли кэш Django у всех процессов приложения.
+
+Роли (roles.py) сбрасываются сигналами, а сигнал срабатывает только в
+процессе, который сделал изменение. Если кэш у каждого процесса свой
+(LocMemCache – значение по умолчанию, когда CACHES не задан), остальные
+воркеры gunicorn и экземпляры serverless‑функции продолжали бы читать
+старые записи до истечения срока. Такие кэши считаются локальными, и
+роли в них между запросами не хранятся. Общий кэш задаётся
+CACHE_BACKEND/CACHE_LOCATION (settings.py). Шкала занятости (timeline.py)
+от этого не зависит: версию её кэша даёт БД.
+"""
+from django.conf import settings
+
+LOCAL_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+def is_shared(alias='default'):
+    """
+    True, если кэш ``alias`` виден всем процессам. EQUIPSENSE_SHARED_CACHE
+    (True/False) перекрывает определение по бэкенду.
+    """
+    forced = getattr(settings, 'EQUIPSENSE_SHARED_CACHE', None)
+    if forced is not None:
+        return forced
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_BACKENDS
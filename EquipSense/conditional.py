@@ -0,0 +1,231 @@
+# equipment/conditional.py
+"""
+Условные GET (ETag / Last-Modified) для каталога и карточки оборудования.
+
+Валидатор считается до рендеринга запросами, число и стоимость которых
+не зависят от размера каталога:
+
+* оборудование – число и MAX(updated_at); updated_at сдвигается и при
+  изменении тегов/категории (см. signals.py);
+* заявки – число, MAX(updated_at) и последняя уже наступившая граница окна
+  одобренной заявки. Свободное количество меняется со временем само по
+  себе, когда окно начинается или заканчивается, – граница это учитывает.
+
+Для всего каталога числа берутся из строк Counter (counters.py), а каждый
+MAX – отдельным запросом по своему индексу (updated_at, (status, start_dt),
+(status, end_dt)): один запрос с COUNT и несколькими MAX с FILTER читал
+бы всю таблицу заявок на каждый показ. Для одной карточки агрегаты
+считаются по индексу оборудования, как раньше.
+
+Страницы персональные (роль, собственные заявки), поэтому в ETag входят
+пользователь и его роль, а также текущая дата (отметка «в гарантии»).
+В страницах есть формы с ``{% csrf_token %}``, поэтому в ETag входят и
+секрет CSRF, и ключ сессии: после выхода и входа ``rotate_token`` меняет
+секрет, и закэшированная страница со старым токеном не должна получить
+304. Пока есть непоказанные ``messages``, валидатора нет вовсе –
+страница рендерится заново.
+"""
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import Count, Max, Q
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import counters
+from .models import Equipment, Request
+from .roles import aresolve, get_role
+
+
+def _equipment_aggregates():
+    return {'equipment': Count('pk'), 'equipment_changed': Max('updated_at')}
+
+
+def _request_aggregates(now):
+    approved = Q(status=Request.Status.APPROVED)
+    return {
+        'requests': Count('pk'),
+        'requests_changed': Max('updated_at'),
+        'window_started': Max('start_dt', filter=approved & Q(start_dt__lte=now)),
+        'window_ended': Max('end_dt', filter=approved & Q(end_dt__lte=now)),
+    }
+
+
+_COUNTER_NAMES = [counters.EQUIPMENT] + [counters.request_key(status)
+                                         for status in Request.Status.values]
+
+
+def _catalogue_maxima(now):
+    """{имя: (queryset, поле)} – по одному индексному MAX на значение."""
+    approved = Request.objects.filter(status=Request.Status.APPROVED)
+    return {
+        'equipment_changed': (Equipment.objects.all(), 'updated_at'),
+        'requests_changed': (Request.objects.all(), 'updated_at'),
+        'window_started': (approved.filter(start_dt__lte=now), 'start_dt'),
+        'window_ended': (approved.filter(end_dt__lte=now), 'end_dt'),
+    }
+
+
+def _catalogue_counts(values):
+    return {'equipment': values[counters.EQUIPMENT],
+            'requests': sum(values[name] for name in _COUNTER_NAMES[1:])}
+
+
+def _load_catalogue():
+    state = _catalogue_counts(counters.get_many(_COUNTER_NAMES))
+    for name, (queryset, field) in _catalogue_maxima(timezone.now()).items():
+        state[name] = queryset.order_by().aggregate(value=Max(field))['value']
+    return state
+
+
+def _load_equipment(pk):
+    state = Equipment.objects.filter(pk=pk).order_by().aggregate(**_equipment_aggregates())
+    state.update(Request.objects.filter(equipment_id=pk).order_by()
+                 .aggregate(**_request_aggregates(timezone.now())))
+    return state
+
+
+def _state(request, key, load, *args):
+    """Состояние для валидатора; считается один раз на запрос."""
+    memo = request.__dict__.setdefault('_equipsense_conditional', {})
+    if key not in memo:
+        memo[key] = load(*args)
+    return memo[key]
+
+
+async def _aload_catalogue():
+    maxima = _catalogue_maxima(timezone.now())
+    values, *latest = await asyncio.gather(
+        counters.aget_many(_COUNTER_NAMES),
+        *(queryset.order_by().aaggregate(value=Max(field))
+          for queryset, field in maxima.values()),
+    )
+    state = _catalogue_counts(values)
+    state.update((name, row['value']) for name, row in zip(maxima, latest))
+    return state
+
+
+async def _aload_equipment(pk):
+    state, request_state = await asyncio.gather(
+        Equipment.objects.filter(pk=pk).order_by().aaggregate(**_equipment_aggregates()),
+        Request.objects.filter(equipment_id=pk).order_by()
+        .aaggregate(**_request_aggregates(timezone.now())),
+    )
+    state.update(request_state)
+    return state
+
+
+def _last_modified(state):
+    moments = [state[name] for name in ('equipment_changed', 'requests_changed',
+                                        'window_started', 'window_ended')
+               if state[name] is not None]
+    return max(moments) if moments else None
+
+
+def _client_parts(request):
+    """
+    Части ETag, привязанные к браузеру: секрет CSRF и ключ сессии.
+    None – есть непоказанные сообщения, условный ответ недопустим.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    # get_token заводит секрет, если cookie ещё нет: тот же секрет попадёт
+    # и в страницу, и в Set-Cookie ответа
+    get_token(request)
+    session = getattr(request, 'session', None)
+    return [request.META.get('CSRF_COOKIE'), session.session_key if session else None]
+
+
+def _etag(user, client, state):
+    parts = [user.pk, get_role(user), timezone.localdate().isoformat()] + client
+    parts += [state[name] for name in sorted(state)]
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _catalogue_state(request):
+    return _state(request, 'catalogue', _load_catalogue)
+
+
+def _equipment_state(request, pk):
+    state = _state(request, ('equipment', pk), _load_equipment, pk)
+    return state if state['equipment'] else None
+
+
+def _conditional(request):
+    return request.method in ('GET', 'HEAD') and _client_parts(request) is not None
+
+
+def catalogue_etag(request, *args, **kwargs):
+    if _conditional(request):
+        return _etag(request.user, _client_parts(request), _catalogue_state(request))
+
+
+def catalogue_last_modified(request, *args, **kwargs):
+    if _conditional(request):
+        return _last_modified(_catalogue_state(request))
+
+
+def equipment_etag(request, pk):
+    if _conditional(request):
+        state = _equipment_state(request, pk)
+        return _etag(request.user, _client_parts(request), state) if state else None
+
+
+def equipment_last_modified(request, pk):
+    if _conditional(request):
+        state = _equipment_state(request, pk)
+        return _last_modified(state) if state else None
+
+
+# ----------------------------------------------------------------------
+# Асинхронные представления (async_views.py)
+# ----------------------------------------------------------------------
+
+async def acatalogue_state(request):
+    return await _aload_catalogue()
+
+
+async def aequipment_state(request, pk):
+    state = await _aload_equipment(pk)
+    return state if state['equipment'] else None
+
+
+def async_condition(load_state):
+    """
+    ``condition`` для async‑представлений. Штатный декоратор вызывает
+    функции валидатора синхронно прямо в цикле событий, поэтому состояние
+    здесь считается async ORM: ``load_state(request, *args, **kwargs)``.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            state = await load_state(request, *args, **kwargs)
+            if state is None:
+                return await view(request, *args, **kwargs)
+
+            user = await request.auser()
+            await aresolve(user)
+            # Хранилище сообщений может читать сессию синхронным API
+            client = await sync_to_async(_client_parts)(request)
+            if client is None:
+                return await view(request, *args, **kwargs)
+            etag = quote_etag(_etag(user, client, state))
+            last_modified = _last_modified(state)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag,
+                                                last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if last_modified and not response.has_header('Last-Modified'):
+                response.headers['Last-Modified'] = http_date(last_modified)
+            response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,94 @@
+# equipment/counters.py
+"""
+Счётчики для дашбордов.
+
+Вместо COUNT(*) на каждый показ дашборда значения хранятся в таблице
+Counter и сдвигаются сигналами при создании/удалении оборудования,
+пользователей и заявок, а также при смене статуса заявки. Массовые
+UPDATE в обход save() должны сами вызвать :func:`adjust`.
+Команда ``reconcile_counters`` пересчитывает всё с нуля.
+
+Сдвиг выполняется в транзакции изменённой строки: save()/delete()
+оборудования и заявок атомарны вместе с сигналами, пользователи создаются
+и удаляются в ``transaction.atomic`` (представления приложения, админка).
+"""
+from collections import Counter as Tally
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Counter, Equipment, Request
+
+EQUIPMENT = 'equipment'
+USERS = 'users'
+
+
+def request_key(status):
+    return f'requests.{status}'
+
+
+def adjust(deltas, using=None):
+    """
+    Сдвинуть счётчики: ``deltas`` – {имя: приращение}.
+
+    UPDATE блокирует строку счётчика до конца транзакции. Отсутствующая
+    строка создаётся через get_or_create: при гонке двух первых сдвигов
+    проигравший получает IntegrityError внутри своей точки сохранения,
+    читает созданную строку и сдвигает её. Имена обходятся по порядку,
+    чтобы параллельные транзакции блокировали строки в одном порядке.
+    """
+    counters = Counter.objects.db_manager(using)
+    with transaction.atomic(using=counters.db):
+        for name, delta in sorted(deltas.items()):
+            if not delta:
+                continue
+            if counters.filter(name=name).update(value=F('value') + delta):
+                continue
+            _, created = counters.get_or_create(name=name, defaults={'value': delta})
+            if not created:
+                counters.filter(name=name).update(value=F('value') + delta)
+
+
+def get_many(names):
+    """Значения счётчиков одним запросом (отсутствующие – 0)."""
+    values = dict(Counter.objects.filter(name__in=names).values_list('name', 'value'))
+    return {name: values.get(name, 0) for name in names}
+
+
+async def aget_many(names):
+    """Асинхронный :func:`get_many`."""
+    values = {name: value async for name, value in
+              Counter.objects.filter(name__in=names).values_list('name', 'value')}
+    return {name: values.get(name, 0) for name in names}
+
+
+def request_status_deltas(statuses_before, status_after):
+    """Приращения при переводе заявок со статусами ``statuses_before`` в ``status_after``."""
+    deltas = Tally()
+    for status in statuses_before:
+        deltas[request_key(status)] -= 1
+        deltas[request_key(status_after)] += 1
+    return deltas
+
+
+def compute(using=None):
+    """Фактические значения всех счётчиков."""
+    values = {EQUIPMENT: Equipment.objects.db_manager(using).count(),
+              USERS: User.objects.db_manager(using).count()}
+    values.update({request_key(status): 0 for status in Request.Status.values})
+    by_status = (Request.objects.db_manager(using).order_by()
+                 .values_list('status').annotate(n=Count('pk')))
+    values.update({request_key(status): n for status, n in by_status})
+    return values
+
+
+def reconcile(using=None):
+    """Пересчитать счётчики с нуля. Возвращает {имя: (было, стало)} для изменённых."""
+    counters = Counter.objects.db_manager(using)
+    actual = compute(counters.db)
+    stored = dict(counters.filter(name__in=list(actual)).values_list('name', 'value'))
+    for name, value in actual.items():
+        counters.update_or_create(name=name, defaults={'value': value})
+    return {name: (stored.get(name, 0), value) for name, value in actual.items()
+            if stored.get(name, 0) != value}
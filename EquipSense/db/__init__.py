@@ -0,0 +1,118 @@
+# equipment/db/__init__.py
+"""
+Учёт соединений с БД.
+
+Бэкенды ``EquipSense.db.postgresql`` и ``EquipSense.db.sqlite3`` – это
+штатные бэкенды Django с замером установки соединения. Для постоянных
+соединений (CONN_MAX_AGE) это TCP+TLS+аутентификация, для пула psycopg
+(OPTIONS['pool']) – ожидание свободного соединения в пуле.
+
+Счётчики общие на процесс (:data:`stats`):
+
+* ``requests`` / ``reused`` – HTTP‑запросы и те из них, что начались на
+  уже открытом соединении (переиспользование);
+* ``connects``, ``connect_ms`` и ``max_connect_ms`` – новые соединения
+  (или выдачи из пула) и время на них.
+
+Снимок со статистикой пула отдаёт :func:`snapshot` (представление
+``db_metrics``); время соединения в рамках запроса попадает и в
+Server-Timing (см. middleware.py).
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.core.signals import request_started
+from django.db import connections
+
+_connect_time = ContextVar('equipsense_connect_time', default=None)
+
+
+class ConnectionStats:
+    FIELDS = ('requests', 'reused', 'connects', 'connect_ms', 'max_connect_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                self._values[name] += value
+
+    def connected(self, ms):
+        with self._lock:
+            self._values['connects'] += 1
+            self._values['connect_ms'] += ms
+            self._values['max_connect_ms'] = max(self._values['max_connect_ms'], ms)
+
+    def as_dict(self):
+        with self._lock:
+            values = dict(self._values)
+        values['connect_ms'] = round(values['connect_ms'], 2)
+        values['max_connect_ms'] = round(values['max_connect_ms'], 2)
+        values['avg_connect_ms'] = (round(values['connect_ms'] / values['connects'], 2)
+                                    if values['connects'] else 0.0)
+        values['reuse_ratio'] = (round(values['reused'] / values['requests'], 3)
+                                 if values['requests'] else 0.0)
+        return values
+
+
+stats = ConnectionStats()
+
+
+class MeasuredConnectionMixin:
+    """Замер ``get_new_connection`` (соединение с нуля или выдача из пула)."""
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            stats.connected(elapsed)
+            request_connects = _connect_time.get()
+            if request_connects is not None:
+                request_connects.append(elapsed)
+
+
+def start_connect_timer():
+    """Начать учёт соединений текущего запроса; вернуть токен."""
+    return _connect_time.set([])
+
+
+def stop_connect_timer(token):
+    """Закончить учёт; вернуть (число соединений, время в мс)."""
+    connects = _connect_time.get() or []
+    _connect_time.reset(token)
+    return len(connects), sum(connects)
+
+
+def pool_stats(alias='default'):
+    """Статистика пула psycopg (ожидание, размер) или None без пула."""
+    connection = connections[alias]
+    pool = getattr(connection, 'pool', None) if connection.vendor == 'postgresql' else None
+    if pool is None:
+        return None
+    return {**pool.get_stats(), 'min_size': pool.min_size, 'max_size': pool.max_size}
+
+
+def snapshot():
+    return {'connections': stats.as_dict(), 'pool': pool_stats()}
+
+
+def count_reuse(sender, **kwargs):
+    """
+    request_started: соединение, оставшееся открытым после проверки
+    close_old_connections (она подключена раньше), будет переиспользовано.
+    """
+    reused = any(conn.connection is not None for conn in connections.all(initialized_only=True))
+    stats.add(requests=1, reused=int(reused))
+
+
+def connect_signals():
+    request_started.connect(count_reuse, dispatch_uid='equipsense_count_reuse')
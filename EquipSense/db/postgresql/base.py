@@ -0,0 +1,8 @@
+# equipment/db/postgresql/base.py
+from django.db.backends.postgresql import base
+
+from EquipSense.db import MeasuredConnectionMixin
+
+
+class DatabaseWrapper(MeasuredConnectionMixin, base.DatabaseWrapper):
+    pass
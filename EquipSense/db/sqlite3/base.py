@@ -0,0 +1,8 @@
+# equipment/db/sqlite3/base.py
+from django.db.backends.sqlite3 import base
+
+from EquipSense.db import MeasuredConnectionMixin
+
+
+class DatabaseWrapper(MeasuredConnectionMixin, base.DatabaseWrapper):
+    pass
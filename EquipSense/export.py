@@ -0,0 +1,89 @@
+# equipment/export.py
+"""
+Потоковая выгрузка заявок и оборудования в CSV/JSON.
+
+Строки читаются из БД через ``.iterator(chunk_size=...)`` и сразу
+отдаются клиенту через ``StreamingHttpResponse`` – ни весь результат
+запроса, ни весь файл в памяти не держатся. Колонки выгрузки
+оборудования совпадают с форматом импорта (см. importer.py).
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+
+from .importer import TAG_SEPARATOR
+
+CHUNK_SIZE = 2000
+
+REQUEST_COLUMNS = ['id', 'user', 'equipment_id', 'equipment', 'quantity', 'status',
+                   'start_dt', 'end_dt', 'comment', 'created_at', 'updated_at']
+EQUIPMENT_COLUMNS = ['id', 'name', 'description', 'quantity_total', 'serial_number',
+                     'model', 'category', 'location', 'status', 'photo_url',
+                     'purchase_date', 'warranty_expiry', 'maintenance_interval_days', 'tags']
+
+
+class _Echo:
+    """Псевдобуфер для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def _isoformat(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def request_rows(queryset):
+    for r in (queryset.select_related('user', 'equipment').order_by('pk')
+              .iterator(chunk_size=CHUNK_SIZE)):
+        yield [r.pk, r.user.username, r.equipment_id, r.equipment.name, r.quantity,
+               r.status, _isoformat(r.start_dt), _isoformat(r.end_dt), r.comment,
+               _isoformat(r.created_at), _isoformat(r.updated_at)]
+
+
+def equipment_rows(queryset):
+    qs = (queryset.select_related('category').prefetch_related('tags')
+          .order_by('pk').iterator(chunk_size=CHUNK_SIZE))
+    for e in qs:
+        yield [e.pk, e.name, e.description, e.quantity_total, e.serial_number, e.model,
+               e.category.name if e.category else None, e.location, e.status, e.photo_url,
+               _isoformat(e.purchase_date), _isoformat(e.warranty_expiry),
+               e.maintenance_interval_days, TAG_SEPARATOR.join(t.name for t in e.tags.all())]
+
+
+def _csv_stream(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _json_stream(columns, rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(dict(zip(columns, row)), ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def streaming_export(name, columns, rows, fmt):
+    """Ответ с выгрузкой ``rows`` в формате ``fmt`` ('csv' или 'json')."""
+    if fmt == 'json':
+        response = StreamingHttpResponse(_json_stream(columns, rows),
+                                         content_type='application/json')
+    else:
+        fmt = 'csv'
+        response = StreamingHttpResponse(_csv_stream(columns, rows),
+                                         content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    return response
+
+
+def export_requests(queryset, fmt):
+    return streaming_export('requests', REQUEST_COLUMNS, request_rows(queryset), fmt)
+
+
+def export_equipment(queryset, fmt):
+    return streaming_export('equipment', EQUIPMENT_COLUMNS, equipment_rows(queryset), fmt)
@@ -3,8 +3,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
+from .availability import available_quantity, free_alternatives, nearest_free_windows
 from .models import Request, Equipment
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 
@@ -147,22 +149,47 @@ class RequestForm(forms.ModelForm):
         model = Request
         fields = ['equipment', 'quantity', 'start_dt', 'end_dt', 'comment']
 
+    # Отказанное по доступности окно: (оборудование, количество, начало, конец)
+    _unavailable = None
+
     def clean(self):
         cleaned = super().clean()
         start, end = cleaned.get('start_dt'), cleaned.get('end_dt')
         if start and end and start >= end:
             raise forms.ValidationError("Начало должно быть раньше окончания.")
-        # Проверка доступности
+        # Проверка доступности на запрошенном окне
         equipment = cleaned.get('equipment')
         quantity  = cleaned.get('quantity', 1)
-        if equipment:
-            available = equipment.quantity_available
+        if equipment and start and end:
+            available = available_quantity(equipment, start, end,
+                                           exclude_pk=self.instance.pk)
             if quantity > available:
+                self.suggest(equipment, quantity, start, end)
                 raise forms.ValidationError(
                     f"Недостаточно свободного оборудования. Свободно: {available}"
                 )
         return cleaned
 
+    def suggest(self, equipment, quantity, start, end):
+        """Запомнить окно, на котором не хватило оборудования."""
+        self._unavailable = (equipment, quantity, start, end)
+        self.__dict__.pop('suggestions', None)
+
+    @cached_property
+    def suggestions(self):
+        """
+        Подсказки после отказа по доступности: {'windows', 'alternatives'} –
+        ближайшие свободные окна и свободное оборудование той же категории.
+        Считаются при первом обращении, т. е. только когда форму показывают
+        (шаблон заявки); API и прочие вызовы ``is_valid`` за них не платят.
+        """
+        if self._unavailable is None:
+            return None
+        return {
+            'windows': nearest_free_windows(*self._unavailable),
+            'alternatives': free_alternatives(*self._unavailable),
+        }
+
 
 class ManagerCreationForm(UserCreationForm):
     """Форма для регистрации менеджера (заведующего складом)."""
@@ -0,0 +1,92 @@
+# equipment/fragments.py
+"""
+Кэш HTML‑фрагментов оборудования: карточки списка и панели карточки.
+
+Ключ фрагмента содержит номер версии оборудования; сигналы (signals.py)
+повышают версию при изменении самого оборудования, его тегов, категории
+и заявок, поэтому устаревший фрагмент просто перестаёт читаться. Версия,
+которой нет в кэше, заводится заново уникальной, а не с нуля, – иначе
+после вытеснения версии снова стали бы видны старые фрагменты.
+
+В кэшируемую часть не входит ничего, что меняется со временем само по
+себе: количество свободных единиц, гарантия и дата ТО рендерятся на
+каждый запрос.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CACHE_TIMEOUT = 60 * 60 * 24
+CARD_TEMPLATE = 'equipment/_equip_card.html'
+PANEL_TEMPLATE = 'equipment/_equip_panel.html'
+
+
+def _version_key(equipment_id):
+    return f'equipsense:fragment:v:{equipment_id}'
+
+
+def _fragment_key(name, equipment, version):
+    # updated_at в ключе: строка, прочитанная с отстающей реплики (routers.py),
+    # не запишет старый HTML под новой версией
+    stamp = equipment.updated_at.timestamp() if equipment.updated_at else 0
+    return f'equipsense:fragment:{name}:{equipment.pk}:{version}:{stamp}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def versions(equipment_ids):
+    """{equipment_id: версия}; недостающие версии заводятся одним set_many."""
+    equipment_ids = list(equipment_ids)
+    stored = cache.get_many([_version_key(pk) for pk in equipment_ids])
+    result, missing = {}, {}
+    for pk in equipment_ids:
+        key = _version_key(pk)
+        if key not in stored:
+            stored[key] = missing[key] = _new_version()
+        result[pk] = stored[key]
+    if missing:
+        cache.set_many(missing, None)
+    return result
+
+
+def bump(equipment_ids):
+    """Сделать недействительными фрагменты оборудования ``equipment_ids``."""
+    for equipment_id in set(equipment_ids):
+        try:
+            cache.incr(_version_key(equipment_id))
+        except ValueError:
+            cache.set(_version_key(equipment_id), _new_version(), None)
+
+
+def equipment_cards(equipments):
+    """
+    {pk: HTML карточки} для списка: все фрагменты читаются одним get_many,
+    промахи рендерятся (теги подгружаются только для них) и пишутся set_many.
+    """
+    equipments = list(equipments)
+    current = versions(e.pk for e in equipments)
+    keys = {e.pk: _fragment_key('card', e, current[e.pk]) for e in equipments}
+    cached = cache.get_many(list(keys.values()))
+
+    misses = [e for e in equipments if keys[e.pk] not in cached]
+    if misses:
+        prefetch_related_objects(misses, 'tags')
+        fresh = {keys[e.pk]: render_to_string(CARD_TEMPLATE, {'e': e}) for e in misses}
+        cache.set_many(fresh, CACHE_TIMEOUT)
+        cached.update(fresh)
+    return {pk: mark_safe(cached[key]) for pk, key in keys.items()}
+
+
+def equipment_panel(equipment):
+    """HTML постоянной части панели карточки оборудования."""
+    key = _fragment_key('panel', equipment, versions([equipment.pk])[equipment.pk])
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(PANEL_TEMPLATE, {'equipment': equipment})
+        cache.set(key, html, CACHE_TIMEOUT)
+    return mark_safe(html)
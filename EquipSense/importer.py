@@ -0,0 +1,217 @@
+# equipment/importer.py
+"""
+Потоковый импорт оборудования из CSV или JSONL.
+
+Файл читается построчно, строки проверяются теми же правилами, что и в
+``EquipmentCreateUpdateForm``, и пишутся пачками через ``bulk_create``.
+Категории и теги ищутся по имени в словаре в памяти (недостающие
+создаются), связи с тегами вставляются одним ``bulk_create`` на пачку.
+Память не растёт с размером файла: в ней держится только текущая пачка.
+Строки с ошибками (в том числе повторный ``serial_number`` и слишком
+длинные имена категорий и тегов) сообщаются через ``on_error`` с номером
+строки файла и не прерывают импорт. Каждая пачка пишется в своей точке
+сохранения; если вставка всё же нарушила ограничение БД (например, тот же
+серийный номер записал параллельный импорт), пачка повторяется построчно
+и отклоняются только конфликтующие строки.
+"""
+import csv
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from . import counters, search
+from .forms import EquipmentCreateUpdateForm
+from .models import Category, Equipment, Tag
+
+BATCH_SIZE = 500
+TAG_SEPARATOR = ';'
+
+
+class EquipmentImportForm(EquipmentCreateUpdateForm):
+    """
+    Проверка одной строки импорта. Категория и теги приходят именами и
+    разрешаются отдельно; уникальность серийного номера проверяется
+    на уровне пачки, а не отдельным запросом на строку.
+    """
+
+    class Meta(EquipmentCreateUpdateForm.Meta):
+        fields = [f for f in EquipmentCreateUpdateForm.Meta.fields
+                  if f not in ('category', 'tags')]
+
+    def validate_unique(self):
+        pass
+
+
+def detect_format(filename):
+    return 'jsonl' if os.path.splitext(filename)[1].lower() in ('.jsonl', '.json') else 'csv'
+
+
+def iter_rows(stream, fmt):
+    """
+    Пары (номер строки файла, словарь) из текстового потока ``stream`` в
+    формате csv/jsonl. В CSV первая строка – заголовок, данные начинаются
+    со второй; пустые строки JSONL пропускаются, но нумерацию не сдвигают.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if line:
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, line  # отклоняется в import_equipment как «не объект»
+
+
+class _NameLookup:
+    """Имя → pk для Category/Tag с созданием недостающих."""
+
+    def __init__(self, model, column):
+        self.model = model
+        self.column = column
+        self.ids = dict(model.objects.values_list('name', 'pk'))
+        self.max_length = model._meta.get_field('name').max_length
+
+    def _clean(self, name):
+        """
+        Имя без пробелов по краям. Слишком длинное – ``ValidationError``:
+        на Postgres INSERT упал бы с DataError и оборвал весь импорт.
+        """
+        name = (name or '').strip()
+        if len(name) > self.max_length:
+            raise ValidationError(
+                f"{self.column}: «{name[:20]}…» длиннее {self.max_length} символов")
+        return name
+
+    def _pk(self, name):
+        if name not in self.ids:
+            self.ids[name] = self.model.objects.get_or_create(name=name)[0].pk
+        return self.ids[name]
+
+    def resolve(self, name):
+        name = self._clean(name)
+        return self._pk(name) if name else None
+
+    def resolve_many(self, names):
+        """Множество pk; имена проверяются до создания, чтобы не плодить сирот."""
+        names = [self._clean(name) for name in names]
+        return {self._pk(name) for name in names if name}
+
+
+def _with_defaults(row):
+    """Пустые/отсутствующие колонки заменяются значениями по умолчанию модели."""
+    data = {}
+    for name in EquipmentImportForm.Meta.fields:
+        value = row.get(name)
+        if value in (None, ''):
+            field = Equipment._meta.get_field(name)
+            value = field.get_default() if field.has_default() else ''
+        data[name] = value
+    return data
+
+
+def _tag_names(value):
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value]
+    return (value or '').split(TAG_SEPARATOR)
+
+
+def import_equipment(rows, on_error=None, batch_size=BATCH_SIZE):
+    """
+    Импортировать оборудование из итерируемого ``rows`` – пар
+    (номер строки, словарь), см. :func:`iter_rows`.
+
+    ``on_error(номер_строки, сообщение)`` вызывается для отклонённых строк.
+    Возвращает {'created': ..., 'skipped': ...}.
+    """
+    categories, tags = _NameLookup(Category, 'category'), _NameLookup(Tag, 'tags')
+    stats = {'created': 0, 'skipped': 0}
+
+    def reject(line_no, message):
+        stats['skipped'] += 1
+        if on_error:
+            on_error(line_no, message)
+
+    batch = []
+    for line_no, row in rows:
+        if not isinstance(row, dict):
+            reject(line_no, "Строка не является JSON‑объектом")
+            continue
+        form = EquipmentImportForm(data=_with_defaults(row))
+        if not form.is_valid():
+            reject(line_no, '; '.join(f'{field}: {" ".join(errors)}'
+                                      for field, errors in form.errors.items()))
+            continue
+        equipment = form.save(commit=False)
+        try:
+            equipment.category_id = categories.resolve(row.get('category'))
+            tag_ids = tags.resolve_many(_tag_names(row.get('tags')))
+        except ValidationError as exc:
+            reject(line_no, ' '.join(exc.messages))
+            continue
+        # bulk_create не вызывает save()
+        equipment.next_maintenance_due = equipment.compute_next_maintenance_due()
+        batch.append((line_no, equipment, tag_ids))
+        if len(batch) >= batch_size:
+            _flush(batch, stats, reject)
+            batch = []
+    if batch:
+        _flush(batch, stats, reject)
+    return stats
+
+
+def _taken_serials(serials):
+    return set(Equipment.objects.filter(serial_number__in=serials)
+               .values_list('serial_number', flat=True))
+
+
+def _flush(batch, stats, reject):
+    """Записать пачку: отсеять повторы serial_number, вставить строки и связи."""
+    taken = _taken_serials([e.serial_number for _, e, _ in batch if e.serial_number])
+    accepted = []
+    for line_no, equipment, tag_ids in batch:
+        serial = equipment.serial_number
+        if serial and serial in taken:
+            reject(line_no, f"serial_number: {serial} уже существует")
+            continue
+        if serial:
+            taken.add(serial)
+        accepted.append((line_no, equipment, tag_ids))
+    if not accepted:
+        return
+
+    try:
+        with transaction.atomic():
+            stats['created'] += _insert(accepted)
+        return
+    except IntegrityError:
+        pass
+    # Пачка откатилась целиком: повторяем построчно, каждую в своей точке
+    # сохранения, чтобы отклонить только конфликтующие строки
+    for line_no, equipment, tag_ids in accepted:
+        equipment.pk = None
+        equipment._state.adding = True
+        try:
+            with transaction.atomic():
+                stats['created'] += _insert([(line_no, equipment, tag_ids)])
+        except IntegrityError as exc:
+            reject(line_no, f"Строка не записана: {exc}")
+
+
+def _insert(accepted):
+    """Вставить строки (номер, оборудование, теги) и связи; число созданных."""
+    created = Equipment.objects.bulk_create([e for _, e, _ in accepted])
+    Through = Equipment.tags.through
+    Through.objects.bulk_create(
+        Through(equipment_id=e.pk, tag_id=tag_id)
+        for e, (_, _, tag_ids) in zip(created, accepted) for tag_id in tag_ids
+    )
+    # bulk_create идёт в обход сигналов
+    counters.adjust({counters.EQUIPMENT: len(created)})
+    search.index_equipment(e.pk for e in created)
+    return len(created)
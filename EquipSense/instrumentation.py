@@ -0,0 +1,89 @@
+# equipment/instrumentation.py
+"""
+Учёт SQL и времени рендеринга шаблонов в пределах одного HTTP‑запроса.
+
+``QueryRecorder`` подключается через ``connection.execute_wrapper`` и
+считает запросы, суммарное время в БД и повторы «формы» запроса
+(SQL без конкретных значений). Много одинаковых форм за один запрос –
+типичный признак N+1.
+
+Время шаблонов собирает бэкенд ``InstrumentedDjangoTemplates`` – он
+замеряет только рендеринг верхнего уровня, поэтому include/extends
+не считаются дважды.
+"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+_template_time = ContextVar('equipsense_template_time', default=None)
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Форма запроса: литералы и списки IN (...) заменены заглушками."""
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """execute_wrapper: число запросов, время в БД и счётчик форм запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[normalize_sql(sql)] += 1
+
+    def repeated(self, threshold):
+        """Формы, выполненные не менее ``threshold`` раз (кандидаты в N+1)."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def start_template_timer():
+    """Начать учёт времени шаблонов для текущего запроса; вернуть токен."""
+    return _template_time.set([0.0])
+
+
+def stop_template_timer(token):
+    """Закончить учёт и вернуть накопленное время в секундах."""
+    total = _template_time.get()
+    _template_time.reset(token)
+    return total[0] if total else 0.0
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        total = _template_time.get()
+        if total is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            total[0] += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, замеряющий время рендеринга для Server-Timing."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return InstrumentedTemplate(template.template, self)
@@ -0,0 +1,54 @@
+# equipment/leader.py
+"""
+Аренда лидера для периодических команд.
+
+Команды вроде ``advance_requests`` запускаются cron'ом на каждом
+экземпляре приложения раз в минуту; выполнять работу должен только один.
+Аренда хранится в строке ScheduledJob: захват – это один UPDATE
+``... WHERE locked_until IS NULL OR locked_until <= now``, атомарный и в
+PostgreSQL, и в SQLite, поэтому из одновременных запусков строку получает
+ровно один. Аренда ограничена ``ttl``: если лидер упал, не освободив
+её, следующий запуск после истечения срока станет лидером сам.
+"""
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduledJob
+
+
+def _owner():
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+@contextmanager
+def leader_lock(name, ttl):
+    """
+    Захватить аренду ``name`` на ``ttl`` секунд. Отдаёт идентификатор
+    владельца или None, если аренду держит другой экземпляр.
+    """
+    ScheduledJob.objects.get_or_create(name=name)
+    owner = _owner()
+    now = timezone.now()
+    acquired = (ScheduledJob.objects
+                .filter(Q(locked_until__isnull=True) | Q(locked_until__lte=now), name=name)
+                .update(locked_by=owner, locked_until=now + timedelta(seconds=ttl)))
+    if not acquired:
+        yield None
+        return
+    try:
+        yield owner
+    finally:
+        ScheduledJob.objects.filter(name=name, locked_by=owner).update(
+            locked_by='', locked_until=None)
+
+
+def record_run(name, started_at, duration_ms, stats):
+    """Сохранить итог запуска: время начала, длительность и счётчики строк."""
+    ScheduledJob.objects.filter(name=name).update(
+        last_started_at=started_at, last_duration_ms=round(duration_ms, 1), last_stats=stats)
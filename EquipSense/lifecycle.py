@@ -0,0 +1,84 @@
+# equipment/lifecycle.py
+"""
+Переходы заявок по времени.
+
+Статус заявки меняется действиями пользователей (одобрение, возврат), но
+два перехода наступают сами собой:
+
+* одобренная заявка, чьё окно началось, – выдана (APPROVED → IN_USE);
+* выданная заявка, чьё окно закончилось, – просрочена (``overdue_at``),
+  пока пользователь не вернёт оборудование; владельцу уходит уведомление
+  (outbox.py).
+
+Команда ``advance_requests`` раз в минуту применяет их set‑based
+UPDATE'ами по индексам (status, start_dt) и (status, end_dt). Строки
+берутся пачками под ``select_for_update``, чтобы UPDATE … WHERE pk IN
+не рос без ограничений и не спорил с одобрением и возвратом. UPDATE идёт
+в обход сигналов, поэтому счётчики и фрагменты обновляются здесь же, а
+updated_at ставится явно (по нему версия кэша шкалы, см. timeline.py).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, fragments, outbox
+from .models import Notification, Request
+
+BATCH_SIZE = 1000
+
+
+def _update_in_batches(queryset, values, batch_size, status_before=None, notify=None):
+    """
+    Применить ``values`` ко всем строкам ``queryset`` пачками по
+    ``batch_size``. Строки, к которым применено, должны выпадать из
+    ``queryset``. ``notify`` – вид уведомления владельцам изменённых
+    заявок. Возвращает число изменённых строк.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.select_for_update()
+                        .values_list('pk', 'equipment_id')[:batch_size])
+            if not rows:
+                return processed
+            pks = [pk for pk, _ in rows]
+            updated = queryset.filter(pk__in=pks).update(**values, updated_at=timezone.now())
+            if notify:
+                outbox.enqueue(notify, Request.objects.filter(pk__in=pks, **values)
+                               .only('pk', 'user_id'))
+            if 'status' in values:
+                counters.adjust(counters.request_status_deltas(
+                    [status_before] * updated, values['status']))
+                fragments.bump({equipment_id for _, equipment_id in rows})
+        processed += updated
+
+
+def activate_started(now=None, batch_size=BATCH_SIZE):
+    """APPROVED → IN_USE для заявок, чьё окно началось к ``now``."""
+    now = now or timezone.now()
+    started = (Request.objects
+               .filter(status=Request.Status.APPROVED, start_dt__lte=now)
+               .order_by('start_dt'))
+    return _update_in_batches(started, {'status': Request.Status.IN_USE}, batch_size,
+                              status_before=Request.Status.APPROVED)
+
+
+def flag_overdue(now=None, batch_size=BATCH_SIZE):
+    """Пометить выданные заявки, чьё окно закончилось к ``now``."""
+    now = now or timezone.now()
+    overdue = (Request.objects
+               .filter(status=Request.Status.IN_USE, end_dt__lte=now, overdue_at__isnull=True)
+               .order_by('end_dt'))
+    return _update_in_batches(overdue, {'overdue_at': now}, batch_size,
+                              notify=Notification.Kind.OVERDUE)
+
+
+def advance(now=None, batch_size=BATCH_SIZE):
+    """
+    Применить все переходы на момент ``now``.
+    Возвращает {'activated': ..., 'overdue': ...} – число изменённых строк.
+    """
+    now = now or timezone.now()
+    # Сначала выдача: заявка, пропустившая и начало, и конец (простой
+    # планировщика), за один запуск становится выданной и просроченной
+    return {'activated': activate_started(now, batch_size),
+            'overdue': flag_overdue(now, batch_size)}
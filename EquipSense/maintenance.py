@@ -0,0 +1,82 @@
+# equipment/maintenance.py
+"""
+Перенос дат планового обслуживания.
+
+``Equipment.next_maintenance_due`` пересчитывается в ``save()``, но дата
+«стареет» сама по себе: как только она наступила, следующим становится
+очередной интервал. Раз в сутки команда ``roll_maintenance`` сдвигает
+такие даты set‑based UPDATE'ами (дата + интервал) по индексу на
+``next_maintenance_due``. Строки без сохранённой даты (старые данные,
+bulk_create) заполняются пачками в Python.
+"""
+from django.db.models import DateField, F, Func, Q
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .models import Equipment
+
+BATCH_SIZE = 1000
+
+
+class AddDays(Func):
+    """``дата + N дней`` (N – целочисленное выражение) без перехода к interval."""
+    arg_joiner = ' + '
+    template = '(%(expressions)s)'
+    output_field = DateField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection,
+                           template="date(%(expressions)s || ' days')",
+                           arg_joiner=", '+' || ", **extra_context)
+
+
+def _plus_interval(field):
+    """Выражение «``field`` + maintenance_interval_days дней»."""
+    return AddDays(F(field), F('maintenance_interval_days'))
+
+
+def _planned():
+    return Equipment.objects.filter(maintenance_interval_days__gt=0,
+                                    purchase_date__isnull=False)
+
+
+def roll_forward(today=None):
+    """
+    Привести ``next_maintenance_due`` к актуальному состоянию на ``today``.
+
+    Возвращает {'filled': ..., 'cleared': ..., 'rolled': ...} – число
+    заполненных, сброшенных (плана больше нет) и сдвинутых строк.
+    """
+    today = today or timezone.localdate()
+    stats = {'filled': 0, 'cleared': 0, 'rolled': 0}
+
+    stats['cleared'] = (Equipment.objects
+                        .filter(next_maintenance_due__isnull=False)
+                        .filter(Q(maintenance_interval_days=0) | Q(purchase_date__isnull=True))
+                        .update(next_maintenance_due=None, updated_at=Now()))
+
+    missing = (_planned().filter(next_maintenance_due__isnull=True)
+               .only('pk', 'purchase_date', 'maintenance_interval_days', 'updated_at'))
+    batch = []
+    for equipment in missing.iterator(chunk_size=BATCH_SIZE):
+        equipment.next_maintenance_due = equipment.compute_next_maintenance_due(today)
+        equipment.updated_at = timezone.now()
+        batch.append(equipment)
+        if len(batch) >= BATCH_SIZE:
+            Equipment.objects.bulk_update(batch, ['next_maintenance_due', 'updated_at'])
+            stats['filled'] += len(batch)
+            batch = []
+    if batch:
+        Equipment.objects.bulk_update(batch, ['next_maintenance_due', 'updated_at'])
+        stats['filled'] += len(batch)
+
+    # При ежедневном запуске хватает одного прохода; после простоя
+    # каждый проход сдвигает отставшие строки ещё на один интервал
+    while True:
+        rolled = (_planned().filter(next_maintenance_due__lte=today)
+                  .update(next_maintenance_due=_plus_interval('next_maintenance_due'),
+                          updated_at=Now()))
+        if not rolled:
+            break
+        stats['rolled'] += rolled
+    return stats
@@ -0,0 +1,35 @@
+# equipment/management/commands/advance_requests.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from EquipSense import lifecycle
+from EquipSense.leader import leader_lock, record_run
+
+JOB_NAME = 'advance_requests'
+
+
+class Command(BaseCommand):
+    help = ("Перевести заявки по времени: одобренные с наступившим началом – в "
+            "«В использовании», выданные с прошедшим концом – пометить просроченными. "
+            "Запускать раз в минуту; одновременно работает только один экземпляр.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=lifecycle.BATCH_SIZE)
+        parser.add_argument('--lock-ttl', type=int, default=300,
+                            help="Срок аренды лидера, с (дольше самого долгого запуска)")
+
+    def handle(self, *args, **options):
+        with leader_lock(JOB_NAME, options['lock_ttl']) as owner:
+            if owner is None:
+                self.stdout.write("Пропуск: команда уже выполняется другим экземпляром")
+                return
+            started_at = timezone.now()
+            started = time.perf_counter()
+            stats = lifecycle.advance(batch_size=options['batch_size'])
+            duration_ms = (time.perf_counter() - started) * 1000
+            record_run(JOB_NAME, started_at, duration_ms, stats)
+        self.stdout.write(self.style.SUCCESS(
+            "Выдано: {activated}, просрочено: {overdue}".format(**stats)
+            + f" за {duration_ms / 1000:.2f} с"))
@@ -0,0 +1,105 @@
+# equipment/management/commands/audit_queries.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from EquipSense import queryplan
+from EquipSense.instrumentation import normalize_sql
+
+from .run_benchmarks import scenarios
+from .seed_benchmark_data import PREFIX
+
+
+def audit_scenarios():
+    """(имя, пользователь, url): страницы run_benchmarks и отчёты менеджера."""
+    result = scenarios()
+    manager = User.objects.get(username=f'{PREFIX}-manager')
+    result += [
+        ('maintenance_queue', manager, reverse('EquipSense:maintenance_queue')),
+        ('warranty_report', manager, reverse('EquipSense:warranty_report')),
+        ('api_requests', manager, reverse('EquipSense:api_request_list')),
+    ]
+    return result
+
+
+class SelectRecorder:
+    """execute_wrapper: уникальные по форме SELECT'ы с параметрами."""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.setdefault(normalize_sql(sql), (sql, params))
+        return execute(sql, params, many, context)
+
+
+def table_sizes():
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in connection.introspection.table_names(cursor):
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            sizes[table] = cursor.fetchone()[0]
+    return sizes
+
+
+class Command(BaseCommand):
+    help = ("Прогнать запросы основных страниц на засеянной базе (seed_benchmark_data), "
+            "снять планы (EXPLAIN / EXPLAIN QUERY PLAN), пометить полные проходы по "
+            "большим таблицам и сортировки без индекса и предложить составные индексы.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='*', help="Имена сценариев")
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help="Полный проход по таблице меньше этого не помечается")
+        parser.add_argument('--repeat', type=int, default=5, help="Замеров на запрос")
+        parser.add_argument('--plans', action='store_true', help="Печатать все планы")
+
+    def handle(self, *args, **opts):
+        sizes = table_sizes()
+        suggestions = {}
+        flagged = total_ms = 0
+
+        for name, user, url in audit_scenarios():
+            if opts['only'] and name not in opts['only']:
+                continue
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            recorder = SelectRecorder()
+            with connection.execute_wrapper(recorder):
+                client.get(url)
+
+            self.stdout.write(f"[{name}] {len(recorder.queries)} SELECT")
+            for sql, params in recorder.queries.values():
+                ms = queryplan.timed(connection, sql, params, opts['repeat'])
+                total_ms += ms
+                plan, findings = queryplan.explain(connection, sql, params)
+                findings = [f for f in findings
+                            if f.kind == 'sort' or sizes.get(f.table, 0) >= opts['min_rows']]
+                if not findings and not opts['plans']:
+                    continue
+                self.stdout.write(f"  {ms:8.2f} ms  {sql[:160]}")
+                for line in plan:
+                    self.stdout.write(f"             plan: {line}")
+                for finding in findings:
+                    flagged += 1
+                    rows = f" ({sizes[finding.table]} rows)" if finding.table else ''
+                    self.stdout.write(f"             ! {finding.kind.upper()}{rows}: {finding.detail}")
+                    tables = [finding.table] if finding.table else sorted(
+                        t for t in sizes if f'"{t}"' in sql)
+                    for table in tables:
+                        suggestion = queryplan.suggest_index(sql, table)
+                        if suggestion:
+                            model, fields = suggestion
+                            key = (model._meta.label, tuple(fields))
+                            suggestions[key] = suggestions.get(key, 0) + 1
+                            self.stdout.write(f"             → {model.__name__}: "
+                                              f"models.Index(fields={fields!r})")
+
+        self.stdout.write(f"\nПомечено: {flagged}; суммарно {total_ms:.1f} ms на прогон запросов")
+        if suggestions:
+            self.stdout.write("Предлагаемые индексы (сколько запросов выиграют):")
+            for (label, fields), count in sorted(suggestions.items(), key=lambda i: -i[1]):
+                self.stdout.write(f"  {count:3}  {label}: {list(fields)!r}")
@@ -0,0 +1,90 @@
+# equipment/management/commands/bench_connections.py
+import importlib.util
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from .run_benchmarks import percentile
+
+BENCH_ALIAS = 'equipsense_bench'
+
+
+def modes(base):
+    """(имя, настройки БД) сравниваемых режимов; пул – только для PostgreSQL+psycopg 3."""
+    result = [
+        ('per-request', {**base, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}),
+        ('persistent', {**base, 'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}),
+    ]
+    if 'postgresql' in base['ENGINE'] and importlib.util.find_spec('psycopg_pool'):
+        pooled = {**base, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+                  'OPTIONS': {**base.get('OPTIONS', {}), 'pool': settings.DB_POOL_OPTIONS}}
+        result.append(('pool', pooled))
+    return result
+
+
+def simulate_requests(handler, iterations, query):
+    """Цикл «запрос»: проверки начала/конца запроса и один SQL между ними."""
+    conn = handler[BENCH_ALIAS]
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        conn.close_if_unusable_or_obsolete()  # request_started
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            cursor.fetchall()
+        conn.close_if_unusable_or_obsolete()  # request_finished
+        timings.append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return timings
+
+
+class Command(BaseCommand):
+    help = ("Накладные расходы на соединение с БД на один запрос: соединение на "
+            "каждый запрос (как было), постоянные соединения с проверкой и пул "
+            "psycopg (если доступен). Работает и на SQLite, но там соединение "
+            "почти бесплатно – показательны замеры на PostgreSQL с TLS.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--iterations', type=int, default=200, help="На поток")
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument('--query', default='SELECT 1')
+
+    def handle(self, *args, **opts):
+        base = dict(connections[opts['database']].settings_dict)
+        connects = []
+        lock = threading.Lock()
+
+        def on_connect(sender, connection, **kwargs):
+            if connection.alias == BENCH_ALIAS:
+                with lock:
+                    connects.append(1)
+
+        connection_created.connect(on_connect)
+        self.stdout.write(f"{'mode':<14}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}"
+                          f"{'connects':>10}{'requests':>10}")
+        try:
+            for name, settings_dict in modes(base):
+                connects.clear()
+                # Отдельный алиас: пул Django хранится по имени алиаса
+                handler = ConnectionHandler({'default': base, BENCH_ALIAS: settings_dict})
+                with ThreadPoolExecutor(opts['threads']) as pool:
+                    runs = list(pool.map(
+                        lambda _: simulate_requests(handler, opts['iterations'], opts['query']),
+                        range(opts['threads'])))
+                if hasattr(handler[BENCH_ALIAS], 'close_pool'):
+                    handler[BENCH_ALIAS].close_pool()
+                timings = [ms for run in runs for ms in run]
+                self.stdout.write(f"{name:<14}{statistics.median(timings):>9.3f}"
+                                  f"{percentile(timings, 95):>9.3f}"
+                                  f"{statistics.fmean(timings):>9.3f}"
+                                  f"{len(connects):>10}{len(timings):>10}")
+        finally:
+            connection_created.disconnect(on_connect)
@@ -0,0 +1,123 @@
+# equipment/management/commands/bench_reservations.py
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from EquipSense import counters
+from EquipSense.models import Equipment, Request
+from EquipSense.services import ReservationConflict, approve_reservation, create_reservation
+
+
+def approve_concurrently(request_ids, threads):
+    """
+    Одобрить заявки параллельно из ``threads`` потоков.
+    Возвращает словарь с числом одобренных, отклонённых и конфликтных попыток.
+    """
+    def worker(pk):
+        try:
+            approve_reservation(pk)
+            return 'approved'
+        except ValidationError:
+            return 'rejected'
+        except ReservationConflict:
+            return 'conflict'
+        finally:
+            connection.close()
+
+    stats = {'approved': 0, 'rejected': 0, 'conflict': 0}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for outcome in pool.map(worker, request_ids):
+            stats[outcome] += 1
+    return stats
+
+
+def reserve_concurrently(user, equipment, windows, threads):
+    """
+    Подать и сразу одобрить заявки на окна ``windows`` ((start, end), по
+    одной единице) параллельно из ``threads`` потоков: создание и
+    одобрение соседних потоков перемежаются. Возвращает словарь как
+    :func:`approve_concurrently`; 'rejected' – отказ при создании или
+    одобрении из‑за нехватки оборудования.
+    """
+    def worker(window):
+        try:
+            req = create_reservation(user, equipment, 1, *window)
+            approve_reservation(req.pk)
+            return 'approved'
+        except ValidationError:
+            return 'rejected'
+        except ReservationConflict:
+            return 'conflict'
+        finally:
+            connection.close()
+
+    stats = {'approved': 0, 'rejected': 0, 'conflict': 0}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for outcome in pool.map(worker, windows):
+            stats[outcome] += 1
+    return stats
+
+
+class Command(BaseCommand):
+    help = ("Замер пропускной способности одобрения заявок при конкуренции "
+            "за одно оборудование. Создаёт и удаляет собственные тестовые данные.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--stock', type=int, default=5)
+        parser.add_argument('--mode', choices=['approve', 'create'], default='approve',
+                            help="approve – одобрять готовые заявки; create – подавать "
+                                 "и одобрять новые")
+
+    def handle(self, *args, **options):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(f'bench-{suffix}')
+        equipment = Equipment.objects.create(name=f'bench-{suffix}',
+                                             quantity_total=options['stock'])
+        try:
+            start = timezone.now() + timedelta(days=1)
+            # Все окна пересекаются, но отличаются на секунду (unique_together)
+            windows = [(start + timedelta(seconds=i), start + timedelta(hours=1, seconds=i))
+                       for i in range(options['requests'])]
+            if options['mode'] == 'approve':
+                Request.objects.bulk_create(
+                    Request(user=user, equipment=equipment, quantity=1,
+                            start_dt=window_start, end_dt=window_end)
+                    for window_start, window_end in windows
+                )
+                ids = list(Request.objects.filter(equipment=equipment)
+                           .values_list('pk', flat=True))
+                # bulk_create идёт в обход сигналов – счётчики сдвигаем сами
+                counters.adjust({counters.request_key(Request.Status.PENDING): len(ids)})
+
+            started = time.perf_counter()
+            if options['mode'] == 'approve':
+                stats = approve_concurrently(ids, options['threads'])
+            else:
+                stats = reserve_concurrently(user, equipment, windows, options['threads'])
+            elapsed = time.perf_counter() - started
+
+            booked = Request.objects.filter(equipment=equipment,
+                                            status=Request.Status.APPROVED).count()
+            self.stdout.write(
+                f"mode={options['mode']} threads={options['threads']} requests={len(windows)} "
+                f"approved={stats['approved']} rejected={stats['rejected']} "
+                f"conflicts={stats['conflict']} time={elapsed:.3f}s "
+                f"throughput={len(windows) / elapsed:.1f} req/s"
+            )
+            if booked > options['stock']:
+                self.stderr.write(f"Перебронирование: {booked} > {options['stock']}")
+            else:
+                self.stdout.write(self.style.SUCCESS("Перебронирования нет"))
+        finally:
+            Request.objects.filter(equipment=equipment).delete()
+            equipment.delete()
+            user.delete()
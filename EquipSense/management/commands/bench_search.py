@@ -0,0 +1,67 @@
+# equipment/management/commands/bench_search.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from EquipSense import search
+from EquipSense.models import Equipment
+
+WORDS = ['projector', 'laptop', 'camera', 'tripod', 'monitor', 'cable', 'hdmi',
+         'usb', 'router', 'switch', 'speaker', 'microphone', 'drone', 'lens',
+         'проектор', 'ноутбук', 'камера', 'штатив', 'кабель', 'колонка']
+QUERIES = ['projector', 'hdmi cable', 'камера', 'micro', 'lens drone']
+BATCH = 2000
+
+
+class Command(BaseCommand):
+    help = ("Сравнить полнотекстовый индекс с icontains на синтетических данных. "
+            "Данные создаются в транзакции и откатываются.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write("Полнотекстовый поиск для этой СУБД не поддерживается.")
+            return
+        for rows in options['rows']:
+            with transaction.atomic():
+                self._populate(rows)
+                self._measure(rows, options['repeat'])
+                transaction.set_rollback(True)
+
+    def _populate(self, rows):
+        rnd = random.Random(rows)
+        for start in range(0, rows, BATCH):
+            created = Equipment.objects.bulk_create(
+                Equipment(name=' '.join(rnd.sample(WORDS, 2)),
+                          description=' '.join(rnd.choices(WORDS, k=12)),
+                          serial_number=f'bench-{rows}-{i}')
+                for i in range(start, min(start + BATCH, rows))
+            )
+            search.index_equipment(e.pk for e in created)
+
+    def _measure(self, rows, repeat):
+        for text in QUERIES:
+            words = text.split()
+            substring = Q()
+            for word in words:
+                substring &= Q(name__icontains=word) | Q(description__icontains=word)
+            timings = {}
+            for label, make_qs in [
+                ('icontains', lambda: Equipment.objects.filter(substring)),
+                ('fulltext', lambda: search.filter_queryset(Equipment.objects.all(), text)),
+            ]:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    found = make_qs().count()
+                timings[label] = ((time.perf_counter() - started) / repeat * 1000, found)
+            self.stdout.write(
+                f"rows={rows:>7} query={text!r:<14} "
+                f"icontains={timings['icontains'][0]:8.2f}ms ({timings['icontains'][1]}) "
+                f"fulltext={timings['fulltext'][0]:8.2f}ms ({timings['fulltext'][1]})"
+            )
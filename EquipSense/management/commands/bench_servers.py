@@ -0,0 +1,141 @@
+# equipment/management/commands/bench_servers.py
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from .run_benchmarks import percentile, scenarios
+
+SERVERS = {
+    # имя: (модуль, EQUIPSENSE_ASYNC_VIEWS, команда запуска)
+    'asgi': ('uvicorn', '1', lambda port, workers: [
+        '-m', 'uvicorn', 'EquipSenseWebApp.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers),
+        '--log-level', 'warning']),
+    'wsgi': ('gunicorn', '0', lambda port, workers: [
+        '-m', 'gunicorn', 'EquipSenseWebApp.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+        '--log-level', 'warning']),
+}
+# Страницы, у которых есть async‑версия (async_views.py)
+DEFAULT_SCENARIOS = ['equip_list', 'equip_detail', 'manager_dashboard', 'my_requests']
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def session_cookie(user):
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+def fetch(url, cookie):
+    request = urllib.request.Request(url, headers={'Cookie': cookie})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (urllib.error.URLError, OSError):
+        ok = False
+    return (time.perf_counter() - started) * 1000, ok
+
+
+def wait_ready(process, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Сервер завершился с кодом {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except urllib.error.HTTPError:
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise CommandError(f"Сервер не ответил за {timeout} с")
+
+
+def load(base_url, targets, requests, concurrency):
+    """req/s, p50/p95 и число ошибок для ``requests`` запросов на сценарий."""
+    results = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for name, url, cookie in targets:
+            started = time.perf_counter()
+            samples = list(pool.map(lambda _: fetch(base_url + url, cookie), range(requests)))
+            elapsed = time.perf_counter() - started
+            timings = [ms for ms, _ in samples]
+            results[name] = {'rps': requests / elapsed,
+                             'p50_ms': percentile(timings, 50),
+                             'p95_ms': percentile(timings, 95),
+                             'errors': sum(not ok for _, ok in samples)}
+    return results
+
+
+class Command(BaseCommand):
+    help = ("Сравнить пропускную способность страниц под uvicorn (ASGI, async‑версии) "
+            "и gunicorn (WSGI, синхронные). Нужны данные seed_benchmark_data и "
+            "установленные uvicorn/gunicorn; в зависимости проекта они не входят.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', nargs='+', choices=sorted(SERVERS),
+                            default=sorted(SERVERS))
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Запросов на сценарий")
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--only', nargs='*', default=DEFAULT_SCENARIOS,
+                            help="Имена сценариев (см. run_benchmarks)")
+
+    def handle(self, *args, **opts):
+        missing = [SERVERS[name][0] for name in opts['servers']
+                   if importlib.util.find_spec(SERVERS[name][0]) is None]
+        if missing:
+            raise CommandError(f"Не установлены: {', '.join(missing)}")
+
+        targets = [(name, url, session_cookie(user)) for name, user, url in scenarios()
+                   if name in opts['only']]
+        report = {}
+        for server in opts['servers']:
+            report[server] = self._run(server, targets, opts)
+
+        self.stdout.write(f"{'view':<20}{'server':<8}{'req/s':>9}{'p50 ms':>10}"
+                          f"{'p95 ms':>10}{'errors':>8}")
+        for name, _, _ in targets:
+            for server in opts['servers']:
+                r = report[server][name]
+                self.stdout.write(f"{name:<20}{server:<8}{r['rps']:>9.1f}{r['p50_ms']:>10.2f}"
+                                  f"{r['p95_ms']:>10.2f}{r['errors']:>8}")
+
+    def _run(self, server, targets, opts):
+        module, async_views, command = SERVERS[server]
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        env = {**os.environ, 'EQUIPSENSE_ASYNC_VIEWS': async_views}
+        process = subprocess.Popen([sys.executable, *command(port, opts['workers'])],
+                                   env=env, cwd=settings.BASE_DIR)
+        try:
+            wait_ready(process, base_url + targets[0][1])
+            load(base_url, targets, opts['warmup'], opts['concurrency'])
+            return load(base_url, targets, opts['requests'], opts['concurrency'])
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
@@ -0,0 +1,27 @@
+# equipment/management/commands/import_equipment.py
+from django.core.management.base import BaseCommand, CommandError
+
+from EquipSense.importer import detect_format, import_equipment, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Импорт оборудования из CSV или JSONL (потоково, пачками)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help="По умолчанию определяется по расширению файла")
+
+    def handle(self, *args, path, **options):
+        fmt = options['format'] or detect_format(path)
+
+        def on_error(line_no, message):
+            self.stderr.write(f"строка {line_no}: {message}")
+
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as stream:
+                stats = import_equipment(iter_rows(stream, fmt), on_error=on_error)
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {stats['created']}, пропущено: {stats['skipped']}"))
@@ -0,0 +1,84 @@
+# equipment/management/commands/profile_startup.py
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from EquipSense.startup import PHASES
+
+IMPORT_LINE_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def parse_importtime(stderr, depth):
+    """{модуль, усечённый до ``depth`` компонентов: собственное время, мкс}."""
+    totals = Counter()
+    for line in stderr.splitlines():
+        match = IMPORT_LINE_RE.match(line)
+        if match:
+            totals['.'.join(match[4].split('.')[:depth])] += int(match[1])
+    return totals
+
+
+def cold_start(settings_module, path):
+    """Один холодный старт в новом интерпретаторе: (фазы, импорты)."""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module,
+           'PYTHONDONTWRITEBYTECODE': '1'}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'EquipSense.startup', path],
+                            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+    if result.returncode:
+        raise CommandError(f"{settings_module}: запуск завершился ошибкой\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if report['status'] >= 400:
+        raise CommandError(f"{settings_module}: {path} вернул HTTP {report['status']}")
+    return report['phases'], result.stderr
+
+
+class Command(BaseCommand):
+    help = ("Замерить холодный старт: время импорта модулей, django.setup(), загрузки "
+            "middleware, прогрева и первого запроса. Каждый прогон – новый процесс; "
+            "несколько профилей настроек сравниваются рядом.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-modules', nargs='+',
+                            default=[os.environ.get('DJANGO_SETTINGS_MODULE')],
+                            help="Модули настроек для сравнения")
+        parser.add_argument('--path', default='/accounts/login/',
+                            help="URL первого запроса (без обращения к БД)")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--depth', type=int, default=3,
+                            help="Группировать импорты до N компонентов имени")
+
+    def handle(self, *args, **opts):
+        phases, imports = {}, {}
+        for module in opts['settings_modules']:
+            runs = [cold_start(module, opts['path']) for _ in range(opts['repeat'])]
+            phases[module] = {name: statistics.median(run[name] for run, _ in runs)
+                              for name in PHASES}
+            # Импорты – по медианному по общему времени прогону
+            runs.sort(key=lambda run: sum(run[0].values()))
+            imports[module] = parse_importtime(runs[len(runs) // 2][1], opts['depth'])
+
+        modules = opts['settings_modules']
+        width = max(len(m) for m in modules) + 2
+        self.stdout.write(f"Медиана {opts['repeat']} холодных стартов, мс")
+        self.stdout.write(f"{'phase':<16}" + ''.join(f"{m:>{width}}" for m in modules))
+        for name in PHASES:
+            self.stdout.write(f"{name:<16}" + ''.join(f"{phases[m][name]:>{width}.1f}"
+                                                      for m in modules))
+        self.stdout.write(f"{'to first byte':<16}" + ''.join(
+            f"{sum(v for k, v in phases[m].items() if k != 'second_request'):>{width}.1f}"
+            for m in modules))
+
+        for module in modules:
+            total = sum(imports[module].values())
+            self.stdout.write(f"\n{module}: импорт {total / 1000:.1f} мс, "
+                              f"топ {opts['top']} по собственному времени")
+            for name, micros in imports[module].most_common(opts['top']):
+                self.stdout.write(f"  {micros / 1000:8.1f}  {name}")
@@ -0,0 +1,15 @@
+# equipment/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from EquipSense import search
+
+
+class Command(BaseCommand):
+    help = "Полностью пересобрать полнотекстовый индекс оборудования."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write("Полнотекстовый поиск для этой СУБД не поддерживается.")
+            return
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Проиндексировано объектов: {count}"))
@@ -0,0 +1,17 @@
+# equipment/management/commands/reconcile_counters.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from EquipSense import counters
+
+
+class Command(BaseCommand):
+    help = "Пересчитать счётчики дашбордов с нуля и показать расхождения."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = counters.reconcile()
+        for name, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(
+            "Расхождений нет" if not drift else f"Исправлено счётчиков: {len(drift)}"))
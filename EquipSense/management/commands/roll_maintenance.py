@@ -0,0 +1,19 @@
+# equipment/management/commands/roll_maintenance.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from EquipSense.maintenance import roll_forward
+
+
+class Command(BaseCommand):
+    help = "Сдвинуть наступившие даты планового обслуживания (запускать раз в сутки)."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            stats = roll_forward()
+        self.stdout.write(self.style.SUCCESS(
+            "Заполнено: {filled}, сдвинуто: {rolled}, сброшено: {cleared}".format(**stats)
+            + f" за {time.perf_counter() - started:.2f} с"))
@@ -0,0 +1,115 @@
+# equipment/management/commands/run_benchmarks.py
+import json
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from EquipSense.models import Equipment
+
+from .seed_benchmark_data import PREFIX
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def scenarios():
+    """(имя, пользователь, url) для замеряемых страниц."""
+    manager = User.objects.get(username=f'{PREFIX}-manager')
+    employee = (User.objects.filter(username__startswith=f'{PREFIX}-user-')
+                .annotate(n=Count('requests')).order_by('-n').first())
+    busiest = (Equipment.objects.annotate(n=Count('request'))
+               .order_by('-n').values_list('pk', flat=True).first())
+    if employee is None or busiest is None:
+        raise CommandError("Нет данных – сначала запустите seed_benchmark_data")
+    return [
+        ('equip_list', employee, reverse('EquipSense:equip_list')),
+        ('equip_detail', employee, reverse('EquipSense:equip_detail', args=[busiest])),
+        ('manager_dashboard', manager, reverse('EquipSense:manager_dashboard')),
+        ('pending_requests', manager, reverse('EquipSense:pending_requests')),
+        ('my_requests', employee, reverse('EquipSense:my_requests')),
+    ]
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы (без ограничения лога запросов)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(client, url, iterations):
+    timings, queries = [], []
+    for _ in range(iterations):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f"{url}: HTTP {response.status_code}")
+        timings.append(elapsed * 1000)
+        queries.append(counter.count)
+    return {'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'queries': max(queries)}
+
+
+class Command(BaseCommand):
+    help = ("Прогнать основные страницы через тестовый клиент и показать p50/p95 "
+            "и число SQL‑запросов; при наличии базовой линии – сравнить с ней.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--only', nargs='*', help="Имена сценариев")
+        parser.add_argument('--baseline', help="JSON с базовой линией для сравнения")
+        parser.add_argument('--save-baseline', help="Сохранить результаты в этот JSON")
+        parser.add_argument('--max-regression', type=float, default=25.0,
+                            help="Допустимый рост p95, %% (иначе код возврата 1)")
+
+    def handle(self, *args, **opts):
+        results = {}
+        for name, user, url in scenarios():
+            if opts['only'] and name not in opts['only']:
+                continue
+            client = Client(SERVER_NAME='localhost')
+            client.force_login(user)
+            for _ in range(opts['warmup']):
+                client.get(url)
+            results[name] = measure(client, url, opts['iterations'])
+
+        baseline = {}
+        if opts['baseline']:
+            with open(opts['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        regressions = []
+        self.stdout.write(f"{'view':<20}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}  vs baseline")
+        for name, r in results.items():
+            line = f"{name:<20}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['queries']:>9}"
+            base = baseline.get(name)
+            if base:
+                change = (r['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0
+                line += f"  p95 {change:+.1f}%  queries {r['queries'] - base['queries']:+d}"
+                if change > opts['max_regression'] or r['queries'] > base['queries']:
+                    regressions.append(name)
+            self.stdout.write(line)
+
+        if opts['save_baseline']:
+            with open(opts['save_baseline'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        if regressions:
+            raise CommandError(f"Регрессия: {', '.join(regressions)}")
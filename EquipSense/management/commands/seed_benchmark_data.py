@@ -0,0 +1,134 @@
+# equipment/management/commands/seed_benchmark_data.py
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from EquipSense import counters, search
+from EquipSense.models import Category, Equipment, Request, Tag
+
+PREFIX = 'bench'
+PASSWORD = 'bench'
+BATCH = 2000
+
+WORDS = ['Projector', 'Laptop', 'Camera', 'Tripod', 'Monitor', 'Router', 'Speaker',
+         'Microphone', 'Drone', 'Lens', 'Tablet', 'Printer', 'Scanner', 'Headset']
+LOCATIONS = ['Room A', 'Room B', 'Warehouse 1', 'Warehouse 2', 'Office 3']
+
+# Распределение статусов: прошлые заявки в основном закрыты,
+# будущие – ожидают или одобрены.
+PAST_STATUSES = [(Request.Status.RETURNED, 60), (Request.Status.REJECTED, 15),
+                 (Request.Status.IN_USE, 15), (Request.Status.APPROVED, 10)]
+FUTURE_STATUSES = [(Request.Status.PENDING, 55), (Request.Status.APPROVED, 35),
+                   (Request.Status.REJECTED, 10)]
+
+
+def _weighted(rnd, choices):
+    values, weights = zip(*choices)
+    return rnd.choices(values, weights)[0]
+
+
+class Command(BaseCommand):
+    help = ("Детерминированно сгенерировать пользователей, категории, теги, "
+            "оборудование и заявки для нагрузочных замеров.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--equipment', type=int, default=3000)
+        parser.add_argument('--requests', type=int, default=30000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true',
+                            help="Удалить ранее сгенерированные данные")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts['seed'])
+        with transaction.atomic():
+            if opts['clear']:
+                self._clear()
+            users = self._users(opts['users'])
+            categories = Category.objects.bulk_create(
+                Category(name=f'{PREFIX} category {i}') for i in range(opts['categories']))
+            tags = Tag.objects.bulk_create(
+                Tag(name=f'{PREFIX}-tag-{i}') for i in range(opts['tags']))
+            equipment = self._equipment(rnd, opts['equipment'], categories, tags)
+            created = self._requests(rnd, opts['requests'], users, equipment)
+            # bulk_create идёт в обход сигналов
+            counters.reconcile()
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"users={len(users)} categories={len(categories)} tags={len(tags)} "
+            f"equipment={len(equipment)} requests={created}"))
+
+    def _clear(self):
+        Request.objects.filter(user__username__startswith=f'{PREFIX}-').delete()
+        Request.objects.filter(equipment__serial_number__startswith=f'{PREFIX.upper()}-').delete()
+        Equipment.objects.filter(serial_number__startswith=f'{PREFIX.upper()}-').delete()
+        Category.objects.filter(name__startswith=f'{PREFIX} category').delete()
+        Tag.objects.filter(name__startswith=f'{PREFIX}-tag-').delete()
+        User.objects.filter(username__startswith=f'{PREFIX}-').delete()
+
+    def _users(self, count):
+        password = make_password(PASSWORD)
+        users = User.objects.bulk_create(
+            User(username=f'{PREFIX}-user-{i}', password=password) for i in range(count))
+        users.append(User.objects.create(username=f'{PREFIX}-manager', password=password))
+        employee, _ = Group.objects.get_or_create(name='employee')
+        manager, _ = Group.objects.get_or_create(name='manager')
+        employee.user_set.add(*users[:-1])
+        manager.user_set.add(users[-1])
+        return users
+
+    def _equipment(self, rnd, count, categories, tags):
+        today = timezone.now().date()
+        created = []
+        for start in range(0, count, BATCH):
+            batch = []
+            for i in range(start, min(start + BATCH, count)):
+                purchased = today - timedelta(days=rnd.randint(30, 2000))
+                equipment = Equipment(
+                    name=f'{rnd.choice(WORDS)} {rnd.choice(WORDS)} {i}',
+                    description=' '.join(rnd.choices(WORDS, k=20)).lower(),
+                    serial_number=f'{PREFIX.upper()}-{i}',
+                    model=f'M-{rnd.randint(100, 999)}',
+                    category=rnd.choice(categories) if categories else None,
+                    location=rnd.choice(LOCATIONS),
+                    quantity_total=rnd.randint(1, 20),
+                    purchase_date=purchased,
+                    warranty_expiry=purchased + timedelta(days=rnd.choice([365, 730, 1095])),
+                    maintenance_interval_days=rnd.choice([0, 0, 90, 180, 365]),
+                )
+                equipment.next_maintenance_due = equipment.compute_next_maintenance_due(today)
+                batch.append(equipment)
+            created.extend(Equipment.objects.bulk_create(batch))
+        Through = Equipment.tags.through
+        links = [Through(equipment_id=e.pk, tag_id=t.pk)
+                 for e in created for t in rnd.sample(tags, min(len(tags), rnd.randint(0, 3)))]
+        Through.objects.bulk_create(links, batch_size=BATCH)
+        return created
+
+    def _requests(self, rnd, count, users, equipment):
+        if not (users and equipment):
+            return 0
+        now = timezone.now().replace(microsecond=0)
+        for start in range(0, count, BATCH):
+            batch = []
+            for i in range(start, min(start + BATCH, count)):
+                # Старт – от 60 дней назад до 30 дней вперёд, длительность 1ч–7д;
+                # секунды = номер заявки, чтобы (оборудование, окно) было уникальным
+                begin = now + timedelta(minutes=rnd.randint(-60 * 24 * 60, 30 * 24 * 60),
+                                        seconds=i % 60)
+                end = begin + timedelta(hours=rnd.randint(1, 7 * 24), seconds=i // 60)
+                statuses = PAST_STATUSES if end < now else FUTURE_STATUSES
+                batch.append(Request(
+                    user=rnd.choice(users), equipment=rnd.choice(equipment),
+                    quantity=rnd.randint(1, 2), start_dt=begin, end_dt=end,
+                    status=_weighted(rnd, statuses),
+                ))
+            Request.objects.bulk_create(batch, ignore_conflicts=True)
+        return Request.objects.filter(user__in=users).count()
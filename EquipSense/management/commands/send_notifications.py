@@ -0,0 +1,31 @@
+# equipment/management/commands/send_notifications.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from EquipSense import outbox
+
+
+class Command(BaseCommand):
+    help = ("Отправить накопившиеся уведомления по заявкам (outbox): пачками, одно "
+            "письмо на пользователя, через одно соединение с почтовым сервером. "
+            "Запускать раз в минуту или с --loop как постоянный обработчик.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help="Не завершаться: проверять очередь каждые --interval с")
+        parser.add_argument('--interval', type=float, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            stats = outbox.drain(batch_size=options['batch_size'])
+            if stats['events'] or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    "Событий: {events}, писем: {messages}, ошибок: {failed}, "
+                    "без адреса: {skipped}".format(**stats)
+                    + f" за {time.perf_counter() - started:.2f} с"))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
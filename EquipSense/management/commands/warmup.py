@@ -0,0 +1,14 @@
+# equipment/management/commands/warmup.py
+from django.core.management.base import BaseCommand
+
+from EquipSense.warmup import warm
+
+
+class Command(BaseCommand):
+    help = ("Построить маршруты и скомпилировать шаблоны проекта, как при старте "
+            "wsgi.py. В сборке – проверка: ошибка в шаблоне или urls.py ломает сборку.")
+
+    def handle(self, *args, **options):
+        stats = warm()
+        self.stdout.write(f"routes={stats['routes']} templates={stats['templates']} "
+                          f"{stats['ms']:.1f}ms")
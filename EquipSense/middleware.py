@@ -1,23 +1,185 @@
 # equipment/middleware.py
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
 from django.shortcuts import redirect
 
+from . import routers
+from .db import start_connect_timer, stop_connect_timer
+from .instrumentation import QueryRecorder, start_template_timer, stop_template_timer
+from .roles import aget_role, get_role
+
+logger = logging.getLogger('EquipSense.sql')
+
+LOGIN_PATH = '/accounts/login/'
+
 
 class RoleRedirectMiddleware:
     """
     После успешного login перенаправляет пользователя в нужный раздел.
+    Работает и в синхронном, и в асинхронном стеке (под ASGI пользователь и
+    роль читаются через request.auser() / roles.aget_role без sync‑ORM).
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
 
-        if request.path == '/accounts/login/' and request.user.is_authenticated:
-            if request.user.is_superuser or request.user.groups.filter(name='administrator').exists():
-                return redirect('EquipSense:admin_dashboard')
-            elif request.user.groups.filter(name='manager').exists():
-                return redirect('EquipSense:manager_dashboard')
-            else:
-                return redirect('EquipSense:employee_dashboard')
+        if request.path == LOGIN_PATH and request.user.is_authenticated:
+            return self._redirect(get_role(request.user))
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
 
+        if request.path == LOGIN_PATH:
+            user = await request.auser()
+            if user.is_authenticated:
+                return self._redirect(await aget_role(user))
         return response
+
+    @staticmethod
+    def _redirect(role):
+        if role == 'admin':
+            return redirect('EquipSense:admin_dashboard')
+        elif role == 'manager':
+            return redirect('EquipSense:manager_dashboard')
+        else:
+            return redirect('EquipSense:employee_dashboard')
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read‑after‑write для чтения с реплик (см. routers.py): запрос с cookie
+    READ_AFTER_WRITE_COOKIE читает только основную БД; запрос, записавший
+    заявку, ставит эту cookie на READ_AFTER_WRITE_SECONDS.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.begin(pinned=settings.READ_AFTER_WRITE_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = routers.end(token)
+        return self._pin(request, response, state)
+
+    async def __acall__(self, request):
+        token = routers.begin(pinned=settings.READ_AFTER_WRITE_COOKIE in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = routers.end(token)
+        return self._pin(request, response, state)
+
+    @staticmethod
+    def _pin(request, response, state):
+        if state.wrote:
+            response.set_cookie(settings.READ_AFTER_WRITE_COOKIE, '1',
+                                max_age=settings.READ_AFTER_WRITE_SECONDS,
+                                secure=request.is_secure(), httponly=True, samesite='Lax')
+        return response
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Для выборки запросов (SQL_INSTRUMENTATION_SAMPLE_RATE) считает SQL‑запросы,
+    время в БД и время рендеринга шаблонов, отдаёт их в заголовке
+    Server-Timing (вместе со временем установки новых соединений с БД,
+    см. EquipSense/db) и пишет в лог повторяющиеся формы запросов (похоже на N+1).
+    Ставится первым в MIDDLEWARE, чтобы учитывать запросы всех слоёв.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        self.n_plus_one_threshold = getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = start_template_timer()
+        connect_token = start_connect_timer()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                _wrap_connections(stack, recorder)
+                response = self.get_response(request)
+        finally:
+            template_time = stop_template_timer(token)
+            connects = stop_connect_timer(connect_token)
+        return self._report(request, response, recorder, template_time, connects, started)
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        token = start_template_timer()
+        connect_token = start_connect_timer()
+        started = time.perf_counter()
+        # Async ORM выполняет запросы в потоке sync_to_async (один на запрос),
+        # соединения там свои – обёртки ставим и снимаем в том же потоке
+        stack = ExitStack()
+        await sync_to_async(_wrap_connections)(stack, recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            template_time = stop_template_timer(token)
+            connects = stop_connect_timer(connect_token)
+        return self._report(request, response, recorder, template_time, connects, started)
+
+    def _report(self, request, response, recorder, template_time, connects, started):
+        total = time.perf_counter() - started
+        new_connections, connect_ms = connects
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"',
+            f'tpl;dur={template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+            f'conn;dur={connect_ms:.1f};desc="{new_connections} new"',
+        ])
+        repeated = recorder.repeated(self.n_plus_one_threshold)
+        if repeated:
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match else request.path
+            for shape, n in repeated:
+                logger.warning("Possible N+1 in %s: %d× %s", view, n, shape)
+        return response
+
+
+def _wrap_connections(stack, recorder):
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(recorder))
@@ -1,5 +1,6 @@
 # equipment/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User, Group
 from django.utils import timezone
 import uuid
@@ -29,6 +30,39 @@ class Tag(models.Model):
         return self.name
 
 
+class EquipmentQuerySet(models.QuerySet):
+    """Наборы оборудования с заранее посчитанными полями."""
+
+    def with_availability(self):
+        """
+        Аннотирует ``quantity_used`` (сколько единиц занято прямо сейчас) одним
+        подзапросом и подтягивает категорию и теги, чтобы шаблоны списка и
+        карточки не делали запросов на каждый объект.
+        """
+        used = (
+            Request.objects
+            .filter(Request.occupied_at(timezone.now()),
+                    equipment=models.OuterRef("pk"))
+            .order_by()
+            .values("equipment")
+            .annotate(total=models.Sum("quantity"))
+            .values("total")
+        )
+        return (
+            self.select_related("category")
+            .prefetch_related("tags")
+            .annotate(quantity_used=Coalesce(models.Subquery(used), 0))
+        )
+
+    def maintenance_due(self, until):
+        """Оборудование, которому обслуживание положено не позже ``until``."""
+        return self.filter(next_maintenance_due__lte=until)
+
+    def warranty_expiring(self, since, until):
+        """Оборудование с гарантией, истекающей в [since, until]."""
+        return self.filter(warranty_expiry__range=(since, until))
+
+
 class Equipment(models.Model):
     """Оборудование на складе"""
 
@@ -90,17 +124,41 @@ class Equipment(models.Model):
         default=0,
         help_text="Кол-во дней между профилактическими осмотрами (0 – без плана)"
     )
+    # Хранится, чтобы очередь обслуживания строилась индексным диапазонным
+    # запросом; пересчитывается в save() и командой roll_maintenance
+    next_maintenance_due = models.DateField(
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Дата следующего планового обслуживания",
+    )
 
     # Метки
     tags = models.ManyToManyField(Tag, blank=True, related_name="equipments")
 
     # Технические детали
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    # Меняется при любом изменении оборудования, его тегов и категории
+    # (см. signals.py); валидатор условных GET (conditional.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EquipmentQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Equipment"
         verbose_name_plural = "Equipments"
         ordering = ["name", "serial_number"]
+        indexes = [
+            # Ключи keyset‑пагинации списка оборудования (поле сортировки, pk)
+            models.Index(fields=["name", "id"], name="equipment_name_idx"),
+            models.Index(fields=["quantity_total", "id"], name="equipment_qty_idx"),
+            models.Index(fields=["purchase_date", "id"], name="equipment_purchase_idx"),
+            # Очередь обслуживания и отчёт по гарантии (диапазон по дате, pk)
+            models.Index(fields=["next_maintenance_due", "id"], name="equipment_maint_due_idx"),
+            models.Index(fields=["warranty_expiry", "id"], name="equipment_warranty_idx"),
+            # MAX(updated_at) для ETag/Last-Modified
+            models.Index(fields=["updated_at"], name="equipment_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.serial_number or ''})".strip()
@@ -112,9 +170,12 @@ class Equipment(models.Model):
     @property
     def quantity_available(self) -> int:
         """Сколько единиц сейчас свободно"""
+        # Если объект получен через with_availability() – запрос не нужен
+        if "quantity_used" in self.__dict__:
+            return self.quantity_total - self.quantity_used
         used = Request.objects.filter(
+            Request.occupied_at(timezone.now()),
             equipment=self,
-            status__in=[Request.Status.APPROVED, Request.Status.IN_USE]
         ).aggregate(models.Sum("quantity"))["quantity__sum"] or 0
         return self.quantity_total - used
 
@@ -125,17 +186,30 @@ class Equipment(models.Model):
         from django.utils import timezone
         return self.warranty_expiry >= timezone.now().date()
 
-    @property
-    def next_maintenance_due(self):
+    def compute_next_maintenance_due(self, today=None):
         """Дата следующего планового обслуживания (если задан интервал)."""
         if not self.maintenance_interval_days or not self.purchase_date:
             return None
-        from datetime import timedelta, date
-        days_since_purchase = (timezone.now().date() - self.purchase_date).days
+        from datetime import timedelta
+        today = today or timezone.localdate()
+        days_since_purchase = (today - self.purchase_date).days
         intervals_passed = days_since_purchase // self.maintenance_interval_days
         next_due = self.purchase_date + timedelta(days=(intervals_passed + 1) * self.maintenance_interval_days)
         return next_due
 
+    def save(self, *args, **kwargs):
+        self.next_maintenance_due = self.compute_next_maintenance_due()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "next_maintenance_due" not in update_fields:
+            kwargs["update_fields"] = {*update_fields, "next_maintenance_due"}
+        # Атомарно вместе с обработчиками сигналов (счётчики дашбордов)
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
 
 class Request(models.Model):
     """Заявка на выдачу оборудования"""
@@ -157,13 +231,121 @@ class Request(models.Model):
                               choices=Status.choices,
                               default=Status.PENDING)
     comment = models.TextField(blank=True, null=True)
+    # Когда выданная заявка помечена просроченной (команда advance_requests)
+    overdue_at = models.DateTimeField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        # Индекс уникальности служит и выборке пересекающихся заявок
+        # по оборудованию и окну времени (availability.py)
         unique_together = ('equipment', 'start_dt', 'end_dt')
+        indexes = [
+            # MAX(updated_at) для ETag/Last-Modified
+            models.Index(fields=['updated_at'], name='request_updated_idx'),
+            # Версия кэша шкалы занятости: COUNT и MAX(updated_at) по
+            # оборудованию (timeline.versions)
+            models.Index(fields=['equipment', 'updated_at'], name='request_equip_updated_idx'),
+            # Очередь заявок по статусу, новые сверху (панель менеджера,
+            # «Ожидают подтверждения»); см. audit_queries
+            models.Index(fields=['status', '-created_at'], name='request_status_created_idx'),
+            # «Мои заявки» с фильтром по статусу
+            models.Index(fields=['user', 'status', '-created_at'],
+                         name='request_user_status_idx'),
+            # Лента API: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='request_created_idx'),
+            # Переходы по времени (advance_requests): начало одобренных
+            # заявок и конец выданных
+            models.Index(fields=['status', 'start_dt'], name='request_status_start_idx'),
+            models.Index(fields=['status', 'end_dt'], name='request_status_end_idx'),
+        ]
 
     def __str__(self):
         return f'{self.equipment.name} x{self.quantity} от {self.start_dt:%d.%m.%Y %H:%M}'
+
+    # Сохранение и удаление атомарны вместе с обработчиками сигналов
+    # (счётчики дашбордов обновляются в той же транзакции).
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+    @classmethod
+    def occupied_at(cls, moment):
+        """
+        Условие «заявка занимает оборудование в момент ``moment``»:
+        одобренная заявка, чьё окно накрывает момент, либо уже выданная.
+        """
+        return (models.Q(status=cls.Status.IN_USE)
+                | models.Q(status=cls.Status.APPROVED,
+                           start_dt__lte=moment, end_dt__gt=moment))
+
+
+class Counter(models.Model):
+    """
+    Предвычисленный счётчик для дашбордов (кол-во оборудования, пользователей,
+    заявок по статусам). Поддерживается сигналами, см. counters.py.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Counter"
+        verbose_name_plural = "Counters"
+
+    def __str__(self):
+        return f'{self.name}={self.value}'
+
+
+class ScheduledJob(models.Model):
+    """
+    Состояние периодической команды: аренда лидера (кто выполняет команду
+    и до какого момента) и итог последнего запуска. См. leader.py.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_started_at = models.DateTimeField(blank=True, null=True)
+    last_duration_ms = models.FloatField(blank=True, null=True)
+    last_stats = models.JSONField(default=dict, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Notification(models.Model):
+    """
+    Исходящее уведомление (outbox). Пишется в той же транзакции, что и
+    смена статуса заявки; отправляется командой send_notifications.
+    """
+
+    class Kind(models.TextChoices):
+        APPROVED = 'approved', 'одобрена'
+        REJECTED = 'rejected', 'отклонена'
+        OVERDUE = 'overdue', 'срок возврата истёк'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Доставка: следующая попытка не раньше next_attempt_at, после
+    # отправки – sent_at
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Очередь неотправленных: sent_at IS NULL AND next_attempt_at <= now
+            models.Index(fields=['sent_at', 'next_attempt_at'], name='notification_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} #{self.request_id} {self.kind}'
@@ -0,0 +1,142 @@
+# equipment/outbox.py
+"""
+Уведомления пользователей об их заявках через outbox.
+
+Отправлять письмо прямо из approve/reject – значит добавлять задержку
+SMTP к клику менеджера и терять письмо, если транзакция откатилась (или
+слать письмо о том, чего не случилось). Поэтому смена статуса только
+добавляет строку Notification в той же транзакции (:func:`enqueue`), а
+команда ``send_notifications`` разбирает очередь (:func:`drain`):
+
+* берёт пачку готовых к отправке строк и «арендует» их, сдвигая
+  ``next_attempt_at`` на CLAIM_SECONDS – параллельный обработчик их не
+  возьмёт, а при падении обработчика они вернутся в очередь сами;
+* склеивает события одного пользователя в одно письмо;
+* отправляет все письма через одно соединение почтового бэкенда;
+* при ошибке откладывает события пользователя с экспоненциальной
+  задержкой; после MAX_ATTEMPTS попыток они остаются с ``last_error``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+BATCH_SIZE = 200
+CLAIM_SECONDS = 300
+MAX_ATTEMPTS = 6
+RETRY_BASE = 60      # секунды; удваивается с каждой попыткой
+RETRY_MAX = 3600
+
+
+def enqueue(kind, requests):
+    """
+    Поставить в очередь уведомление ``kind`` по каждой заявке из
+    ``requests`` (достаточно полей pk и user_id). Вызывать внутри
+    транзакции, меняющей статус.
+    """
+    Notification.objects.bulk_create(
+        Notification(user_id=req.user_id, request_id=req.pk, kind=kind) for req in requests)
+
+
+def retry_delay(attempts):
+    """Задержка перед попыткой номер ``attempts + 1``."""
+    return timedelta(seconds=min(RETRY_BASE * 2 ** (attempts - 1), RETRY_MAX))
+
+
+def _due(now):
+    return (Notification.objects
+            .filter(sent_at__isnull=True, attempts__lt=MAX_ATTEMPTS, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk'))
+
+
+def claim(batch_size=BATCH_SIZE, now=None):
+    """Арендовать до ``batch_size`` готовых уведомлений. Возвращает список."""
+    now = now or timezone.now()
+    claimed_until = now + timedelta(seconds=CLAIM_SECONDS)
+    with transaction.atomic():
+        pks = list(_due(now).select_for_update(skip_locked=True)
+                   .values_list('pk', flat=True)[:batch_size])
+        # Условие на next_attempt_at повторено: без блокировок строк
+        # (SQLite) строку уже мог арендовать другой обработчик
+        Notification.objects.filter(pk__in=pks, next_attempt_at__lte=now).update(
+            next_attempt_at=claimed_until)
+    return list(Notification.objects
+                .filter(pk__in=pks, next_attempt_at=claimed_until, sent_at__isnull=True)
+                .select_related('user', 'request__equipment')
+                .order_by('pk'))
+
+
+def compose(user, notifications):
+    """Одно письмо пользователю обо всех его событиях."""
+    lines = []
+    for note in notifications:
+        req = note.request
+        # Время в письме – в часовом поясе сайта, а не в UTC из БД
+        start, end = timezone.localtime(req.start_dt), timezone.localtime(req.end_dt)
+        lines.append(f"• Заявка #{req.pk}: {req.equipment.name} x{req.quantity}, "
+                     f"{start:%d.%m.%Y %H:%M} – {end:%d.%m.%Y %H:%M} – "
+                     f"{note.get_kind_display()}")
+    count = len(notifications)
+    subject = ("EquipSense: изменение по заявке" if count == 1
+               else f"EquipSense: изменения по заявкам ({count})")
+    body = (f"Здравствуйте, {user.get_full_name() or user.username}!\n\n"
+            + "\n".join(lines) + "\n")
+    return mail.EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def _reopen(connection):
+    # После ошибки SMTP‑сессия может быть разорвана – следующим письмам новая
+    try:
+        connection.close()
+        connection.open()
+    except Exception:
+        pass
+
+
+def drain(batch_size=BATCH_SIZE, connection=None):
+    """
+    Отправить все готовые уведомления. Возвращает {'events', 'messages',
+    'failed', 'skipped'}: событий, отправленных писем, событий с ошибкой
+    отправки и событий пользователей без адреса.
+    """
+    stats = {'events': 0, 'messages': 0, 'failed': 0, 'skipped': 0}
+    connection = connection or mail.get_connection()
+    with connection:
+        while True:
+            batch = claim(batch_size)
+            if not batch:
+                return stats
+            stats['events'] += len(batch)
+            by_user = defaultdict(list)
+            for note in batch:
+                by_user[note.user].append(note)
+
+            sent, skipped = [], []
+            for user, notes in by_user.items():
+                pks = [note.pk for note in notes]
+                if not user.email:
+                    skipped += pks
+                    continue
+                try:
+                    connection.send_messages([compose(user, notes)])
+                except Exception as exc:
+                    attempts = max(note.attempts for note in notes) + 1
+                    Notification.objects.filter(pk__in=pks).update(
+                        attempts=attempts, last_error=repr(exc)[:500],
+                        next_attempt_at=timezone.now() + retry_delay(attempts))
+                    stats['failed'] += len(pks)
+                    _reopen(connection)
+                else:
+                    sent += pks
+                    stats['messages'] += 1
+
+            now = timezone.now()
+            Notification.objects.filter(pk__in=sent).update(sent_at=now, last_error='')
+            Notification.objects.filter(pk__in=skipped).update(
+                sent_at=now, last_error='нет адреса e-mail')
+            stats['skipped'] += len(skipped)
@@ -0,0 +1,165 @@
+# equipment/pagination.py
+"""
+Keyset‑пагинация («поиск по ключу») вместо OFFSET.
+
+Страница выбирается условием «строго после/до ключа (поле сортировки, pk)
+последней показанной строки», поэтому глубокие страницы стоят столько же,
+сколько первая. NULL‑значения поля сортировки всегда идут в конце и
+выбираются отдельным запросом (см. :meth:`KeysetPaginator._segments`).
+"""
+import base64
+import json
+
+from django.db.models import F
+from django.db.models.fields.tuple_lookups import Tuple, TupleGreaterThan, TupleLessThan
+
+
+class InvalidCursor(ValueError):
+    """Курсор из GET‑параметра не удалось разобрать."""
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value if value is None else str(value), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, field):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (None if value is None else field.to_python(value)), int(pk)
+    except Exception as exc:
+        raise InvalidCursor(token) from exc
+
+
+class KeysetPage:
+    """Страница результатов с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по ключу (``ordering``, pk).
+
+    ``ordering`` – имя поля модели или аннотации, опционально с «-» для
+    убывания. Для аннотации ``field`` – поле, которым разбирается курсор.
+    """
+
+    def __init__(self, queryset, ordering, per_page, field=None):
+        self.queryset = queryset
+        self.descending = ordering.startswith('-')
+        self.field_name = ordering.lstrip('-')
+        self.field = field or queryset.model._meta.get_field(self.field_name)
+        self.per_page = per_page
+
+    def _segments(self, reverse):
+        """
+        Отрезки выдачи в порядке обхода: строки с полем сортировки и строки
+        с NULL (только для nullable‑поля). NULL всегда в конце, поэтому при
+        обратном обходе отрезок NULL идёт первым.
+
+        Каждый отрезок – отдельный запрос с простым ORDER BY (поле, pk) без
+        NULLS FIRST/LAST: он совпадает с индексом (поле, id) при прямом или
+        обратном сканировании.
+        """
+        desc = self.descending != reverse
+        name = self.field_name
+        keys = [F(name), F('pk')]
+        ordered = [key.desc() if desc else key.asc() for key in keys]
+        if not self.field.null:
+            return [('value', self.queryset.order_by(*ordered))]
+        segments = [
+            ('value', self.queryset.filter(**{f'{name}__isnull': False}).order_by(*ordered)),
+            ('null', self.queryset.filter(**{f'{name}__isnull': True}).order_by(ordered[1])),
+        ]
+        return segments[::-1] if reverse else segments
+
+    def _seek(self, segment, qs, value, pk, desc):
+        """Строки отрезка строго после ключа (value, pk) в направлении обхода."""
+        if segment == 'null':
+            return qs.filter(**{'pk__lt' if desc else 'pk__gt': pk})
+        # Сравнение строк (поле, pk) > (value, pk) – диапазон по индексу
+        lookup = TupleLessThan if desc else TupleGreaterThan
+        return qs.filter(lookup(Tuple(F(self.field_name), F('pk')), (value, pk)))
+
+    def _cursor(self, obj):
+        return encode_cursor(getattr(obj, self.field_name), obj.pk)
+
+    def _queries(self, after, before):
+        """Запросы отрезков страницы после ключа, в порядке обхода."""
+        reverse = bool(before)
+        token = before or after
+        segments = self._segments(reverse)
+        if not token:
+            return [qs for _, qs in segments]
+        value, pk = decode_cursor(token, self.field)
+        current = 'null' if value is None else 'value'
+        names = [segment for segment, _ in segments]
+        if current not in names:
+            # NULL в курсоре для поля без NULL – остатка нет
+            return []
+        index = names.index(current)
+        desc = self.descending != reverse
+        head = self._seek(current, segments[index][1], value, pk, desc)
+        return [head] + [qs for _, qs in segments[index + 1:]]
+
+    def _rows(self, queries):
+        """Первые per_page + 1 строк (лишняя – признак продолжения) по отрезкам."""
+        rows = []
+        for qs in queries:
+            rows.extend(qs[:self.per_page + 1 - len(rows)])
+            if len(rows) > self.per_page:
+                break
+        return rows
+
+    async def _arows(self, queries):
+        rows = []
+        for qs in queries:
+            rows.extend([obj async for obj in qs[:self.per_page + 1 - len(rows)]])
+            if len(rows) > self.per_page:
+                break
+        return rows
+
+    def _build(self, rows, after, before):
+        has_more = len(rows) > self.per_page
+        if before:
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor(rows[-1]) if rows else None,
+                previous_cursor=self._cursor(rows[0]) if has_more else None,
+            )
+        rows = rows[:self.per_page]
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1]) if has_more else None,
+            previous_cursor=self._cursor(rows[0]) if after and rows else None,
+        )
+
+    def page(self, after=None, before=None):
+        """Страница после курсора ``after``, до курсора ``before`` либо первая."""
+        return self._build(self._rows(self._queries(after, before)), after, before)
+
+    async def apage(self, after=None, before=None):
+        """Асинхронный :meth:`page` (async ORM)."""
+        rows = await self._arows(self._queries(after, before))
+        return self._build(rows, after, before)
@@ -0,0 +1,149 @@
+# equipment/queryplan.py
+"""
+Разбор планов запросов для команды ``audit_queries``.
+
+Для каждого SELECT берётся план СУБД – ``EXPLAIN QUERY PLAN`` в SQLite,
+``EXPLAIN (FORMAT JSON)`` в PostgreSQL – и в нём ищутся:
+
+* ``scan`` – полный проход по таблице (SQLite ``SCAN t`` без индекса,
+  PostgreSQL ``Seq Scan``);
+* ``sort`` – сортировка без подходящего индекса (``USE TEMP B-TREE FOR
+  ORDER BY``, узел ``Sort``).
+
+Для помеченной таблицы предлагается составной индекс по правилу
+«равенства → сортировка → диапазоны»: столбцы из ``col = …``/``IN``
+(поля с choices – последними среди них), затем ORDER BY, затем
+``<``/``>``. Предложение пропускается, если
+существующий индекс модели уже начинается с тех же столбцов.
+"""
+import json
+import re
+import statistics
+import time
+
+from django.apps import apps
+
+_COLUMN_RE = r'"(?P<table>\w+)"\."(?P<column>\w+)"'
+_PREDICATE_RE = re.compile(_COLUMN_RE + r'\s*(?P<op>=|IN\b|<=|>=|<|>|IS\b)', re.IGNORECASE)
+_ORDER_RE = re.compile(_COLUMN_RE + r'(?P<desc>\s+DESC)?', re.IGNORECASE)
+_SQLITE_SCAN_RE = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+
+class Finding:
+    """Проблема в плане: ``kind`` – 'scan' или 'sort', ``table`` – таблица."""
+
+    def __init__(self, kind, table, detail):
+        self.kind = kind
+        self.table = table
+        self.detail = detail
+
+    def __repr__(self):
+        return f'Finding({self.kind!r}, {self.table!r}, {self.detail!r})'
+
+
+def explain(connection, sql, params):
+    """Текстовые строки плана и список :class:`Finding`."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return _postgres_findings(plan[0]['Plan'])
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return _sqlite_findings([row[-1] for row in cursor.fetchall()])
+
+
+def _sqlite_findings(details):
+    findings = []
+    for detail in details:
+        match = _SQLITE_SCAN_RE.match(detail)
+        if match:
+            findings.append(Finding('scan', match[1], detail))
+        elif detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+            findings.append(Finding('sort', None, detail))
+    return details, findings
+
+
+def _postgres_findings(node, lines=None, findings=None, depth=0):
+    lines = [] if lines is None else lines
+    findings = [] if findings is None else findings
+    label = node['Node Type'] + (f" on {node['Relation Name']}" if 'Relation Name' in node else '')
+    lines.append('  ' * depth + label)
+    if node['Node Type'] == 'Seq Scan':
+        findings.append(Finding('scan', node['Relation Name'], label))
+    elif node['Node Type'] in ('Sort', 'Incremental Sort'):
+        findings.append(Finding('sort', None, f"Sort by {', '.join(node.get('Sort Key', []))}"))
+    for child in node.get('Plans', []):
+        _postgres_findings(child, lines, findings, depth + 1)
+    return lines, findings
+
+
+def timed(connection, sql, params, repeat):
+    """Медианное время выполнения запроса, мс."""
+    timings = []
+    with connection.cursor() as cursor:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def _model_for_table(table):
+    for model in apps.get_models():
+        if model._meta.db_table == table:
+            return model
+    return None
+
+
+def suggest_index(sql, table):
+    """
+    Столбцы предлагаемого индекса для ``table`` (имена полей модели, '-' для
+    DESC) или None, если подходящих столбцов нет или индекс уже есть.
+    """
+    model = _model_for_table(table)
+    if model is None:
+        return None
+    upper = sql.upper()
+    order_at = upper.rfind(' ORDER BY ')
+    where, order = (sql[:order_at], sql[order_at:]) if order_at >= 0 else (sql, '')
+    where_at = where.upper().find(' WHERE ')
+    where = where[where_at:] if where_at >= 0 else ''
+
+    equality, ranges = [], []
+    for match in _PREDICATE_RE.finditer(where):
+        if match['table'] != table:
+            continue
+        target = equality if match['op'].upper() in ('=', 'IN', 'IS') else ranges
+        if match['column'] not in equality + ranges:
+            target.append(match['column'])
+    ordering = [('-' if m['desc'] else '') + m['column']
+                for m in _ORDER_RE.finditer(order) if m['table'] == table]
+
+    fields_by_column = {f.column: f for f in model._meta.concrete_fields}
+    # Среди равенств поля с choices (статус – 5 значений) идут после
+    # избирательных столбцов: (user, status, …) сужает выборку раньше
+    equality.sort(key=lambda c: bool(getattr(fields_by_column.get(c), 'choices', None)))
+    columns = []
+    for column in equality + [o.lstrip('-') for o in ordering] + ranges:
+        if column not in columns:
+            columns.append(column)
+    if not columns:
+        return None
+    by_column = {c: f.name for c, f in fields_by_column.items()}
+    descending = {o.lstrip('-') for o in ordering if o.startswith('-')}
+    fields = [('-' if c in descending else '') + by_column.get(c, c) for c in columns]
+
+    if _covered(model, [f.lstrip('-') for f in fields]):
+        return None
+    return model, fields
+
+
+def _covered(model, fields):
+    """Есть ли у модели индекс, ведущие столбцы которого – ``fields``."""
+    existing = [[f.lstrip('-') for f in index.fields] for index in model._meta.indexes]
+    existing += [list(together) for together in model._meta.unique_together]
+    existing += [[field.name] for field in model._meta.concrete_fields
+                 if field.db_index or field.unique]
+    return any(index[:len(fields)] == fields for index in existing)
@@ -0,0 +1,129 @@
+# equipment/roles.py
+"""
+Единая точка определения роли, групп и прав пользователя.
+
+Результат запоминается на объекте пользователя (живёт один HTTP‑запрос) и,
+если кэш общий для всех процессов (см. ``caching.py``), в кэше Django между
+запросами. Холодный кэш стоит один SQL‑запрос (группы, права групп и
+личные права объединены через UNION), тёплый – ни одного. Записи кэша
+сбрасываются сигналами при изменении групп и прав (см. ``signals.py``).
+С локальным кэшем процесса сброс дошёл бы только до одного воркера, и
+отозванные права менеджера оставались бы в силе в остальных, – поэтому
+тогда роль читается из БД один раз на запрос.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db.models import CharField, Value
+
+from . import caching
+
+CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 60 * 60)
+_MEMO_ATTR = '_equipsense_roles'
+
+
+def _cache_key(user_id):
+    return f'equipsense:roles:{user_id}'
+
+
+def _query(user):
+    """Группы и права пользователя одним запросом (UNION)."""
+    groups = Group.objects.filter(user=user).order_by().values_list(
+        'name', 'permissions__content_type__app_label', 'permissions__codename')
+    personal = Permission.objects.filter(user=user).order_by().values_list(
+        Value(None, output_field=CharField()), 'content_type__app_label', 'codename')
+    return groups.union(personal, all=True)
+
+
+def _collect(rows):
+    names, perms = set(), set()
+    for group, app_label, codename in rows:
+        if group is not None:
+            names.add(group)
+        if codename is not None:
+            perms.add(f'{app_label}.{codename}')
+    return {'groups': frozenset(names), 'perms': frozenset(perms)}
+
+
+_ANONYMOUS = {'groups': frozenset(), 'perms': frozenset()}
+
+
+def resolve(user):
+    """Словарь {'groups', 'perms'} для пользователя (пустой для анонимного)."""
+    if not user.is_authenticated:
+        return _ANONYMOUS
+    memo = getattr(user, _MEMO_ATTR, None)
+    if memo is None:
+        shared, key = caching.is_shared(), _cache_key(user.pk)
+        memo = cache.get(key) if shared else None
+        if memo is None:
+            memo = _collect(_query(user))
+            if shared:
+                cache.set(key, memo, CACHE_TIMEOUT)
+        setattr(user, _MEMO_ATTR, memo)
+    return memo
+
+
+async def aresolve(user):
+    """
+    Асинхронный :func:`resolve`. Заполняет ту же память на объекте
+    пользователя, поэтому после него синхронные in_group/get_role (шаблоны,
+    контекст‑процессоры) не обращаются к БД.
+    """
+    if not user.is_authenticated:
+        return _ANONYMOUS
+    memo = getattr(user, _MEMO_ATTR, None)
+    if memo is None:
+        shared, key = caching.is_shared(), _cache_key(user.pk)
+        memo = await cache.aget(key) if shared else None
+        if memo is None:
+            memo = _collect([row async for row in _query(user)])
+            if shared:
+                await cache.aset(key, memo, CACHE_TIMEOUT)
+        setattr(user, _MEMO_ATTR, memo)
+    return memo
+
+
+def user_groups(user):
+    return resolve(user)['groups']
+
+
+def in_group(user, *names):
+    """Состоит ли пользователь хотя бы в одной из групп ``names``."""
+    return not user_groups(user).isdisjoint(names)
+
+
+def get_role(user):
+    """Роль для интерфейса: 'admin', 'manager' или 'employee'."""
+    if user.is_superuser or in_group(user, 'administrator'):
+        return 'admin'
+    if in_group(user, 'manager'):
+        return 'manager'
+    return 'employee'
+
+
+async def aget_role(user):
+    await aresolve(user)
+    return get_role(user)
+
+
+def invalidate(user_ids):
+    """Сбросить кэш ролей для пользователей ``user_ids``."""
+    keys = [_cache_key(pk) for pk in user_ids]
+    if keys:
+        cache.delete_many(keys)
+
+
+class CachedPermissionBackend(ModelBackend):
+    """ModelBackend, который берёт права из :func:`resolve`."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(resolve(user_obj)['perms'])
+
+    async def aget_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set((await aresolve(user_obj))['perms'])
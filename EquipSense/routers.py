@@ -0,0 +1,91 @@
+# equipment/routers.py
+"""
+Чтение с реплик, запись – в основную БД.
+
+Реплики перечислены в ``settings.DATABASE_REPLICAS`` (алиасы DATABASES).
+На реплику уходят только чтения внутри HTTP‑запроса и вне транзакции:
+команды, фоновые задачи и проверки под блокировкой (services.py) читают
+основную БД.
+
+Read‑after‑write. Пока запрос ничего не записал, он читает реплику
+(сессии – всегда основную БД). После первой записи остаток запроса читает
+основную БД. Если записаны заявки (создание, отмена, возврат, одобрение)
+или пользователь (регистрация, вход), ReplicaPinningMiddleware
+ставит cookie READ_AFTER_WRITE_COOKIE на READ_AFTER_WRITE_SECONDS, и
+следующие запросы этого браузера тоже идут в основную БД – пользователь
+видит свою заявку, даже если реплика отстаёт.
+
+Для локальной проверки репликами могут служить две копии SQLite‑файла::
+
+    DATABASES['replica1'] = {'ENGINE': 'EquipSense.db.sqlite3', 'NAME': 'replica1.sqlite3'}
+    DATABASE_REPLICAS = ['replica1']
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Сессии читаются сразу после записи (вход в систему) – только основная БД
+PRIMARY_APPS = {'sessions'}
+# Запись этих моделей закрепляет пользователя за основной БД: заявки и
+# пользователь (регистрация, last_login при входе)
+STICKY_MODELS = {'EquipSense.Request', 'auth.User'}
+
+_state = ContextVar('equipsense_replica_state', default=None)
+
+
+class RequestState:
+    """Состояние маршрутизации одного HTTP‑запроса."""
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def begin(pinned=False):
+    """Начать запрос; ``pinned`` – читать только основную БД. Возвращает токен."""
+    return _state.set(RequestState(pinned))
+
+
+def end(token):
+    """Закончить запрос; вернуть его :class:`RequestState`."""
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        pool = replicas()
+        if state is None or state.pinned or not pool or model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(pool)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+            if model._meta.label in STICKY_MODELS:
+                state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {PRIMARY, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит репликацией с основной БД
+        if db in replicas():
+            return False
+        return None
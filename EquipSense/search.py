@@ -0,0 +1,171 @@
+# equipment/search.py
+"""
+Полнотекстовый индекс по оборудованию.
+
+Индексируются название, описание, модель, серийный номер и названия тегов.
+Индекс живёт в отдельной таблице, которая создаётся после миграций:
+
+* SQLite – виртуальная таблица FTS5, ранжирование ``bm25``;
+* PostgreSQL – таблица с колонкой ``tsvector`` и GIN‑индексом,
+  ранжирование ``ts_rank``.
+
+Синхронизация – через сигналы (см. ``signals.py``); массовые вставки
+(``bulk_create``) должны сами вызвать :func:`index_equipment`.
+Если бэкенд не поддерживается, поиск откатывается на ``icontains``.
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Equipment
+
+INDEX_TABLE = 'equipsense_equipment_search'
+BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def create_index_table(using=None):
+    """Создать таблицу индекса, если её ещё нет."""
+    conn = connections[using] if using else connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+                "name, description, extra, tokenize='unicode61 remove_diacritics 2')"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ("
+                "equipment_id bigint PRIMARY KEY "
+                f"REFERENCES {conn.ops.quote_name(Equipment._meta.db_table)} (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_gin "
+                f"ON {INDEX_TABLE} USING GIN (document)"
+            )
+
+
+def _documents(equipments):
+    for e in equipments:
+        extra = ' '.join(filter(None, [e.model, e.serial_number,
+                                       *(t.name for t in e.tags.all())]))
+        yield e.pk, e.name or '', e.description or '', extra
+
+
+def index_equipment(pks):
+    """Переиндексировать оборудование с указанными pk (удалённые – убрать)."""
+    if not is_supported():
+        return
+    pks = list(pks)
+    for i in range(0, len(pks), BATCH_SIZE):
+        batch = pks[i:i + BATCH_SIZE]
+        rows = list(_documents(Equipment.objects.filter(pk__in=batch)
+                               .prefetch_related('tags')))
+        _write(batch, rows)
+
+
+def remove_equipment(pks):
+    if is_supported():
+        _write(list(pks), [])
+
+
+def _write(pks, rows):
+    if not pks:
+        return
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})", pks)
+            cursor.executemany(
+                f"INSERT INTO {INDEX_TABLE} (rowid, name, description, extra) "
+                "VALUES (%s, %s, %s, %s)", rows)
+        else:
+            cursor.execute(f"DELETE FROM {INDEX_TABLE} WHERE equipment_id IN ({placeholders})", pks)
+            cursor.executemany(
+                f"INSERT INTO {INDEX_TABLE} (equipment_id, document) VALUES (%s, "
+                "setweight(to_tsvector('simple', %s), 'A') || "
+                "setweight(to_tsvector('simple', %s), 'B') || "
+                "setweight(to_tsvector('simple', %s), 'C'))", rows)
+
+
+def rebuild_index():
+    """Полностью пересобрать индекс. Возвращает число проиндексированных строк."""
+    if not is_supported():
+        return 0
+    create_index_table()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+    pks = list(Equipment.objects.order_by('pk').values_list('pk', flat=True))
+    index_equipment(pks)
+    return len(pks)
+
+
+def _match_query(text):
+    """Запрос с префиксным совпадением по каждому слову (логическое И)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{t}"*' for t in tokens)
+    return ' & '.join(f'{t}:*' for t in tokens)
+
+
+def _rank_sql():
+    """Релевантность строки оборудования (коррелированный подзапрос, больше – лучше)."""
+    equipment_id = (f"{connection.ops.quote_name(Equipment._meta.db_table)}."
+                    f"{connection.ops.quote_name('id')}")
+    if connection.vendor == 'sqlite':
+        # bm25 возвращает «чем меньше, тем релевантнее»; веса колонок 10/3/1
+        return (f"SELECT -bm25({INDEX_TABLE}, 10.0, 3.0, 1.0) FROM {INDEX_TABLE} "
+                f"WHERE {INDEX_TABLE} MATCH %s AND rowid = {equipment_id}")
+    return (f"SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {INDEX_TABLE} "
+            f"WHERE equipment_id = {equipment_id}")
+
+
+def _matching_ids_sql():
+    if connection.vendor == 'sqlite':
+        return f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s"
+    return (f"SELECT equipment_id FROM {INDEX_TABLE} "
+            "WHERE document @@ to_tsquery('simple', %s)")
+
+
+def filter_queryset(queryset, text):
+    """
+    Отфильтровать ``queryset`` оборудования по поисковой строке.
+    Без поддержки полнотекстового индекса – подстрока по названию/описанию.
+    """
+    if not is_supported():
+        return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
+    query = _match_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(pk__in=RawSQL(_matching_ids_sql(), [query]))
+
+
+def rank_queryset(queryset, text):
+    """
+    :func:`filter_queryset` с аннотацией ``search_rank`` (больше –
+    релевантнее) для сортировки списка. Без индекса ранг – 0.
+    """
+    query = _match_query(text) if is_supported() else None
+    queryset = filter_queryset(queryset, text)
+    if query is None:
+        return queryset.annotate(search_rank=RawSQL('0', [], output_field=FloatField()))
+    return queryset.annotate(search_rank=RawSQL(_rank_sql(), [query], output_field=FloatField()))
+
+
+def search(text, limit=20):
+    """Список (pk, rank) по убыванию релевантности."""
+    if _match_query(text) is None or not is_supported():
+        return []
+    return list(rank_queryset(Equipment.objects.all(), text)
+                .order_by('-search_rank', 'pk')
+                .values_list('pk', 'search_rank')[:limit])
@@ -0,0 +1,191 @@
+# equipment/services.py
+"""
+Операции над заявками, где проверка свободного оборудования и запись
+должны выполняться атомарно.
+
+Каждая операция берёт строку Equipment через ``select_for_update`` и только
+после этого считает занятость, поэтому параллельные запросы к одному
+оборудованию выстраиваются в очередь. На SQLite блокировки строк нет, там
+конфликт проявляется как ``OperationalError`` («database is locked») –
+такие попытки повторяются ограниченное число раз. Остальные
+``OperationalError`` (ошибки схемы, слишком сложный запрос) не
+повторяются и не выдаются за конфликт.
+"""
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+
+from . import counters, fragments, outbox
+from .availability import available_quantity, booked_intervals, sweep_peak
+from .models import Equipment, Notification, Request
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 0.05  # секунды, растёт линейно с номером попытки
+
+# Ошибки блокировок, после которых операцию имеет смысл повторить:
+# SQLSTATE взаимной блокировки, сбоя сериализации и lock_timeout (PostgreSQL)
+# и тексты ошибок SQLite/MySQL
+LOCK_SQLSTATES = {'40P01', '40001', '55P03'}
+LOCK_MESSAGES = ('database is locked', 'database table is locked',
+                 'deadlock detected', 'lock wait timeout', 'could not obtain lock')
+
+
+class ReservationConflict(Exception):
+    """Не удалось выполнить операцию из‑за конкурентных блокировок."""
+
+
+def is_lock_error(exc):
+    """Вызвана ли ``exc`` конкуренцией за блокировки (а не ошибкой схемы/SQL)."""
+    cause = exc.__cause__
+    sqlstate = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    if sqlstate in LOCK_SQLSTATES:
+        return True
+    message = str(exc).lower()
+    return any(text in message for text in LOCK_MESSAGES)
+
+
+def run_locked(operation, attempts=MAX_ATTEMPTS):
+    """
+    Выполнить ``operation()`` в транзакции, повторяя при конфликте блокировок.
+    Прочие ``OperationalError`` пробрасываются как есть.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return operation()
+        except OperationalError as exc:
+            if not is_lock_error(exc):
+                raise
+            if attempt == attempts:
+                raise ReservationConflict(
+                    f"Операция не выполнена за {attempts} попыток"
+                ) from exc
+            time.sleep(RETRY_DELAY * attempt)
+
+
+def _lock_equipment(equipment_id):
+    return Equipment.objects.select_for_update().get(pk=equipment_id)
+
+
+def _check_capacity(equipment, quantity, start_dt, end_dt, exclude_pk=None):
+    available = available_quantity(equipment, start_dt, end_dt, exclude_pk)
+    if quantity > available:
+        raise ValidationError(
+            f"Недостаточно свободного оборудования. Свободно: {available}"
+        )
+
+
+def create_reservation(user, equipment, quantity, start_dt, end_dt,
+                       comment=None, attempts=MAX_ATTEMPTS):
+    """Создать заявку (Pending), проверив доступность под блокировкой."""
+    def operation():
+        locked = _lock_equipment(equipment.pk)
+        _check_capacity(locked, quantity, start_dt, end_dt)
+        try:
+            with transaction.atomic():
+                return Request.objects.create(
+                    user=user, equipment=locked, quantity=quantity,
+                    start_dt=start_dt, end_dt=end_dt, comment=comment,
+                    status=Request.Status.PENDING,
+                )
+        except IntegrityError:
+            raise ValidationError("Заявка на это оборудование и время уже существует.")
+
+    return run_locked(operation, attempts)
+
+
+def approve_reservation(request_id, attempts=MAX_ATTEMPTS):
+    """
+    Одобрить заявку, если на её окне хватает свободного оборудования.
+
+    Блокировки берутся в порядке «оборудование → заявка», как и в
+    :func:`create_reservation`, чтобы не ловить взаимные блокировки.
+    """
+    def operation():
+        equipment_id = (Request.objects.filter(pk=request_id)
+                        .values_list('equipment_id', flat=True).get())
+        locked = _lock_equipment(equipment_id)
+        req = Request.objects.select_for_update().get(pk=request_id)
+        if req.status != Request.Status.PENDING:
+            raise ValidationError("Only pending requests can be approved.")
+        _check_capacity(locked, req.quantity, req.start_dt, req.end_dt, exclude_pk=req.pk)
+        req.status = Request.Status.APPROVED
+        req.save(update_fields=['status', 'updated_at'])
+        outbox.enqueue(Notification.Kind.APPROVED, [req])
+        return req
+
+    return run_locked(operation, attempts)
+
+
+def reject_reservation(request_id, attempts=MAX_ATTEMPTS):
+    """Отклонить заявку в ожидании."""
+    def operation():
+        req = Request.objects.select_for_update().get(pk=request_id)
+        if req.status != Request.Status.PENDING:
+            raise ValidationError("Only pending requests can be rejected.")
+        req.status = Request.Status.REJECTED
+        req.save(update_fields=['status', 'updated_at'])
+        outbox.enqueue(Notification.Kind.REJECTED, [req])
+        return req
+
+    return run_locked(operation, attempts)
+
+
+def bulk_review(decisions, attempts=MAX_ATTEMPTS):
+    """
+    Одобрить/отклонить пачку заявок одной транзакцией.
+
+    ``decisions`` – {pk: 'approve' | 'reject'}. Доступность для одобряемых
+    заявок проверяется за один проход: занятые интервалы загружаются одним
+    запросом, заявки одобряются по порядку подачи с учётом уже одобренных
+    в этой же пачке. Статусы меняются set‑based UPDATE ... WHERE status='P'.
+    Возвращает {pk: результат}, где результат – 'approved', 'rejected',
+    'insufficient', 'not_pending', 'not_found' или 'invalid_action'.
+    """
+    def operation():
+        results = {pk: 'invalid_action' for pk, action in decisions.items()
+                   if action not in ('approve', 'reject')}
+        wanted = [pk for pk in decisions if pk not in results]
+        found = {r.pk: r for r in Request.objects.filter(pk__in=wanted)}
+        results.update({pk: 'not_found' for pk in wanted if pk not in found})
+
+        # Блокируем оборудование в порядке pk – как и одиночные операции
+        equipment_ids = sorted({r.equipment_id for r in found.values()})
+        stock = dict(Equipment.objects.select_for_update().filter(pk__in=equipment_ids)
+                     .order_by('pk').values_list('pk', 'quantity_total'))
+        pending = {r.pk: r for r in Request.objects.select_for_update()
+                   .filter(pk__in=list(found), status=Request.Status.PENDING)}
+        results.update({pk: 'not_pending' for pk in found if pk not in pending})
+
+        to_reject = [pk for pk, r in pending.items() if decisions[pk] == 'reject']
+        candidates = sorted((r for r in pending.values() if decisions[r.pk] == 'approve'),
+                            key=lambda r: (r.created_at, r.pk))
+        booked = booked_intervals((r.equipment_id, r.start_dt, r.end_dt) for r in candidates)
+        to_approve = []
+        for r in candidates:
+            intervals = booked[r.equipment_id]
+            if sweep_peak(intervals, r.start_dt, r.end_dt) + r.quantity <= stock[r.equipment_id]:
+                intervals.append((r.start_dt, r.end_dt, r.quantity))
+                to_approve.append(r.pk)
+            else:
+                results[r.pk] = 'insufficient'
+
+        now = timezone.now()
+        for pks, status, label, kind in [
+                (to_approve, Request.Status.APPROVED, 'approved', Notification.Kind.APPROVED),
+                (to_reject, Request.Status.REJECTED, 'rejected', Notification.Kind.REJECTED)]:
+            if not pks:
+                continue
+            Request.objects.filter(pk__in=pks, status=Request.Status.PENDING).update(
+                status=status, updated_at=now)
+            # UPDATE идёт в обход сигналов – счётчики сдвигаем явно
+            counters.adjust(counters.request_status_deltas(
+                [Request.Status.PENDING] * len(pks), status))
+            fragments.bump(pending[pk].equipment_id for pk in pks)
+            outbox.enqueue(kind, (pending[pk] for pk in pks))
+            results.update({pk: label for pk in pks})
+        return results
+
+    return run_locked(operation, attempts)
@@ -0,0 +1,213 @@
+# equipment/signals.py
+"""Обработчики сигналов, поддерживающие производные данные в актуальном виде."""
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, fragments, roles, search
+from .models import Category, Equipment, Request, Tag
+
+
+# ----------------------------------------------------------------------
+# Полнотекстовый индекс
+# ----------------------------------------------------------------------
+
+@receiver(post_save, sender=Equipment)
+def index_saved_equipment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_equipment([instance.pk])
+
+
+@receiver(post_delete, sender=Equipment)
+def unindex_deleted_equipment(sender, instance, **kwargs):
+    search.remove_equipment([instance.pk])
+
+
+@receiver(m2m_changed, sender=Equipment.tags.through)
+def index_retagged_equipment(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            search.index_equipment([instance.pk])
+        return
+    # Изменение со стороны тега: instance – Tag, pk_set – оборудование
+    if action == 'pre_clear':
+        instance._tagged_pks = list(instance.equipments.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        search.index_equipment(getattr(instance, '_tagged_pks', []))
+    elif action in ('post_add', 'post_remove'):
+        search.index_equipment(pk_set or [])
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_equipment(instance.equipments.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_equipment(sender, instance, **kwargs):
+    instance._tagged_pks = list(instance.equipments.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def index_untagged_equipment(sender, instance, **kwargs):
+    search.index_equipment(getattr(instance, '_tagged_pks', []))
+
+
+# ----------------------------------------------------------------------
+# Кэш ролей и прав
+# ----------------------------------------------------------------------
+
+def _group_members(group_ids):
+    return list(User.objects.filter(groups__in=group_ids).values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def reset_roles_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            roles.invalidate([instance.pk])
+    elif sender is User.groups.through:
+        # instance – Group, pk_set – пользователи
+        if action == 'pre_clear':
+            roles.invalidate(_group_members([instance.pk]))
+        elif action in ('post_add', 'post_remove'):
+            roles.invalidate(pk_set or [])
+    elif action == 'pre_clear':
+        # instance – Permission, снимается у всех пользователей
+        roles.invalidate(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        roles.invalidate(pk_set or [])
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def reset_roles_on_group_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        roles.invalidate(_group_members([instance.pk]))
+    elif action == 'pre_clear':
+        roles.invalidate(_group_members(instance.group_set.values_list('pk', flat=True)))
+    else:
+        roles.invalidate(_group_members(pk_set or []))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def reset_roles_on_group_change(sender, instance, **kwargs):
+    roles.invalidate(_group_members([instance.pk]))
+
+
+@receiver(post_delete, sender=User)
+def reset_roles_on_user_delete(sender, instance, **kwargs):
+    roles.invalidate([instance.pk])
+
+
+# ----------------------------------------------------------------------
+# Счётчики дашбордов
+# ----------------------------------------------------------------------
+
+@receiver(post_init, sender=Request)
+def remember_request_status(sender, instance, **kwargs):
+    instance._counted_status = instance.status if instance.pk else None
+
+
+@receiver(post_save, sender=Request)
+def count_saved_request(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    before = instance._counted_status
+    if before != instance.status:
+        deltas = {counters.request_key(instance.status): 1}
+        if before is not None and not created:
+            deltas[counters.request_key(before)] = -1
+        counters.adjust(deltas, using)
+    instance._counted_status = instance.status
+
+
+@receiver(post_delete, sender=Request)
+def count_deleted_request(sender, instance, using=None, **kwargs):
+    counters.adjust({counters.request_key(instance._counted_status or instance.status): -1},
+                    using)
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_save, sender=User)
+def count_created_row(sender, instance, created, raw=False, using=None, **kwargs):
+    if created and not raw:
+        counters.adjust({counters.EQUIPMENT if sender is Equipment else counters.USERS: 1},
+                        using)
+
+
+@receiver(post_delete, sender=Equipment)
+@receiver(post_delete, sender=User)
+def count_deleted_row(sender, instance, using=None, **kwargs):
+    counters.adjust({counters.EQUIPMENT if sender is Equipment else counters.USERS: -1},
+                    using)
+
+
+# ----------------------------------------------------------------------
+# Кэш HTML‑фрагментов и updated_at оборудования
+# ----------------------------------------------------------------------
+
+def _related_changed(equipment_ids):
+    """Изменились теги/категория: сбросить фрагменты и сдвинуть updated_at."""
+    equipment_ids = list(equipment_ids)
+    if equipment_ids:
+        fragments.bump(equipment_ids)
+        Equipment.objects.filter(pk__in=equipment_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def bump_equipment_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragments.bump([instance.pk])
+
+
+@receiver(m2m_changed, sender=Equipment.tags.through)
+def mark_retagged_equipment(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _related_changed([instance.pk])
+    elif action == 'post_clear':
+        _related_changed(getattr(instance, '_tagged_pks', []))
+    elif action in ('post_add', 'post_remove'):
+        _related_changed(pk_set or [])
+
+
+@receiver(post_save, sender=Tag)
+def mark_renamed_tag_equipment(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        _related_changed(instance.equipments.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def mark_untagged_equipment(sender, instance, **kwargs):
+    _related_changed(getattr(instance, '_tagged_pks', []))
+
+
+@receiver(post_save, sender=Category)
+def mark_recategorized_equipment(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        _related_changed(instance.equipments.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_categorized_equipment(sender, instance, **kwargs):
+    # SET_NULL выполняется UPDATE'ом без сигналов – запоминаем оборудование заранее
+    instance._categorized_pks = list(instance.equipments.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def mark_uncategorized_equipment(sender, instance, **kwargs):
+    _related_changed(getattr(instance, '_categorized_pks', []))
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def bump_request_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragments.bump([instance.equipment_id])
@@ -0,0 +1,83 @@
+# equipment/startup.py
+"""
+Замер холодного старта процесса (команда ``profile_startup``).
+
+Запускается в отдельном интерпретаторе::
+
+    python -X importtime -m EquipSense.startup /accounts/login/
+
+и повторяет путь wsgi.py по фазам: чтение настроек, ``django.setup()``,
+создание WSGI‑обработчика (загрузка middleware), прогрев (если включён
+EQUIPSENSE_WARMUP) и два запроса к ``path`` – первый и уже «тёплый».
+Как и wsgi.py, сборщик мусора выключен до конца прогрева, если не задано
+EQUIPSENSE_GC_FREEZE=0.
+Сам модуль импортирует только стандартную библиотеку, так что замер
+начинается до Django. Результат – одна строка JSON в stdout; построчный
+отчёт ``-X importtime`` уходит в stderr.
+"""
+import gc
+import io
+import json
+import os
+import sys
+import time
+
+PHASES = ('settings', 'setup', 'handler', 'warmup', 'first_request', 'second_request')
+
+
+def _request(handler, path):
+    status = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'SERVER_PROTOCOL': 'HTTP/1.1', 'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    }
+    body = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+    b''.join(body)
+    body.close()
+    return int(status[0].split()[0])
+
+
+def measure(path):
+    freeze_gc = os.getenv('EQUIPSENSE_GC_FREEZE', '1') == '1'
+    if freeze_gc:
+        gc.disable()
+    timings = {}
+    mark = time.perf_counter()
+
+    def lap(name):
+        nonlocal mark
+        now = time.perf_counter()
+        timings[name] = round((now - mark) * 1000, 2)
+        mark = now
+
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    lap('settings')
+
+    import django
+    django.setup(set_prefix=False)
+    lap('setup')
+
+    from django.core.handlers.wsgi import WSGIHandler
+    handler = WSGIHandler()
+    lap('handler')
+
+    if getattr(settings, 'EQUIPSENSE_WARMUP', False):
+        from .warmup import warm
+        warm(getattr(settings, 'EQUIPSENSE_WARMUP_TEMPLATES', None))
+    if freeze_gc:
+        gc.freeze()
+        gc.enable()
+    lap('warmup')
+
+    status = _request(handler, path)
+    lap('first_request')
+    _request(handler, path)
+    lap('second_request')
+    return {'phases': timings, 'status': status}
+
+
+if __name__ == '__main__':
+    print(json.dumps(measure(sys.argv[1] if len(sys.argv) > 1 else '/accounts/login/')))
@@ -1,11 +1,41 @@
 # equipment/tests.py
+import csv
 import io
+import json
+import os
+import tempfile
+import tracemalloc
+from unittest import mock
 from django.urls import reverse
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User, Group, Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import OperationalError, connection
+from django.db.models import FloatField
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
-from .models import Equipment, Category, Tag
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+from . import (caching, counters, db, fragments, lifecycle, maintenance, outbox, queryplan,
+               roles, routers, search, timeline)
+from .availability import (booked_in_range, free_alternatives, free_stretches,
+                           nearest_free_windows, occupancy_segments, peak_booked,
+                           peak_booked_many, sweep_peak)
+from .forms import RequestForm
+from .importer import import_equipment, iter_rows
+from .instrumentation import normalize_sql
+from .management.commands.bench_reservations import approve_concurrently, reserve_concurrently
+from .models import Counter, Equipment, Category, Tag, Request, Notification, ScheduledJob
+from .pagination import KeysetPaginator
+from .services import ReservationConflict, bulk_review, run_locked
+from .routers import ReplicaRouter
 
 
 class EquipListViewTests(TestCase):
@@ -153,3 +183,1669 @@ class EquipCreateViewTests(TestCase):
         # Должен редиректить на страницу логина
         self.assertRedirects(response, f'/accounts/login/?next={url}')
 
+
+class EquipAvailabilityQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cat = Category.objects.create(name='Projector')
+        tag = Tag.objects.create(name='HDMI')
+        start = timezone.now()
+        for i in range(1, 4):
+            equip = Equipment.objects.create(name=f'Equip{i}', quantity_total=10,
+                                             category=cat, serial_number=str(i))
+            equip.tags.add(tag)
+            Request.objects.create(user=cls.user, equipment=equip, quantity=i,
+                                   start_dt=start - timedelta(hours=i),
+                                   end_dt=start + timedelta(hours=i),
+                                   status=Request.Status.APPROVED)
+            Request.objects.create(user=cls.user, equipment=equip, quantity=5,
+                                   start_dt=start + timedelta(days=i),
+                                   end_dt=start + timedelta(days=i, hours=1),
+                                   status=Request.Status.PENDING)
+
+    def test_with_availability_matches_property(self):
+        for equip in Equipment.objects.with_availability():
+            fresh = Equipment.objects.get(pk=equip.pk)
+            self.assertEqual(equip.quantity_available, fresh.quantity_available)
+
+    def test_list_query_count_does_not_grow(self):
+        """Число запросов страницы списка не зависит от числа карточек."""
+        self.client.login(username='usr', password='pwd')
+        url = reverse('EquipSense:equip_list')
+        self.client.get(url)
+        cache.clear()  # сравниваем страницы с холодным кэшем фрагментов
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        extra = Equipment.objects.create(name='Equip9', quantity_total=1, serial_number='9')
+        extra.tags.add(Tag.objects.get())
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(small), len(large))
+        self.assertContains(response, 'Доступно: 9 / 10')
+
+
+class AvailabilityEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.equip = Equipment.objects.create(name='Camera', quantity_total=5)
+        cls.t0 = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        for hours, qty, status in [((0, 4), 2, Request.Status.APPROVED),
+                                   ((2, 6), 2, Request.Status.APPROVED),
+                                   ((6, 8), 3, Request.Status.APPROVED),
+                                   ((1, 3), 5, Request.Status.PENDING)]:
+            Request.objects.create(user=cls.user, equipment=cls.equip, quantity=qty,
+                                   start_dt=cls.at(hours[0]), end_dt=cls.at(hours[1]),
+                                   status=status)
+
+    @classmethod
+    def at(cls, hours):
+        return cls.t0 + timedelta(hours=hours)
+
+    def test_sweep_peak_half_open(self):
+        intervals = [(1, 3, 2), (3, 5, 2), (2, 4, 1)]
+        self.assertEqual(sweep_peak(intervals, 0, 10), 3)
+        self.assertEqual(sweep_peak(intervals, 4, 10), 2)
+        self.assertEqual(sweep_peak(intervals, 5, 10), 0)
+
+    def test_peak_booked_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(peak_booked(self.equip.pk, self.at(0), self.at(8)), 4)
+        self.assertEqual(peak_booked(self.equip.pk, self.at(4), self.at(7)), 3)
+        self.assertEqual(peak_booked(self.equip.pk, self.at(8), self.at(9)), 0)
+
+    def test_peak_booked_many(self):
+        windows = [(self.equip.pk, self.at(0), self.at(3)),
+                   (self.equip.pk, self.at(5), self.at(9)),
+                   (self.equip.pk, self.at(10), self.at(11))]
+        with self.assertNumQueries(1):
+            result = peak_booked_many(windows)
+        self.assertEqual([result[w] for w in windows], [4, 3, 0])
+
+    def test_overdue_loan_occupies_until_returned(self):
+        now = timezone.now()
+        loan = Request.objects.create(user=self.user, equipment=self.equip, quantity=1,
+                                      start_dt=now - timedelta(days=2),
+                                      end_dt=now - timedelta(days=1),
+                                      status=Request.Status.IN_USE)
+        self.assertEqual(peak_booked(self.equip.pk, self.at(8), self.at(9)), 1)
+        self.assertEqual(peak_booked(self.equip.pk, self.at(6), self.at(7)), 4)
+        intervals = booked_in_range([self.equip.pk], self.at(8), self.at(9))[self.equip.pk]
+        self.assertEqual(occupancy_segments(intervals, self.at(8), self.at(9)),
+                         [(self.at(8), self.at(9), 1)])
+        form = RequestForm(data={'equipment': self.equip.pk, 'quantity': 5,
+                                 'start_dt': self.at(8), 'end_dt': self.at(10)})
+        self.assertFalse(form.is_valid())
+        # Возврат освобождает единицу
+        loan.status = Request.Status.RETURNED
+        loan.save()
+        self.assertEqual(peak_booked(self.equip.pk, self.at(8), self.at(9)), 0)
+
+    def test_form_accepts_non_overlapping_booking(self):
+        """Будущие заявки не мешают брони на свободное окно."""
+        def form(start, end, qty):
+            return RequestForm(data={'equipment': self.equip.pk, 'quantity': qty,
+                                     'start_dt': start, 'end_dt': end})
+        self.assertTrue(form(self.at(8), self.at(10), 5).is_valid())
+        self.assertFalse(form(self.at(2), self.at(3), 2).is_valid())
+        self.assertTrue(form(self.at(2), self.at(3), 1).is_valid())
+
+
+class ConcurrentApprovalTests(TransactionTestCase):
+    """Параллельные одобрения не должны превышать остаток на складе."""
+
+    def test_parallel_approvals_do_not_oversubscribe(self):
+        user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        equip = Equipment.objects.create(name='Drone', quantity_total=3)
+        start = timezone.now() + timedelta(days=1)
+        Request.objects.bulk_create(
+            Request(user=user, equipment=equip, quantity=1,
+                    start_dt=start + timedelta(seconds=i),
+                    end_dt=start + timedelta(hours=1, seconds=i))
+            for i in range(12)
+        )
+        ids = list(Request.objects.values_list('pk', flat=True))
+
+        stats = approve_concurrently(ids, threads=4)
+
+        approved = Request.objects.filter(status=Request.Status.APPROVED).count()
+        self.assertEqual(sum(stats.values()), len(ids))
+        self.assertEqual(approved, stats['approved'])
+        self.assertLessEqual(approved, equip.quantity_total)
+
+    def test_parallel_reservations_do_not_overbook(self):
+        user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        equip = Equipment.objects.create(name='Drone', quantity_total=3)
+        start = timezone.now() + timedelta(days=1)
+        windows = [(start + timedelta(seconds=i), start + timedelta(hours=1, seconds=i))
+                   for i in range(12)]
+
+        stats = reserve_concurrently(user, equip, windows, threads=4)
+
+        approved = Request.objects.filter(status=Request.Status.APPROVED).count()
+        self.assertEqual(sum(stats.values()), len(windows))
+        self.assertEqual(approved, stats['approved'])
+        self.assertLessEqual(approved, equip.quantity_total)
+        self.assertEqual(stats['conflict'], 0)
+        # Заявки, отклонённые при создании, не записаны
+        self.assertLessEqual(Request.objects.count(), len(windows))
+
+    def test_non_lock_errors_are_not_retried(self):
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such column: "missing"')
+
+        with self.assertRaises(OperationalError):
+            run_locked(broken)
+        self.assertEqual(len(calls), 1)
+
+        def locked():
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        calls.clear()
+        with mock.patch('EquipSense.services.RETRY_DELAY', 0), \
+                self.assertRaises(ReservationConflict):
+            run_locked(locked, attempts=3)
+        self.assertEqual(len(calls), 3)
+
+
+class EquipListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        base = timezone.now().date() - timedelta(days=100)
+        Equipment.objects.bulk_create(
+            Equipment(name=f'Item{i % 4}', description='laser' if i % 3 == 0 else '',
+                      quantity_total=i % 5 + 1, serial_number=str(i),
+                      purchase_date=None if i % 4 == 0 else base + timedelta(days=i % 7))
+            for i in range(23)
+        )
+        search.rebuild_index()
+
+    def walk(self, ordering, per_page=5):
+        """Проход всех страниц вперёд и обратно по курсорам."""
+        paginator = KeysetPaginator(Equipment.objects.all(), ordering, per_page)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(before=backwards[-1].previous_cursor))
+        return pages, backwards[::-1]
+
+    def test_keyset_covers_all_rows_in_order(self):
+        for ordering in ('name', '-quantity_total', 'purchase_date', '-purchase_date'):
+            pages, backwards = self.walk(ordering)
+            forward = [e.pk for page in pages for e in page]
+            field = ordering.lstrip('-')
+            expected = sorted(Equipment.objects.all(),
+                              key=lambda e: (getattr(e, field) is None, getattr(e, field) or 0, e.pk))
+            if ordering.startswith('-'):
+                nulls = [e for e in expected if getattr(e, field) is None]
+                expected = [e for e in expected if getattr(e, field) is not None][::-1] + nulls[::-1]
+            self.assertEqual(forward, [e.pk for e in expected], ordering)
+            self.assertEqual([[e.pk for e in p] for p in backwards],
+                             [[e.pk for e in p] for p in pages], ordering)
+
+    def test_seek_uses_index_range(self):
+        for ordering in ('purchase_date', '-purchase_date'):
+            paginator = KeysetPaginator(Equipment.objects.all(), ordering, 5)
+            first = paginator.page()
+            with CaptureQueriesContext(connection) as queries:
+                paginator.page(after=first.next_cursor)
+                paginator.page(before=first.next_cursor)
+            for query in queries:
+                sql = query['sql']
+                self.assertNotIn('NULLS', sql.upper())
+                # NULL выбираются своим запросом, а не через OR ... IS NULL
+                self.assertFalse('IS NULL' in sql.upper() and ' OR ' in sql.upper(), sql)
+                if connection.vendor == 'sqlite':
+                    _, findings = queryplan.explain(connection, sql, ())
+                    self.assertEqual(findings, [], sql)
+
+    def test_search_and_ordering(self):
+        self.client.login(username='usr', password='pwd')
+        url = reverse('EquipSense:equip_list')
+        response = self.client.get(url, {'search': 'laser', 'ordering': '-quantity_total'})
+        items = list(response.context['equipments'])
+        self.assertEqual(len(items), 8)
+        self.assertEqual([e.quantity_total for e in items],
+                         sorted((e.quantity_total for e in items), reverse=True))
+
+    def test_unknown_ordering_and_bad_cursor_fall_back(self):
+        self.client.login(username='usr', password='pwd')
+        url = reverse('EquipSense:equip_list')
+        response = self.client.get(url, {'ordering': 'uuid', 'after': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class EquipmentSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tag.objects.create(name='Wireless')
+        cls.projector = Equipment.objects.create(name='Epson projector', serial_number='EP-100',
+                                                 description='Office projector')
+        cls.mic = Equipment.objects.create(name='Shure microphone', model='SM58',
+                                           description='Stage microphone for the projector room')
+        cls.mic.tags.add(cls.tag)
+
+    def ids(self, text):
+        return set(search.filter_queryset(Equipment.objects.all(), text)
+                   .values_list('pk', flat=True))
+
+    def test_prefix_and_fields(self):
+        self.assertEqual(self.ids('proj'), {self.projector.pk, self.mic.pk})
+        self.assertEqual(self.ids('sm58'), {self.mic.pk})
+        self.assertEqual(self.ids('ep'), {self.projector.pk})
+        self.assertEqual(self.ids('wireless micro'), {self.mic.pk})
+
+    def test_ranking_prefers_name(self):
+        ranked = [pk for pk, _ in search.search('projector')]
+        self.assertEqual(ranked, [self.projector.pk, self.mic.pk])
+
+    def test_list_orders_search_by_relevance(self):
+        user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        self.client.force_login(user)
+        url = reverse('EquipSense:equip_list')
+        response = self.client.get(url, {'search': 'projector'})
+        self.assertEqual([e.pk for e in response.context['equipments']],
+                         [self.projector.pk, self.mic.pk])
+        # Явная сортировка важнее релевантности
+        response = self.client.get(url, {'search': 'projector', 'ordering': '-name'})
+        self.assertEqual([e.pk for e in response.context['equipments']],
+                         [self.mic.pk, self.projector.pk])
+
+        # Курсор по рангу ведёт на следующую страницу
+        ranked = search.rank_queryset(Equipment.objects.all(), 'projector')
+        paginator = KeysetPaginator(ranked, '-search_rank', 1, field=FloatField())
+        first = paginator.page()
+        second = paginator.page(after=first.next_cursor)
+        self.assertEqual([e.pk for e in first] + [e.pk for e in second],
+                         [self.projector.pk, self.mic.pk])
+        self.assertFalse(second.has_next())
+
+    def test_index_follows_changes(self):
+        self.tag.name = 'Bluetooth'
+        self.tag.save()
+        self.assertEqual(self.ids('bluetooth'), {self.mic.pk})
+        self.mic.tags.clear()
+        self.assertEqual(self.ids('bluetooth'), set())
+        self.projector.name = 'Benq beamer'
+        self.projector.save()
+        self.assertEqual(self.ids('beamer'), {self.projector.pk})
+        self.projector.delete()
+        self.assertEqual(self.ids('beamer'), set())
+
+
+@override_settings(EQUIPSENSE_SHARED_CACHE=True)
+class RoleCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name='manager')
+        cls.user = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.user.groups.add(cls.manager_group)
+        cls.perm = Permission.objects.get(codename='change_request')
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_cold_one_query_warm_none(self):
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(roles.get_role(user), 'manager')
+            self.assertFalse(user.has_perm('EquipSense.change_request'))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(roles.get_role(user), 'manager')
+            self.assertFalse(user.has_perm('EquipSense.change_request'))
+
+    def test_invalidated_by_group_and_permission_changes(self):
+        roles.resolve(self.fresh_user())
+        self.manager_group.permissions.add(self.perm)
+        self.assertTrue(self.fresh_user().has_perm('EquipSense.change_request'))
+
+        self.user.groups.remove(self.manager_group)
+        self.assertEqual(roles.get_role(self.fresh_user()), 'employee')
+
+        admins = Group.objects.create(name='administrator')
+        admins.user_set.add(self.user)
+        self.assertEqual(roles.get_role(self.fresh_user()), 'admin')
+
+    @override_settings(EQUIPSENSE_SHARED_CACHE=None)
+    def test_process_local_cache_is_not_trusted(self):
+        self.assertFalse(caching.is_shared())
+        # Запись, оставшаяся в кэше процесса, где сигнал о снятии прав не сработал
+        cache.set(roles._cache_key(self.user.pk),
+                  {'groups': frozenset({'manager'}), 'perms': frozenset()})
+        User.groups.through.objects.filter(user=self.user).delete()
+        self.assertEqual(roles.get_role(self.fresh_user()), 'employee')
+
+    def test_page_spends_at_most_one_role_query(self):
+        self.client.login(username='mgr', password='pwd')
+        url = reverse('EquipSense:equip_list')
+
+        def role_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertContains(response, 'Добавить оборудование')
+            return [q for q in ctx.captured_queries
+                    if 'auth_group' in q['sql'] or 'auth_permission' in q['sql']]
+
+        cache.clear()
+        self.assertLessEqual(len(role_queries()), 1)
+        self.assertEqual(role_queries(), [])
+
+
+class DashboardCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@test.com', 'pwd')
+        cls.equip = Equipment.objects.create(name='Tripod', quantity_total=3)
+
+    def new_request(self, hours, status=Request.Status.PENDING):
+        start = timezone.now() + timedelta(days=1, hours=hours)
+        return Request.objects.create(user=self.user, equipment=self.equip, status=status,
+                                      start_dt=start, end_dt=start + timedelta(hours=1))
+
+    def assertCountersExact(self):
+        actual = counters.compute()
+        self.assertEqual(counters.get_many(list(actual)), actual)
+
+    def test_counters_follow_lifecycle(self):
+        first, second = self.new_request(0), self.new_request(1)
+        self.new_request(2, status=Request.Status.APPROVED)
+        self.assertCountersExact()
+
+        first.status = Request.Status.APPROVED
+        first.save()
+        first.save()
+        second.delete()
+        Equipment.objects.create(name='Lamp')
+        User.objects.create_user('other').delete()
+        self.assertCountersExact()
+        self.assertEqual(counters.get_many([counters.request_key('A')]), {'requests.A': 2})
+
+    def test_reconcile_repairs_drift(self):
+        counters.adjust({counters.EQUIPMENT: 10})
+        drift = counters.reconcile()
+        self.assertEqual(drift, {counters.EQUIPMENT: (11, 1)})
+        self.assertCountersExact()
+
+    def test_adjust_creates_missing_counter(self):
+        Counter.objects.filter(name=counters.EQUIPMENT).delete()
+        counters.adjust({counters.EQUIPMENT: 2, counters.USERS: 0})
+        counters.adjust({counters.EQUIPMENT: 1})
+        self.assertEqual(counters.get_many([counters.EQUIPMENT]), {counters.EQUIPMENT: 3})
+
+    def test_counter_shares_row_transaction(self):
+        # Сбой сдвига счётчика откатывает и само оборудование
+        with mock.patch('EquipSense.counters.adjust', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            Equipment.objects.create(name='Lamp')
+        self.assertFalse(Equipment.objects.filter(name='Lamp').exists())
+        with mock.patch('EquipSense.counters.adjust', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            self.equip.delete()
+        self.assertTrue(Equipment.objects.filter(pk=self.equip.pk).exists())
+        self.assertCountersExact()
+
+    def test_post_migrate_reconcile_is_guarded(self):
+        from django.apps import apps as django_apps
+        from .apps import reconcile_counters
+        counters.adjust({counters.EQUIPMENT: 10})
+        reconcile_counters(sender=django_apps.get_app_config('auth'), using='default')
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]):
+            reconcile_counters(sender=django_apps.get_app_config('EquipSense'), using='default')
+        self.assertEqual(counters.get_many([counters.EQUIPMENT]), {counters.EQUIPMENT: 11})
+        reconcile_counters(sender=django_apps.get_app_config('EquipSense'), using='default')
+        self.assertCountersExact()
+
+    def test_admin_dashboard_reads_counters(self):
+        self.new_request(0)
+        self.client.login(username='admin', password='pwd')
+        response = self.client.get(reverse('EquipSense:admin_dashboard'))
+        self.assertEqual(response.context['pending_requests_count'], 1)
+        self.assertEqual(response.context['equipment_count'], 1)
+
+
+class BulkReviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(Group.objects.create(name='manager'))
+        cls.equip = Equipment.objects.create(name='Projector', quantity_total=2)
+        start = timezone.now() + timedelta(days=1)
+        cls.requests = [
+            Request.objects.create(user=cls.manager, equipment=cls.equip, quantity=1,
+                                   start_dt=start + timedelta(minutes=i),
+                                   end_dt=start + timedelta(hours=2, minutes=i))
+            for i in range(5)
+        ]
+        cls.requests[4].status = Request.Status.APPROVED
+        cls.requests[4].save()
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='mgr', password='pwd')
+
+    def test_bulk_review_reports_per_id(self):
+        r = self.requests
+        items = [{'id': r[0].pk, 'action': 'approve'},
+                 {'id': r[1].pk, 'action': 'approve'},
+                 {'id': r[2].pk, 'action': 'reject'},
+                 {'id': r[3].pk, 'action': 'maybe'},
+                 {'id': r[4].pk, 'action': 'approve'},
+                 {'id': 999, 'action': 'reject'}]
+        response = self.client.post(reverse('EquipSense:request_review_bulk'),
+                                    {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], {
+            str(r[0].pk): 'approved', str(r[1].pk): 'insufficient',
+            str(r[2].pk): 'rejected', str(r[3].pk): 'invalid_action',
+            str(r[4].pk): 'not_pending', '999': 'not_found',
+        })
+        self.assertEqual(Request.objects.get(pk=r[1].pk).status, Request.Status.PENDING)
+        actual = counters.compute()
+        self.assertEqual(counters.get_many(list(actual)), actual)
+
+    def test_large_batch_uses_bounded_query(self):
+        # 1500 окон: условие запроса не должно расти с размером пачки
+        others = [Equipment.objects.create(name=f'Cam {i}', quantity_total=3) for i in range(3)]
+        start = timezone.now() + timedelta(days=2)
+        Request.objects.bulk_create(
+            Request(user=self.manager, equipment=others[i % 3], quantity=1,
+                    start_dt=start + timedelta(minutes=i), end_dt=start + timedelta(minutes=i + 30))
+            for i in range(1500))
+        counters.reconcile()
+        pks = list(Request.objects.filter(equipment__in=others).values_list('pk', flat=True))
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = bulk_review({pk: 'approve' for pk in pks})
+        booked_sql = [q['sql'] for q in ctx.captured_queries
+                      if q['sql'].startswith('SELECT') and '"quantity"' in q['sql']
+                      and 'FOR UPDATE' not in q['sql']]
+        self.assertTrue(all(sql.count('"start_dt" <') <= 1 for sql in booked_sql))
+
+        # Окна по 30 мин. с шагом 1 мин., у каждого оборудования – шаг 3 мин.:
+        # одновременно пересекаются 10 заявок, одобряются не больше 3
+        for equip in others:
+            approved = Request.objects.filter(equipment=equip, status=Request.Status.APPROVED)
+            rows = approved.values_list('start_dt', 'end_dt', 'quantity')
+            self.assertLessEqual(sweep_peak(rows, start, start + timedelta(days=1)), 3)
+        self.assertEqual(set(results.values()), {'approved', 'insufficient'})
+        actual = counters.compute()
+        self.assertEqual(counters.get_many(list(actual)), actual)
+
+    def test_bad_payload(self):
+        response = self.client.post(reverse('EquipSense:request_review_bulk'),
+                                    {'ids': [1]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EquipmentImportTests(TestCase):
+    CSV = (
+        "name,quantity_total,serial_number,category,tags,purchase_date,warranty_expiry\n"
+        "Projector A,3,SN-1,Projector,HDMI;4K,2024-01-10,2026-01-10\n"
+        "Projector B,0,SN-2,Projector,,,\n"
+        "Projector C,1,SN-1,Projector,,,\n"
+        "Laptop,2,SN-3,Laptop,HDMI,2024-05-01,2023-05-01\n"
+        "Laptop 2,,SN-4,Laptop,USB,,\n"
+    )
+
+    def setUp(self):
+        cache.clear()
+        Equipment.objects.create(name='Old', serial_number='SN-4')
+
+    def test_import_csv_reports_bad_rows(self):
+        errors = []
+        stats = import_equipment(iter_rows(io.StringIO(self.CSV), 'csv'),
+                                 on_error=lambda line, msg: errors.append(line), batch_size=2)
+        self.assertEqual(stats, {'created': 1, 'skipped': 4})
+        # Номера строк файла: первая – заголовок
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        projector = Equipment.objects.get(serial_number='SN-1')
+        self.assertEqual(projector.category.name, 'Projector')
+        self.assertEqual(sorted(t.name for t in projector.tags.all()), ['4K', 'HDMI'])
+        self.assertEqual(counters.get_many([counters.EQUIPMENT])[counters.EQUIPMENT], 2)
+        self.assertEqual(set(search.filter_queryset(Equipment.objects.all(), '4k')), {projector})
+
+    def test_import_jsonl_batches(self):
+        lines = [json.dumps({'name': f'Cable {i}', 'serial_number': f'C-{i}',
+                             'tags': ['USB']}) for i in range(7)] + ['not json']
+        stats = import_equipment(iter_rows(io.StringIO('\n'.join(lines)), 'jsonl'),
+                                 batch_size=3)
+        self.assertEqual(stats, {'created': 7, 'skipped': 1})
+        self.assertEqual(Tag.objects.get(name='USB').equipments.count(), 7)
+
+    def test_conflicting_rows_fall_back_to_row_inserts(self):
+        # Серийный номер занят уже после проверки пачки (параллельный импорт)
+        lines = ['', json.dumps({'name': 'New', 'serial_number': 'SN-5'}),
+                 json.dumps({'name': 'Dup', 'serial_number': 'SN-4'}),
+                 json.dumps({'name': 'Next', 'serial_number': 'SN-6', 'tags': ['USB']})]
+        errors = {}
+        with mock.patch('EquipSense.importer._taken_serials', return_value=set()):
+            stats = import_equipment(iter_rows(io.StringIO('\n'.join(lines)), 'jsonl'),
+                                     on_error=errors.__setitem__)
+        self.assertEqual(stats, {'created': 2, 'skipped': 1})
+        self.assertEqual(list(errors), [3])
+        self.assertEqual(set(Equipment.objects.values_list('serial_number', flat=True)),
+                         {'SN-4', 'SN-5', 'SN-6'})
+        self.assertEqual(Tag.objects.get(name='USB').equipments.get().name, 'Next')
+        self.assertEqual(counters.get_many([counters.EQUIPMENT])[counters.EQUIPMENT], 3)
+
+    def test_overlong_category_or_tag_is_row_error(self):
+        rows = [{'name': 'A', 'category': 'x' * 81},
+                {'name': 'B', 'tags': ['ok', 'y' * 51]},
+                {'name': 'C', 'category': 'c' * 80, 'tags': ['t' * 50]}]
+        errors = {}
+        stats = import_equipment(enumerate(rows, start=1), on_error=errors.__setitem__)
+        self.assertEqual(stats, {'created': 1, 'skipped': 2})
+        self.assertEqual(sorted(errors), [1, 2])
+        self.assertTrue(errors[1].startswith('category:'))
+        self.assertTrue(errors[2].startswith('tags:'))
+        self.assertEqual(Equipment.objects.get(name='C').category.name, 'c' * 80)
+        self.assertFalse(Tag.objects.filter(name='ok').exists())
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@test.com', 'pwd')
+        cls.equip = Equipment.objects.create(name='Speaker', quantity_total=1)
+        cls.other = Equipment.objects.create(name='Mixer', quantity_total=1)
+
+    def setUp(self):
+        self.client.login(username='admin', password='pwd')
+
+    def generate(self, count, equipment):
+        start = timezone.now()
+        Request.objects.bulk_create(
+            Request(user=self.admin, equipment=equipment, comment='x' * 200,
+                    status=Request.Status.APPROVED if i % 2 else Request.Status.PENDING,
+                    start_dt=start + timedelta(seconds=i),
+                    end_dt=start + timedelta(hours=1, seconds=i))
+            for i in range(count)
+        )
+
+    def consume(self, params):
+        """Пиковая память при чтении выгрузки и число строк в ней."""
+        response = self.client.get(reverse('EquipSense:requests_export'), params)
+        self.assertTrue(response.streaming)
+        tracemalloc.start()
+        lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak, lines
+
+    @mock.patch('EquipSense.export.CHUNK_SIZE', 200)
+    def test_memory_does_not_grow_with_export_size(self):
+        self.generate(1000, self.equip)
+        small_peak, small_lines = self.consume({'equipment': self.equip.pk})
+        self.generate(9000, self.other)
+        large_peak, large_lines = self.consume({'equipment': self.other.pk})
+        self.assertEqual((small_lines, large_lines), (1001, 9001))
+        self.assertLess(large_peak, small_peak * 3)
+
+    def test_filters_and_json(self):
+        self.generate(10, self.equip)
+        response = self.client.get(reverse('EquipSense:requests_export'),
+                                   {'status': 'A', 'format': 'json'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({r['status'] for r in rows}, {'A'})
+
+        bad = self.client.get(reverse('EquipSense:requests_export'), {'date_from': 'yesterday'})
+        self.assertEqual(bad.status_code, 400)
+
+    @override_settings(TIME_ZONE='Asia/Novosibirsk')
+    def test_date_filters_use_local_day_bounds(self):
+        self.generate(3, self.equip)
+        tz = timezone.get_current_timezone()
+        local = [datetime(2025, 3, 9, 23, 30), datetime(2025, 3, 10, 0, 30),
+                 datetime(2025, 3, 10, 23, 59)]
+        for pk, moment in zip(Request.objects.order_by('pk').values_list('pk', flat=True), local):
+            Request.objects.filter(pk=pk).update(created_at=timezone.make_aware(moment, tz))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('EquipSense:requests_export'),
+                                       {'date_from': '2025-03-10', 'date_to': '2025-03-10',
+                                        'format': 'json'})
+            rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 2)
+        sql = ' '.join(q['sql'] for q in queries)
+        self.assertNotIn('django_datetime_cast_date', sql)
+
+    def test_equipment_export_round_trips_into_import(self):
+        self.equip.tags.add(Tag.objects.create(name='Audio'))
+        response = self.client.get(reverse('EquipSense:equipment_export'))
+        content = b''.join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([r['tags'] for r in rows], ['Audio', ''])
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_and_run(self):
+        out = io.StringIO()
+        call_command('seed_benchmark_data', users=5, categories=2, tags=3,
+                     equipment=20, requests=100, seed=1, stdout=out)
+        self.assertIn('equipment=20 requests=100', out.getvalue())
+        self.assertEqual(Request.objects.count(), 100)
+        self.assertEqual(counters.compute(), counters.get_many(list(counters.compute())))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            call_command('run_benchmarks', iterations=2, warmup=0,
+                         save_baseline=path, stdout=io.StringIO())
+            with open(path) as f:
+                self.assertEqual(set(json.load(f)),
+                                 {'equip_list', 'equip_detail', 'manager_dashboard',
+                                  'pending_requests', 'my_requests'})
+            report = io.StringIO()
+            call_command('run_benchmarks', iterations=2, warmup=0, baseline=path,
+                         max_regression=10_000, stdout=report)
+            self.assertIn('queries +0', report.getvalue())
+
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1.0, SQL_N_PLUS_ONE_THRESHOLD=5)
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        equip = Equipment.objects.create(name='Laptop', quantity_total=10)
+        start = timezone.now() + timedelta(days=1)
+        for i in range(6):
+            user = User.objects.create_user(f'user{i}')
+            Request.objects.create(user=user, equipment=equip, start_dt=start + timedelta(hours=i),
+                                   end_dt=start + timedelta(hours=i + 1))
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql('SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = \'x\'  LIMIT 21'),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?')
+
+    def test_server_timing_and_n_plus_one_log(self):
+        with self.assertLogs('EquipSense.sql', 'WARNING') as logs:
+            response = self.client.get(reverse('EquipSense:pending_requests'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+        self.assertIn('EquipSense:pending_requests', logs.output[0])
+        self.assertIn('auth_user', logs.output[0])
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0.0)
+    def test_disabled_when_not_sampled(self):
+        response = self.client.get(reverse('EquipSense:pending_requests'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class OccupancyTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(Group.objects.create(name='manager'))
+        cls.category = Category.objects.create(name='Audio')
+        cls.equip = Equipment.objects.create(name='Mic', quantity_total=5, category=cls.category)
+        cls.day = datetime(2030, 3, 4, tzinfo=timezone.get_current_timezone())
+        for hours, qty in [((10, 12), 1), ((11, 13), 2)]:
+            Request.objects.create(user=cls.manager, equipment=cls.equip, quantity=qty,
+                                   status=Request.Status.APPROVED,
+                                   start_dt=cls.day + timedelta(hours=hours[0]),
+                                   end_dt=cls.day + timedelta(hours=hours[1]))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_segments_merge_equal_neighbours(self):
+        h = lambda n: self.day + timedelta(hours=n)
+        intervals = [(h(1), h(3), 1), (h(3), h(5), 1), (h(4), h(6), 2)]
+        self.assertEqual(occupancy_segments(intervals, h(0), h(24)),
+                         [(h(1), h(4), 1), (h(4), h(5), 3), (h(5), h(6), 2)])
+
+    def test_occupancy_cached_and_invalidated(self):
+        h = lambda n: self.day + timedelta(hours=n)
+        window = (self.day, self.day + timedelta(days=14))
+        expected = [(h(10), h(11), 1), (h(11), h(12), 3), (h(12), h(13), 2)]
+        self.assertEqual(timeline.occupancy([self.equip.pk], *window)[self.equip.pk], expected)
+        # Тёплый кэш: только запрос версии
+        with self.assertNumQueries(1):
+            timeline.occupancy([self.equip.pk], *window)
+
+        Request.objects.filter(quantity=2).get().delete()
+        self.assertEqual(timeline.occupancy([self.equip.pk], *window)[self.equip.pk],
+                         [(h(10), h(12), 1)])
+
+    def test_change_made_elsewhere_is_seen(self):
+        h = lambda n: self.day + timedelta(hours=n)
+        window = (self.day, self.day + timedelta(days=7))
+        timeline.occupancy([self.equip.pk], *window)
+        # Как изменение в другом воркере: сигналы этого процесса не срабатывают
+        Request.objects.filter(quantity=2).update(status=Request.Status.REJECTED,
+                                                  updated_at=timezone.now())
+        self.assertEqual(timeline.occupancy([self.equip.pk], *window)[self.equip.pk],
+                         [(h(10), h(12), 1)])
+
+    def test_year_of_many_items_is_bounded(self):
+        items = Equipment.objects.bulk_create(
+            Equipment(name=f'Speaker {i}', quantity_total=2, category=self.category)
+            for i in range(40))
+        Request.objects.bulk_create(
+            Request(user=self.manager, equipment=e, status=Request.Status.APPROVED,
+                    start_dt=self.day + timedelta(days=7 * i, hours=20),
+                    end_dt=self.day + timedelta(days=7 * i + 9))
+            for i, e in enumerate(items))
+        window = (self.day, self.day + timedelta(days=366))
+        with self.assertNumQueries(2):
+            result = timeline.occupancy([e.pk for e in items] + [self.equip.pk], *window)
+        self.assertEqual(result[items[3].pk], [(self.day + timedelta(days=21, hours=20),
+                                                self.day + timedelta(days=30), 1)])
+        self.assertEqual(len(result[self.equip.pk]), 3)
+
+    def test_timeline_endpoints(self):
+        self.client.login(username='mgr', password='pwd')
+        params = {'from': '2030-03-04', 'to': '2030-03-11'}
+        response = self.client.get(reverse('EquipSense:equip_timeline', args=[self.equip.pk]),
+                                   params)
+        self.assertEqual(response.status_code, 200)
+        segments = response.json()['equipment'][0]['segments']
+        self.assertEqual([s['units'] for s in segments], [1, 3, 2])
+
+        response = self.client.get(reverse('EquipSense:category_timeline',
+                                           args=[self.category.pk]), params)
+        self.assertEqual(response.json()['equipment'][0]['id'], self.equip.pk)
+
+        for bad in ({'from': '2030-03-04'}, {'from': '2030-03-04', 'to': '2031-06-01'},
+                    {'from': 'x', 'to': 'y'}):
+            response = self.client.get(
+                reverse('EquipSense:equip_timeline', args=[self.equip.pk]), bad)
+            self.assertEqual(response.status_code, 400)
+
+
+class MaintenanceScheduleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(Group.objects.create(name='manager'))
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_due_date_stored_on_save(self):
+        e = Equipment.objects.create(name='Drill', purchase_date=self.today - timedelta(days=95),
+                                     maintenance_interval_days=30)
+        self.assertEqual(e.next_maintenance_due, self.today + timedelta(days=25))
+        e.maintenance_interval_days = 0
+        e.save(update_fields=['maintenance_interval_days'])
+        e.refresh_from_db()
+        self.assertIsNone(e.next_maintenance_due)
+
+    def test_roll_forward(self):
+        bought = self.today - timedelta(days=100)
+        rolled = Equipment.objects.create(name='A', purchase_date=bought,
+                                          maintenance_interval_days=30)
+        stale = Equipment.objects.create(name='B', purchase_date=bought,
+                                         maintenance_interval_days=7)
+        unplanned = Equipment.objects.create(name='C', purchase_date=bought)
+        Equipment.objects.filter(pk=rolled.pk).update(next_maintenance_due=self.today)
+        Equipment.objects.filter(pk=stale.pk).update(next_maintenance_due=None)
+        Equipment.objects.filter(pk=unplanned.pk).update(next_maintenance_due=self.today)
+
+        stats = maintenance.roll_forward(self.today)
+        self.assertEqual(stats, {'filled': 1, 'cleared': 1, 'rolled': 1})
+        due = dict(Equipment.objects.values_list('name', 'next_maintenance_due'))
+        self.assertEqual(due, {'A': self.today + timedelta(days=30),
+                               'B': stale.compute_next_maintenance_due(self.today),
+                               'C': None})
+        self.assertEqual(maintenance.roll_forward(self.today),
+                         {'filled': 0, 'cleared': 0, 'rolled': 0})
+
+    def test_maintenance_queue_and_warranty_report(self):
+        for i in range(3):
+            Equipment.objects.create(name=f'Due {i}', maintenance_interval_days=10,
+                                     purchase_date=self.today - timedelta(days=5 + i),
+                                     warranty_expiry=self.today + timedelta(days=10 * i))
+        Equipment.objects.create(name='Later', maintenance_interval_days=100,
+                                 purchase_date=self.today,
+                                 warranty_expiry=self.today - timedelta(days=1))
+        self.client.login(username='mgr', password='pwd')
+
+        with mock.patch('EquipSense.views.MAINTENANCE_PAGE_SIZE', 2):
+            response = self.client.get(reverse('EquipSense:maintenance_queue'), {'days': 7})
+            names = [e.name for e in response.context['equipments']]
+            self.assertEqual(names, ['Due 2', 'Due 1'])
+            response = self.client.get(reverse('EquipSense:maintenance_queue'),
+                                       {'days': 7, 'after': response.context['page_obj'].next_cursor})
+            self.assertEqual([e.name for e in response.context['equipments']], ['Due 0'])
+
+        response = self.client.get(reverse('EquipSense:warranty_report'), {'days': 15})
+        self.assertEqual([e.name for e in response.context['equipments']], ['Due 0', 'Due 1'])
+        self.assertTrue(all(e.is_under_warranty() for e in response.context['equipments']))
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.category = Category.objects.create(name='Audio')
+        cls.tag = Tag.objects.create(name='XLR')
+        cls.equips = [Equipment.objects.create(name=f'Mic {i}', quantity_total=3,
+                                               category=cls.category) for i in range(3)]
+        cls.equips[0].tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usr', password='pwd')
+
+    def test_cards_fetched_in_one_get_many(self):
+        url = reverse('EquipSense:equip_list')
+        self.client.get(url)
+        with mock.patch.object(fragments.cache, 'get_many',
+                               wraps=fragments.cache.get_many) as get_many, \
+                CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+        # Версии и сами карточки – по одному get_many, запроса тегов нет
+        self.assertEqual(get_many.call_count, 2)
+        self.assertFalse([q for q in warm.captured_queries if 'equipsense_tag' in q['sql']])
+        self.assertContains(response, 'XLR')
+
+    def test_signals_bump_versions(self):
+        e = self.equips[0]
+        changes = [
+            lambda: Equipment.objects.filter(pk=e.pk).get().save(),
+            lambda: e.tags.remove(self.tag),
+            lambda: self.tag.equipments.add(e),
+            lambda: self.tag.save(),
+            lambda: self.category.save(),
+            lambda: Request.objects.create(user=self.user, equipment=e,
+                                           start_dt=timezone.now(),
+                                           end_dt=timezone.now() + timedelta(hours=1)),
+        ]
+        for change in changes:
+            before = fragments.versions([e.pk])[e.pk]
+            change()
+            self.assertNotEqual(fragments.versions([e.pk])[e.pk], before)
+
+        before = fragments.versions([e.pk])[e.pk]
+        self.category.delete()
+        self.assertNotEqual(fragments.versions([e.pk])[e.pk], before)
+
+    def test_availability_never_cached(self):
+        e = self.equips[1]
+        url = reverse('EquipSense:equip_detail', args=[e.pk])
+        self.assertContains(self.client.get(url), 'bg-success">3<')
+        # Заявка, созданная в обход сигналов, всё равно видна сразу
+        Request.objects.bulk_create([Request(
+            user=self.user, equipment=e, quantity=2, status=Request.Status.IN_USE,
+            start_dt=timezone.now() - timedelta(hours=1), end_dt=timezone.now() + timedelta(hours=1))])
+        self.assertContains(self.client.get(url), 'bg-success">1<')
+        response = self.client.get(reverse('EquipSense:equip_list'))
+        self.assertContains(response, 'Доступно: 1 / 3')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.other = User.objects.create_user('other', 'other@test.com', 'pwd')
+        cls.tag = Tag.objects.create(name='HDMI')
+        cls.equip = Equipment.objects.create(name='Projector', quantity_total=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.login(username='usr', password='pwd')
+
+    def test_not_modified_with_constant_queries(self):
+        url = reverse('EquipSense:equip_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                             .status_code, 304)
+        for i in range(5):
+            Equipment.objects.create(name=f'Extra {i}')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(small), len(large))
+
+    def test_catalogue_validator_uses_counters_and_indexes(self):
+        start = timezone.now()
+        Request.objects.bulk_create(
+            Request(user=self.other, equipment=self.equip, status=status,
+                    start_dt=start + timedelta(hours=i), end_dt=start + timedelta(hours=i + 1))
+            for i, status in enumerate([Request.Status.APPROVED, Request.Status.PENDING] * 5))
+        counters.reconcile()
+        url = reverse('EquipSense:equip_list')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        on_requests = [q['sql'] for q in queries if '"EquipSense_request"' in q['sql']]
+        self.assertEqual(len(on_requests), 3)
+        for sql in on_requests:
+            self.assertNotIn('COUNT(', sql.upper())
+            if connection.vendor == 'sqlite':
+                _, findings = queryplan.explain(connection, sql, ())
+                self.assertEqual(findings, [], sql)
+
+    def test_changes_invalidate_validator(self):
+        list_url = reverse('EquipSense:equip_list')
+        detail_url = reverse('EquipSense:equip_detail', args=[self.equip.pk])
+        start = timezone.now() + timedelta(hours=1)
+        changes = [
+            lambda: self.equip.tags.add(self.tag),
+            lambda: self.tag.save(),
+            lambda: Request.objects.create(user=self.other, equipment=self.equip,
+                                           start_dt=start, end_dt=start + timedelta(hours=1),
+                                           status=Request.Status.APPROVED),
+        ]
+        for change in changes:
+            list_etag = self.client.get(list_url)['ETag']
+            detail_etag = self.client.get(detail_url)['ETag']
+            change()
+            self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag)
+                             .status_code, 200)
+            self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag)
+                             .status_code, 200)
+
+        # Окно одобренной заявки началось – свободное количество изменилось
+        etag = self.client.get(detail_url)['ETag']
+        self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        later = timezone.now() + timedelta(hours=1, minutes=30)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'bg-success">1<')
+
+    def test_relogin_and_pending_messages_bypass_validator(self):
+        url = reverse('EquipSense:equip_detail', args=[self.equip.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Новый вход меняет секрет CSRF – страница со старым токеном не годится
+        self.client.post(reverse('logout'))
+        self.client.login(username='usr', password='pwd')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pending_messages_disable_validator(self):
+        from django.contrib.messages import add_message, INFO
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.contrib.sessions.backends.cache import SessionStore
+        from django.test import RequestFactory
+        from . import conditional
+
+        request = RequestFactory().get('/')
+        request.user, request.session = self.user, SessionStore()
+        request._messages = FallbackStorage(request)
+        self.assertIsNotNone(conditional.equipment_etag(request, self.equip.pk))
+        add_message(request, INFO, 'Заявка отправлена')
+        self.assertIsNone(conditional.equipment_etag(request, self.equip.pk))
+        self.assertIsNone(conditional.equipment_last_modified(request, self.equip.pk))
+
+    def test_validator_is_per_user(self):
+        url = reverse('EquipSense:equip_detail', args=[self.equip.pk])
+        etag = self.client.get(url)['ETag']
+        self.client.login(username='other', password='pwd')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse('EquipSense:equip_detail', args=[999]))
+                         .status_code, 404)
+
+
+class JsonApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(Group.objects.create(name='manager'))
+        cls.manager.user_permissions.add(*Permission.objects.filter(
+            codename__in=['add_equipment', 'change_equipment', 'delete_equipment']))
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.category = Category.objects.create(name='Audio')
+        cls.tags = [Tag.objects.create(name=n) for n in ('XLR', 'USB')]
+        for i in range(5):
+            e = Equipment.objects.create(name=f'Mic {i}', quantity_total=3, category=cls.category,
+                                         description='x' * 500)
+            e.tags.add(*cls.tags)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_fields_include_and_cursor(self):
+        self.client.login(username='usr', password='pwd')
+        url = reverse('EquipSense:api_equipment_list')
+        response = self.client.get(url, {'fields': 'id,name,quantity_available',
+                                         'include': 'tags,category', 'limit': 3})
+        data = response.json()
+        self.assertEqual([r['name'] for r in data['results']], ['Mic 0', 'Mic 1', 'Mic 2'])
+        self.assertEqual(set(data['results'][0]),
+                         {'id', 'name', 'quantity_available', 'tags', 'category'})
+        self.assertEqual(data['results'][0]['category'], {'id': self.category.pk, 'name': 'Audio'})
+        self.assertEqual(len(data['results'][0]['tags']), 2)
+        self.assertEqual(data['results'][0]['quantity_available'], 3)
+
+        response = self.client.get(url, {'fields': 'id,name', 'after': data['next']})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Mic 3', 'Mic 4'])
+
+        # Выгрузка меньше HTML‑страницы списка
+        html = self.client.get(reverse('EquipSense:equip_list'))
+        self.assertLess(len(self.client.get(url).content), len(html.content))
+
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+
+    def test_list_query_count_is_fixed(self):
+        self.client.login(username='usr', password='pwd')
+        url = reverse('EquipSense:api_equipment_list')
+        params = {'fields': 'id,name,quantity_available', 'include': 'tags,category'}
+        self.client.get(url, params)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url, {**params, 'limit': 2})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url, {**params, 'limit': 5})
+        self.assertEqual(len(small), len(large))
+        select = next(q['sql'] for q in large.captured_queries
+                      if 'FROM "EquipSense_equipment"' in q['sql'])
+        self.assertNotIn('description', select)
+
+    def test_write_reuses_form_validation(self):
+        url = reverse('EquipSense:api_equipment_list')
+        self.client.login(username='usr', password='pwd')
+        self.assertEqual(self.client.post(url, {'name': 'Cam'},
+                                          content_type='application/json').status_code, 403)
+        self.client.login(username='mgr', password='pwd')
+        response = self.client.post(url, {'name': 'Cam', 'quantity_total': 0},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('quantity_total', response.json()['errors'])
+        response = self.client.post(url, {'name': 'Cam', 'quantity_total': 2,
+                                          'tags': [self.tags[0].pk]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        pk = response.json()['id']
+        detail = reverse('EquipSense:api_equipment_detail', args=[pk])
+        response = self.client.patch(detail, {'location': 'Shelf 2'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        cam = Equipment.objects.get(pk=pk)
+        self.assertEqual((cam.location, cam.quantity_total, list(cam.tags.all())),
+                         ('Shelf 2', 2, [self.tags[0]]))
+        self.assertEqual(self.client.delete(detail).status_code, 204)
+
+    def test_delete_equipment_with_requests_is_conflict(self):
+        equip = Equipment.objects.get(name='Mic 0')
+        start = timezone.now() + timedelta(days=1)
+        Request.objects.create(user=self.user, equipment=equip, start_dt=start,
+                               end_dt=start + timedelta(hours=1))
+        self.client.login(username='mgr', password='pwd')
+        response = self.client.delete(reverse('EquipSense:api_equipment_detail', args=[equip.pk]))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('error', response.json())
+        self.assertTrue(Equipment.objects.filter(pk=equip.pk).exists())
+
+    def test_requests_created_and_scoped(self):
+        equip = Equipment.objects.get(name='Mic 0')
+        start = timezone.now() + timedelta(days=1)
+        payload = {'equipment': equip.pk, 'quantity': 2, 'start_dt': start.isoformat(),
+                   'end_dt': (start + timedelta(hours=2)).isoformat()}
+        url = reverse('EquipSense:api_request_list')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        self.client.login(username='usr', password='pwd')
+        response = self.client.post(url, payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        Request.objects.filter(pk=response.json()['id']).update(status=Request.Status.APPROVED)
+        # Подсказки свободных окон нужны только странице с формой
+        with mock.patch('EquipSense.forms.nearest_free_windows') as windows:
+            response = self.client.post(
+                url, {**payload, 'start_dt': (start + timedelta(hours=1)).isoformat()},
+                content_type='application/json')
+        windows.assert_not_called()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Свободно: 1', response.json()['errors']['__all__'][0])
+
+        Request.objects.create(user=self.manager, equipment=equip, start_dt=start,
+                               end_dt=start + timedelta(minutes=5))
+        mine = self.client.get(url, {'include': 'equipment'}).json()['results']
+        self.assertEqual(len(mine), 1)
+        self.assertEqual(mine[0]['equipment'], {'id': equip.pk, 'name': 'Mic 0'})
+        self.client.login(username='mgr', password='pwd')
+        self.assertEqual(len(self.client.get(url).json()['results']), 2)
+
+
+class AsyncViewTests(TestCase):
+    """Асинхронные страницы (EQUIPSENSE_ASYNC_VIEWS), как их подключает asgi.py."""
+
+    @classmethod
+    def _reload_urls(cls):
+        import importlib
+        from django.urls import clear_url_caches
+        import EquipSense.urls
+        import EquipSenseWebApp.urls
+        importlib.reload(EquipSense.urls)
+        importlib.reload(EquipSenseWebApp.urls)
+        clear_url_caches()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(EQUIPSENSE_ASYNC_VIEWS=True))
+        cls._reload_urls()
+        cls.addClassCleanup(cls._reload_urls)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager_group = Group.objects.create(name='manager')
+        cls.employee_group = Group.objects.create(name='employee')
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(cls.manager_group)
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.user.groups.add(cls.employee_group)
+        cls.equip = Equipment.objects.create(name='Projector', quantity_total=2)
+        start = timezone.now() + timedelta(days=1)
+        Request.objects.create(user=cls.user, equipment=cls.equip, start_dt=start,
+                               end_dt=start + timedelta(hours=2),
+                               status=Request.Status.APPROVED)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_routes_use_async_views(self):
+        from asgiref.sync import iscoroutinefunction
+        from django.urls import resolve
+        for name, args in [('equip_list', []), ('equip_detail', [self.equip.pk]),
+                           ('my_requests', []), ('manager_dashboard', [])]:
+            match = resolve(reverse(f'EquipSense:{name}', args=args))
+            self.assertTrue(iscoroutinefunction(match.func), name)
+
+    async def test_list_and_detail_with_conditional_get(self):
+        await self.async_client.aforce_login(self.user)
+        for url in [reverse('EquipSense:equip_list'),
+                    reverse('EquipSense:equip_detail', args=[self.equip.pk])]:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, 'Projector')
+            cached = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+            self.assertEqual(cached.status_code, 304)
+
+        missing = await self.async_client.get(
+            reverse('EquipSense:equip_detail', args=[self.equip.pk + 100]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_my_requests_and_dashboards(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('EquipSense:my_requests'))
+        self.assertContains(response, 'Projector')
+        response = await self.async_client.get(reverse('EquipSense:employee_dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse('EquipSense:manager_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['approved_count'], 1)
+
+    async def test_role_redirect_after_login(self):
+        response = await self.async_client.post(reverse('login'),
+                                                {'username': 'mgr', 'password': 'pwd'})
+        self.assertRedirects(response, reverse('EquipSense:manager_dashboard'),
+                             fetch_redirect_response=False)
+
+
+class StartupTests(TestCase):
+    def test_warm_fills_template_cache_and_routes(self):
+        from django.template import engines
+        from .warmup import warm
+
+        stats = warm()
+        self.assertGreater(stats['routes'], 0)
+        self.assertGreater(stats['templates'], 0)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('equipment/equip_list.html', loader.get_template_cache)
+
+        out = io.StringIO()
+        call_command('warmup', stdout=out)
+        self.assertIn(f"templates={stats['templates']}", out.getvalue())
+
+    def test_warm_only_listed_templates(self):
+        from django.template import engines
+        from .warmup import warm
+
+        loader = engines.all()[0].engine.template_loaders[0]
+        loader.reset()
+        stats = warm(settings.EQUIPSENSE_WARMUP_TEMPLATES)
+        self.assertEqual(stats['templates'], len(settings.EQUIPSENSE_WARMUP_TEMPLATES))
+        self.assertIn('registration/login.html', loader.get_template_cache)
+        self.assertNotIn('equipment/user_list.html', loader.get_template_cache)
+
+    def test_lean_profile(self):
+        import importlib
+        lean = importlib.import_module('EquipSenseWebApp.settings_lean')
+        self.assertIn('django.contrib.admin', lean.INSTALLED_APPS)
+        self.assertNotIn('EquipSense.middleware.QueryInstrumentationMiddleware', lean.MIDDLEWARE)
+        loaders = lean.TEMPLATES[0]['OPTIONS']['loaders']
+        self.assertEqual(loaders[0][0], 'django.template.loaders.cached.Loader')
+        self.assertTrue(lean.EQUIPSENSE_WARMUP)
+
+        with mock.patch.dict(os.environ, {'EQUIPSENSE_ADMIN': '0'}):
+            lean = importlib.reload(lean)
+        self.assertNotIn('django.contrib.admin', lean.INSTALLED_APPS)
+        importlib.reload(lean)
+
+    def test_profile_startup(self):
+        from .management.commands.profile_startup import parse_importtime
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       100 |        100 |     django.db.models.fields\n"
+                  "import time:        50 |        150 |   django.db.models\n")
+        self.assertEqual(parse_importtime(stderr, 2), {'django.db': 150})
+
+        out = io.StringIO()
+        call_command('profile_startup', repeat=1, top=3, stdout=out)
+        report = out.getvalue()
+        for phase in ('setup', 'first_request', 'to first byte'):
+            self.assertIn(phase, report)
+
+
+class DbConnectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@test.com', 'pwd')
+
+    def setUp(self):
+        db.stats.reset()
+
+    def test_backend_measures_new_connections(self):
+        from django.db.utils import ConnectionHandler
+        handler = ConnectionHandler({'default': {'ENGINE': 'EquipSense.db.sqlite3',
+                                                 'NAME': ':memory:'}})
+        token = db.start_connect_timer()
+        try:
+            handler['default'].ensure_connection()
+        finally:
+            new_connections, _ = db.stop_connect_timer(token)
+            handler['default'].close()
+        self.assertEqual(new_connections, 1)
+        self.assertEqual(db.stats.as_dict()['connects'], 1)
+
+    def test_metrics_view_counts_reused_connections(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('EquipSense:db_metrics'))
+        self.assertEqual(response.status_code, 200)
+        metrics = response.json()
+        self.assertIsNone(metrics['pool'])
+        # Соединение теста открыто – запрос начался на уже готовом соединении
+        self.assertEqual(metrics['connections']['requests'], 1)
+        self.assertEqual(metrics['connections']['reuse_ratio'], 1.0)
+
+    @override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1.0)
+    def test_server_timing_reports_connections(self):
+        response = self.client.get(reverse('login'))
+        self.assertIn('conn;dur=0.0;desc="0 new"', response['Server-Timing'])
+
+    def test_benchmark(self):
+        out = io.StringIO()
+        call_command('bench_connections', iterations=5, stdout=out)
+        rows = {line.split()[0]: line.split() for line in out.getvalue().splitlines()[1:]}
+        self.assertEqual([rows[mode][5] for mode in ('per-request', 'persistent')], ['5', '5'])
+        # SQLite не закрывает базу в памяти, так что разница видна только по
+        # постоянным соединениям: одно на все запросы
+        self.assertEqual(rows['persistent'][4], '1')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_replica_until_first_write(self):
+        from django.contrib.sessions.models import Session
+        self.assertEqual(self.router.db_for_read(Equipment), 'default')  # вне запроса
+        token = routers.begin()
+        try:
+            self.assertEqual(self.router.db_for_read(Equipment), 'replica')
+            self.assertEqual(self.router.db_for_read(Session), 'default')
+            self.assertEqual(self.router.db_for_write(Equipment), 'default')
+            self.assertEqual(self.router.db_for_read(Equipment), 'default')
+        finally:
+            state = routers.end(token)
+        self.assertFalse(state.wrote)  # оборудование не закрепляет пользователя
+        self.assertFalse(self.router.allow_migrate('replica', 'EquipSense'))
+
+    def test_middleware_pins_after_request_write(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import ReplicaPinningMiddleware
+
+        def reader(request):
+            return HttpResponse(self.router.db_for_read(Equipment))
+
+        def writer(request):
+            self.router.db_for_write(Request)
+            return HttpResponse()
+
+        factory = RequestFactory()
+        self.assertEqual(ReplicaPinningMiddleware(reader)(factory.get('/')).content, b'replica')
+        response = ReplicaPinningMiddleware(writer)(factory.post('/'))
+        cookie = response.cookies[settings.READ_AFTER_WRITE_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.READ_AFTER_WRITE_SECONDS)
+
+        factory.cookies[settings.READ_AFTER_WRITE_COOKIE] = '1'
+        self.assertEqual(ReplicaPinningMiddleware(reader)(factory.get('/')).content, b'default')
+
+
+class ReadAfterWriteTests(TestCase):
+    def test_cancel_sets_primary_cookie(self):
+        user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        equip = Equipment.objects.create(name='Projector', quantity_total=1)
+        start = timezone.now() + timedelta(days=1)
+        req = Request.objects.create(user=user, equipment=equip, start_dt=start,
+                                     end_dt=start + timedelta(hours=1))
+        self.client.force_login(user)
+        response = self.client.get(reverse('EquipSense:equip_list'))
+        self.assertNotIn(settings.READ_AFTER_WRITE_COOKIE, response.cookies)
+        response = self.client.post(reverse('EquipSense:cancel_request', args=[req.pk]))
+        self.assertIn(settings.READ_AFTER_WRITE_COOKIE, response.cookies)
+
+
+class QueryAuditTests(TestCase):
+    def test_suggest_index_equality_sort_range(self):
+        sql = ('SELECT * FROM "EquipSense_request" WHERE ("EquipSense_request"."status" = %s '
+               'AND "EquipSense_request"."user_id" = %s AND "EquipSense_request"."end_dt" > %s) '
+               'ORDER BY "EquipSense_request"."start_dt" DESC')
+        model, fields = queryplan.suggest_index(sql, 'EquipSense_request')
+        self.assertIs(model, Request)
+        # Статус (choices) – после пользователя, диапазон – последним
+        self.assertEqual(fields, ['user', 'status', '-start_dt', 'end_dt'])
+
+    def test_existing_index_not_suggested(self):
+        sql = ('SELECT * FROM "EquipSense_request" WHERE "EquipSense_request"."status" = %s '
+               'ORDER BY "EquipSense_request"."created_at" DESC')
+        self.assertIsNone(queryplan.suggest_index(sql, 'EquipSense_request'))
+        self.assertIsNone(queryplan.suggest_index(sql, 'django_session'))
+
+    def test_sqlite_findings(self):
+        details = ['SCAN EquipSense_request',
+                   'SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)',
+                   'SCAN EquipSense_request USING INDEX request_created_idx',
+                   'USE TEMP B-TREE FOR ORDER BY']
+        _, findings = queryplan._sqlite_findings(details)
+        self.assertEqual([(f.kind, f.table) for f in findings],
+                         [('scan', 'EquipSense_request'), ('sort', None)])
+
+    def test_audit_command(self):
+        call_command('seed_benchmark_data', users=5, categories=2, tags=3,
+                     equipment=20, requests=100, seed=1, stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('audit_queries', only=['pending_requests', 'api_requests'],
+                     min_rows=0, repeat=1, plans=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('[pending_requests]', output)
+        self.assertIn('[api_requests]', output)
+        self.assertNotIn('[equip_list]', output)
+        self.assertIn('plan: ', output)
+        self.assertIn('Помечено:', output)
+
+
+class RequestLifecycleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cls.equip = Equipment.objects.create(name='Projector', quantity_total=5)
+        now = timezone.now()
+
+        def make(status, start, hours):
+            return Request.objects.create(user=cls.user, equipment=cls.equip, status=status,
+                                          start_dt=now + timedelta(hours=start),
+                                          end_dt=now + timedelta(hours=start + hours))
+
+        cls.started = make(Request.Status.APPROVED, -1, 2)
+        cls.missed = make(Request.Status.APPROVED, -5, 2)     # и начало, и конец в прошлом
+        cls.future = make(Request.Status.APPROVED, 3, 2)
+        cls.late = make(Request.Status.IN_USE, -4, 1)
+        cls.pending = make(Request.Status.PENDING, -2, 1)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_command_applies_transitions_in_batches(self):
+        out = io.StringIO()
+        call_command('advance_requests', batch_size=1, stdout=out)
+        self.assertIn('Выдано: 2, просрочено: 2', out.getvalue())
+
+        status = dict(Request.objects.values_list('pk', 'status'))
+        self.assertEqual(status[self.started.pk], Request.Status.IN_USE)
+        self.assertEqual(status[self.missed.pk], Request.Status.IN_USE)
+        self.assertEqual(status[self.future.pk], Request.Status.APPROVED)
+        self.assertEqual(status[self.pending.pk], Request.Status.PENDING)
+        overdue = set(Request.objects.filter(overdue_at__isnull=False).values_list('pk', flat=True))
+        self.assertEqual(overdue, {self.missed.pk, self.late.pk})
+        self.assertEqual(counters.compute(), counters.get_many(list(counters.compute())))
+
+        job = ScheduledJob.objects.get(name='advance_requests')
+        self.assertEqual(job.last_stats, {'activated': 2, 'overdue': 2})
+        self.assertIsNotNone(job.last_duration_ms)
+        self.assertEqual(job.locked_by, '')
+
+        # Повторный запуск ничего не меняет
+        self.assertEqual(lifecycle.advance(), {'activated': 0, 'overdue': 0})
+
+    def test_transition_invalidates_caches(self):
+        version = timeline.versions([self.equip.pk])
+        lifecycle.activate_started()
+        self.assertNotEqual(timeline.versions([self.equip.pk]), version)
+
+    def test_skips_while_another_instance_holds_lock(self):
+        ScheduledJob.objects.create(name='advance_requests', locked_by='other',
+                                    locked_until=timezone.now() + timedelta(minutes=1))
+        out = io.StringIO()
+        call_command('advance_requests', stdout=out)
+        self.assertIn('Пропуск', out.getvalue())
+        self.assertEqual(Request.objects.get(pk=self.started.pk).status,
+                         Request.Status.APPROVED)
+
+        # Просроченная аренда (лидер упал) перехватывается
+        ScheduledJob.objects.filter(name='advance_requests').update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        call_command('advance_requests', stdout=io.StringIO())
+        self.assertEqual(Request.objects.get(pk=self.started.pk).status,
+                         Request.Status.IN_USE)
+
+    def test_in_use_request_listed_and_returnable(self):
+        lifecycle.advance()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('EquipSense:my_requests'))
+        self.assertEqual(len(response.context['requests']), 4)
+        self.assertContains(response, 'Просрочено')
+        self.client.get(reverse('EquipSense:return_request', args=[self.late.pk]))
+        self.assertEqual(Request.objects.get(pk=self.late.pk).status, Request.Status.RETURNED)
+
+
+class CountingBackend(LocmemBackend):
+    """locmem‑бэкенд, считающий открытые соединения; падает на адресах из ``fail_for``."""
+
+    def __init__(self, fail_for=(), **kwargs):
+        super().__init__(**kwargs)
+        self.fail_for = set(fail_for)
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def send_messages(self, messages):
+        if any(set(m.to) & self.fail_for for m in messages):
+            raise ConnectionError('SMTP down')
+        return super().send_messages(messages)
+
+
+class NotificationOutboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('mgr', 'mgr@test.com', 'pwd')
+        cls.manager.groups.add(Group.objects.create(name='manager'))
+        cls.alice = User.objects.create_user('alice', 'alice@test.com', 'pwd')
+        cls.bob = User.objects.create_user('bob', 'bob@test.com', 'pwd')
+        cls.equip = Equipment.objects.create(name='Projector', quantity_total=1)
+        start = timezone.now() + timedelta(days=1)
+        cls.requests = [
+            Request.objects.create(user=user, equipment=cls.equip,
+                                   start_dt=start + timedelta(hours=3 * i),
+                                   end_dt=start + timedelta(hours=3 * i + 1))
+            for i, user in enumerate([cls.alice, cls.alice, cls.bob])]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_status_change_enqueues_without_sending(self):
+        first, second, third = self.requests
+        self.client.force_login(self.manager)
+        self.client.post(reverse('EquipSense:approve_request', args=[first.pk]))
+        self.client.post(reverse('EquipSense:reject_request', args=[second.pk]))
+        self.assertEqual(Request.objects.get(pk=second.pk).status, Request.Status.REJECTED)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            sorted(Notification.objects.values_list('request_id', 'kind', 'user_id')),
+            [(first.pk, 'approved', self.alice.pk), (second.pk, 'rejected', self.alice.pk)])
+
+        # Повторное отклонение не проходит и уведомления не добавляет
+        self.client.post(reverse('EquipSense:reject_request', args=[second.pk]))
+        self.assertEqual(Notification.objects.count(), 2)
+
+        bulk_review({third.pk: 'approve'})
+        self.assertTrue(Notification.objects.filter(request=third, kind='approved').exists())
+
+    def test_review_page_goes_through_services(self):
+        first, second, third = self.requests
+        admin = User.objects.create_superuser('admin', 'admin@test.com', 'pwd')
+        self.client.force_login(admin)
+        url = reverse('EquipSense:request_review')
+        Request.objects.create(user=self.bob, equipment=self.equip, status=Request.Status.APPROVED,
+                               start_dt=third.start_dt, end_dt=third.end_dt + timedelta(hours=1))
+        response = self.client.post(url, {'action': 'approve', 'id': first.pk})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.client.post(url, {'action': 'reject', 'id': second.pk})
+        # Окно третьей заявки уже занято единственной единицей
+        self.client.post(url, {'action': 'approve', 'id': third.pk})
+        status = dict(Request.objects.values_list('pk', 'status'))
+        self.assertEqual([status[r.pk] for r in self.requests],
+                         [Request.Status.APPROVED, Request.Status.REJECTED, Request.Status.PENDING])
+        self.assertEqual(sorted(Notification.objects.values_list('request_id', 'kind')),
+                         [(first.pk, 'approved'), (second.pk, 'rejected')])
+
+    def test_overdue_flag_enqueues(self):
+        req = self.requests[0]
+        Request.objects.filter(pk=req.pk).update(
+            status=Request.Status.IN_USE, end_dt=timezone.now() - timedelta(hours=1))
+        counters.reconcile()
+        lifecycle.advance()
+        self.assertEqual(list(Notification.objects.values_list('request_id', 'kind')),
+                         [(req.pk, 'overdue')])
+
+    def test_drain_coalesces_per_user_over_one_connection(self):
+        for req in self.requests:
+            outbox.enqueue(Notification.Kind.APPROVED, [req])
+        backend = CountingBackend()
+        stats = outbox.drain(batch_size=2, connection=backend)
+        self.assertEqual(stats, {'events': 3, 'messages': 2, 'failed': 0, 'skipped': 0})
+        self.assertEqual(backend.opened, 1)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         ['alice@test.com', 'bob@test.com'])
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+        # Повторный прогон ничего не шлёт
+        self.assertEqual(outbox.drain(connection=backend)['events'], 0)
+
+    @override_settings(TIME_ZONE='Asia/Novosibirsk')
+    def test_message_shows_local_time(self):
+        req = self.requests[0]
+        req.start_dt = datetime(2025, 3, 10, 5, 0, tzinfo=dt_timezone.utc)
+        req.end_dt = datetime(2025, 3, 10, 18, 30, tzinfo=dt_timezone.utc)
+        note = Notification(user=self.alice, request=req, kind=Notification.Kind.APPROVED)
+        message = outbox.compose(self.alice, [note])
+        self.assertIn('10.03.2025 12:00 – 11.03.2025 01:30', message.body)
+
+    def test_failed_delivery_retried_with_backoff(self):
+        outbox.enqueue(Notification.Kind.REJECTED, self.requests)
+        stats = outbox.drain(connection=CountingBackend(fail_for=['bob@test.com']))
+        self.assertEqual((stats['messages'], stats['failed']), (1, 1))
+        self.assertIn('(2)', mail.outbox[0].subject)
+
+        failed = Notification.objects.get(user=self.bob)
+        self.assertEqual(failed.attempts, 1)
+        self.assertIn('SMTP down', failed.last_error)
+        self.assertGreater(failed.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.retry_delay(2), 2 * outbox.retry_delay(1))
+        self.assertEqual(outbox.drain(connection=CountingBackend())['events'], 0)
+
+        Notification.objects.filter(pk=failed.pk).update(next_attempt_at=timezone.now())
+        out = io.StringIO()
+        call_command('send_notifications', stdout=out)
+        self.assertIn('писем: 1', out.getvalue())
+        self.assertEqual(mail.outbox[-1].to, ['bob@test.com'])
+
+
+class FreeSlotSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usr', 'usr@test.com', 'pwd')
+        cameras = Category.objects.create(name='Cameras')
+        cls.equip = Equipment.objects.create(name='Camera A', quantity_total=1, category=cameras)
+        cls.spare = Equipment.objects.create(name='Camera B', quantity_total=2, category=cameras)
+        cls.busy = Equipment.objects.create(name='Camera C', quantity_total=1, category=cameras)
+        Equipment.objects.create(name='Camera D', quantity_total=1, category=cameras,
+                                 status='maintenance')
+        Equipment.objects.create(name='Tripod', quantity_total=5)
+
+        cls.day = (timezone.now() + timedelta(days=2)).replace(hour=0, minute=0, second=0,
+                                                               microsecond=0)
+        for equip in (cls.equip, cls.busy):
+            Request.objects.create(user=cls.user, equipment=equip, status=Request.Status.APPROVED,
+                                   start_dt=cls.day + timedelta(hours=10),
+                                   end_dt=cls.day + timedelta(hours=12))
+
+    def at(self, hour):
+        return self.day + timedelta(hours=hour)
+
+    def test_free_stretches(self):
+        t = self.at
+        intervals = [(t(1), t(3), 1), (t(2), t(4), 1), (t(6), t(7), 2)]
+        self.assertEqual(free_stretches(intervals, 1, t(0), t(8)),
+                         [(t(0), t(2)), (t(3), t(6)), (t(7), t(8))])
+        self.assertEqual(free_stretches(intervals, 0, t(0), t(8)),
+                         [(t(0), t(1)), (t(4), t(6)), (t(7), t(8))])
+
+    def test_nearest_windows_on_both_sides(self):
+        t = self.at
+        with self.assertNumQueries(1):
+            windows = nearest_free_windows(self.equip, 1, t(10.5), t(11.5))
+        self.assertEqual(windows, [(t(9), t(10)), (t(12), t(13)), (t(8), t(9))])
+        self.assertEqual(nearest_free_windows(self.equip, 2, t(10.5), t(11.5)), [])
+
+    def test_alternatives_in_same_category(self):
+        t = self.at
+        with self.assertNumQueries(2):
+            alternatives = free_alternatives(self.equip, 1, t(10.5), t(11.5))
+        self.assertEqual(alternatives, [(self.spare, 2)])
+
+    def test_rejected_form_offers_suggestions(self):
+        t = self.at
+        url = reverse('EquipSense:equip_detail', args=[self.equip.pk])
+        self.client.force_login(self.user)
+        response = self.client.post(url, {
+            'equipment': self.equip.pk, 'quantity': 1,
+            'start_dt': t(10.5).strftime('%Y-%m-%dT%H:%M'),
+            'end_dt': t(11.5).strftime('%Y-%m-%dT%H:%M')})
+        suggestions = response.context['form'].suggestions
+        self.assertEqual(suggestions['windows'][0], (t(9), t(10)))
+        self.assertContains(response, 'Ближайшее свободное время')
+        self.assertContains(response, 'Camera B')
+        self.assertContains(response, t(9).strftime('%Y-%m-%dT%H:%M'))
+
+        # Предложенное окно проходит
+        self.client.post(url, {
+            'equipment': self.equip.pk, 'quantity': 1,
+            'start_dt': t(9).strftime('%Y-%m-%dT%H:%M'),
+            'end_dt': t(10).strftime('%Y-%m-%dT%H:%M')})
+        self.assertTrue(Request.objects.filter(equipment=self.equip, start_dt=t(9)).exists())
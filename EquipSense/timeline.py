@@ -0,0 +1,106 @@
+# equipment/timeline.py
+"""
+Шкала занятости оборудования по времени.
+
+Диапазон режется на недельные корзины; занятость каждой пары
+(оборудование, корзина) кэшируется. Промахи кэша добираются одним
+запросом за весь диапазон недостающих корзин (IN по оборудованию плюс
+одно условие на время, см. availability.booked_in_range): условие с OR
+на каждую корзину на шкале категории за год упирается в предел глубины
+выражения SQLite. Заявки раскладываются по корзинам в Python, корзины –
+на отрезки заметающей прямой.
+
+Версия кэша оборудования берётся из БД, а не хранится в кэше: число его
+заявок и MAX(updated_at) – один сгруппированный запрос по индексу
+(equipment, updated_at). Любое изменение заявки (в том числе UPDATE в
+обход сигналов, которые сами ставят updated_at) сдвигает максимум, удаление
+уменьшает число, так что старые корзины перестают читаться во всех
+процессах сразу. Версия, хранимая в кэше и сбрасываемая сигналом, при
+локальном кэше каждого воркера (caching.py) сбрасывалась бы только в одном
+из них, а остальные сутки показывали бы старую занятость.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .availability import booked_in_range, merge_segment, occupancy_segments
+from .models import Request
+
+BUCKET = timedelta(days=7)
+CACHE_TIMEOUT = 60 * 60 * 24
+# Понедельник – граница корзин
+_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _bucket_key(equipment_id, version, bucket_start):
+    return f'equipsense:timeline:{equipment_id}:{version}:{bucket_start.isoformat()}'
+
+
+def _buckets(start, end):
+    first = _EPOCH + ((start - _EPOCH) // BUCKET) * BUCKET
+    while first < end:
+        yield first
+        first += BUCKET
+
+
+def versions(equipment_ids):
+    """{equipment_id: версия} одним запросом к БД."""
+    equipment_ids = list(equipment_ids)
+    rows = (Request.objects.filter(equipment_id__in=equipment_ids).order_by()
+            .values('equipment_id').annotate(n=Count('pk'), changed=Max('updated_at'))
+            .values_list('equipment_id', 'n', 'changed'))
+    result = dict.fromkeys(equipment_ids, '0')
+    for equipment_id, n, changed in rows:
+        result[equipment_id] = f'{n}.{changed.timestamp():.6f}'
+    return result
+
+
+def _split(rows, buckets, start, end):
+    """
+    Разложить интервалы ``rows`` ({equipment_id: [(начало, конец, единиц)]})
+    по корзинам ``buckets`` ((equipment_id, начало корзины)) внутри
+    [start, end). Результат – {(equipment_id, корзина): [интервалы]}.
+    """
+    wanted = set(buckets)
+    by_bucket = defaultdict(list)
+    for pk, intervals in rows.items():
+        for interval in intervals:
+            for bucket in _buckets(max(interval[0], start), min(interval[1], end)):
+                if (pk, bucket) in wanted:
+                    by_bucket[pk, bucket].append(interval)
+    return by_bucket
+
+
+def occupancy(equipment_ids, start, end):
+    """
+    {equipment_id: [(начало, конец, единиц), ...]} на окне [start, end).
+    """
+    equipment_ids = list(equipment_ids)
+    current = versions(equipment_ids)
+    keys = {}
+    for pk in equipment_ids:
+        for bucket in _buckets(start, end):
+            keys[_bucket_key(pk, current[pk], bucket)] = (pk, bucket)
+
+    cached = cache.get_many(list(keys))
+    missing = {key: window for key, window in keys.items() if key not in cached}
+    if missing:
+        buckets = missing.values()
+        range_start = min(bucket for _, bucket in buckets)
+        range_end = max(bucket for _, bucket in buckets) + BUCKET
+        rows = booked_in_range({pk for pk, _ in buckets}, range_start, range_end)
+        by_bucket = _split(rows, buckets, range_start, range_end)
+        fresh = {key: occupancy_segments(by_bucket[window], window[1], window[1] + BUCKET)
+                 for key, window in missing.items()}
+        cache.set_many(fresh, CACHE_TIMEOUT)
+        cached.update(fresh)
+
+    result = {pk: [] for pk in equipment_ids}
+    for key, (pk, _) in sorted(keys.items(), key=lambda item: item[1]):
+        for seg_start, seg_end, units in cached[key]:
+            seg_start, seg_end = max(seg_start, start), min(seg_end, end)
+            if seg_start < seg_end:
+                merge_segment(result[pk], (seg_start, seg_end, units))
+    return result
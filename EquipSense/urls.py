@@ -1,32 +1,63 @@
 # equipment/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
 from .views import EquipmentCreateView, EquipmentUpdateView
 
 app_name = 'EquipSense'
 
+# Под ASGI читающие страницы обслуживают async‑версии (см. async_views.py);
+# под WSGI модуль не импортируется
+read_views = views
+if settings.EQUIPSENSE_ASYNC_VIEWS:
+    from . import async_views as read_views
+
 urlpatterns = [
     # ----------------------------------------------------
     #   Список и карточки оборудования
     # ----------------------------------------------------
-    path('',                 views.equip_list,          name='equip_list'),
-    path('e/<int:pk>/',      views.equip_detail,        name='equip_detail'),
+    path('',                 read_views.equip_list,     name='equip_list'),
+    path('e/<int:pk>/',      read_views.equip_detail,   name='equip_detail'),
 
     # CRUD‑операции над оборудованием (только для заведующего)
     path('e/<int:pk>/edit/', EquipmentUpdateView.as_view(), name='equip_update'),
     path('equipments/create/', EquipmentCreateView.as_view(), name='equip_create'),
+    path('equipments/import/', views.equip_import,    name='equip_import'),
     path('e/<int:pk>/delete/', views.equip_delete,    name='equip_delete'),
 
+    # Шкала занятости (JSON): ?from=YYYY-MM-DD&to=YYYY-MM-DD
+    path('e/<int:pk>/timeline/',        views.equip_timeline,    name='equip_timeline'),
+    path('category/<int:pk>/timeline/', views.category_timeline, name='category_timeline'),
+
     # ----------------------------------------------------
     #   Заявки на выдачу оборудования
     # ----------------------------------------------------
     path('request/cancel/<int:pk>/',   views.cancel_request,  name='cancel_request'),
     path('requests/review/',           views.request_review,  name='request_review'),
+    path('requests/review/bulk/',      views.request_review_bulk, name='request_review_bulk'),
     path('request/<int:pk>/', views.request_detail, name='request_detail'),
     path('request/<int:pk>/approve/', views.approve_request, name='approve_request'),
     path('request/<int:pk>/reject/', views.reject_request, name='reject_request'),
     path('request/<int:pk>/return/', views.return_request, name='return_request'),
-    path('my-requests/', views.my_requests, name='my_requests'),
+    path('my-requests/', read_views.my_requests, name='my_requests'),
+
+    # JSON API (см. api.py)
+    path('api/equipment/',           api.equipment_collection, name='api_equipment_list'),
+    path('api/equipment/<int:pk>/',  api.equipment_item,       name='api_equipment_detail'),
+    path('api/categories/',          api.category_collection,  name='api_category_list'),
+    path('api/categories/<int:pk>/', api.category_item,        name='api_category_detail'),
+    path('api/tags/',                api.tag_collection,       name='api_tag_list'),
+    path('api/tags/<int:pk>/',       api.tag_item,             name='api_tag_detail'),
+    path('api/requests/',            api.request_collection,   name='api_request_list'),
+    path('api/requests/<int:pk>/',   api.request_item,         name='api_request_detail'),
+
+    # Очередь обслуживания и гарантия: ?days=N
+    path('maintenance/',      views.maintenance_queue, name='maintenance_queue'),
+    path('warranty/',         views.warranty_report,   name='warranty_report'),
+
+    # Потоковые выгрузки (CSV/JSON)
+    path('export/requests/',  views.requests_export,  name='requests_export'),
+    path('export/equipment/', views.equipment_export, name='equipment_export'),
 
 
     # ----------------------------------------------------
@@ -39,7 +70,8 @@ urlpatterns = [
 
     path('pending-requests/', views.PendingRequestsListView.as_view(), name='pending_requests'),
 
-    path('dashboard/employee/', views.employee_dashboard, name='employee_dashboard'),
-    path('dashboard/manager/',  views.manager_dashboard,   name='manager_dashboard'),
-    path('dashboard/admin/',    views.admin_dashboard,     name='admin_dashboard'),
+    path('dashboard/employee/', read_views.employee_dashboard, name='employee_dashboard'),
+    path('dashboard/manager/',  read_views.manager_dashboard,  name='manager_dashboard'),
+    path('dashboard/admin/',    read_views.admin_dashboard,    name='admin_dashboard'),
+    path('metrics/db/',         views.db_metrics,              name='db_metrics'),
 ]
@@ -1,4 +1,9 @@
 # equipment/views.py
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+
 from django.contrib.auth import login
 from django.contrib.auth.models import User, Group
 from django.shortcuts import render, get_object_or_404, redirect
@@ -6,9 +11,24 @@ from django.contrib.auth.decorators import login_required, permission_required,
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView
 from django.contrib import messages
-
-from .models import Equipment, Request
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import FloatField
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_cookie
+
+from . import conditional, counters, db, fragments, search, timeline
+from .models import Category, Equipment, Request
 from .forms import RequestForm, ManagerCreationForm, EditUserForm, EquipmentCreateUpdateForm, RegistrationForm
+from .export import export_equipment, export_requests
+from .importer import detect_format, import_equipment, iter_rows
+from .pagination import InvalidCursor, KeysetPaginator
+from .roles import in_group
+from .services import (ReservationConflict, approve_reservation, bulk_review, create_reservation,
+                       reject_reservation)
 
 
 class PendingRequestsListView(ListView):
@@ -33,10 +53,12 @@ class UserListView(ListView):
 @login_required
 @permission_required('auth.view_user')
 def admin_dashboard(request):
-    # --- данные для карточек
-    equipment_count = Equipment.objects.count()
-    user_count = User.objects.count()
-    pending_requests_count = Request.objects.filter(status='pending').count()
+    # --- данные для карточек (предвычисленные счётчики, см. counters.py)
+    values = counters.get_many([counters.EQUIPMENT, counters.USERS,
+                                counters.request_key(Request.Status.PENDING)])
+    equipment_count = values[counters.EQUIPMENT]
+    user_count = values[counters.USERS]
+    pending_requests_count = values[counters.request_key(Request.Status.PENDING)]
 
     # --- список менеджеров (люди, которые находятся в группе 'manager')
     try:
@@ -54,16 +76,24 @@ def admin_dashboard(request):
     return render(request, 'equipment/admin_dashboard.html', context)
 
 
+@login_required
+@permission_required('auth.view_user')
+def db_metrics(request):
+    """Соединения с БД этого процесса: переиспользование, время соединения, пул."""
+    return JsonResponse(db.snapshot())
+
+
 @login_required
 def manager_dashboard(request):
     user = request.user
 
     # Добавляем список заявок, чтобы отдать его в шаблон
-    pending_requests = Request.objects.filter(status='P')
-    approved_requests = Request.objects.filter(status='A')
+    pending_requests = Request.objects.filter(status='P').select_related('user', 'equipment')
 
-    pending_count = pending_requests.count()
-    approved_count = approved_requests.count()
+    values = counters.get_many([counters.request_key(Request.Status.PENDING),
+                                counters.request_key(Request.Status.APPROVED)])
+    pending_count = values[counters.request_key(Request.Status.PENDING)]
+    approved_count = values[counters.request_key(Request.Status.APPROVED)]
 
     return render(request,
                   'equipment/manager_dashboard.html',
@@ -79,23 +109,23 @@ def manager_dashboard(request):
 def my_requests(request):
     """
     Страница «Мои одобренные запросы».
-    Показываем только те заявки, которые были приняты и принадлежат текущему пользователю.
+    Показываем заявки текущего пользователя, которые приняты или уже выданы.
     """
     approved = Request.objects.filter(
         user=request.user,
-        status='A',
+        status__in=[Request.Status.APPROVED, Request.Status.IN_USE],
     ).select_related('equipment', 'user')
     return render(request, 'equipment/my_requests.html', {'requests': approved})
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='employee').exists())
+@user_passes_test(lambda u: in_group(u, 'employee'))
 def employee_dashboard(request):
     return render(request, 'equipment/employee_dashboard.html')
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='manager').exists())
+@user_passes_test(lambda u: in_group(u, 'manager'))
 def request_detail(request, pk):
     """Показать детальную информацию о заявке."""
     req = get_object_or_404(Request, pk=pk)
@@ -106,25 +136,81 @@ def request_detail(request, pk):
 
 
 # ---------- Обычные пользователи ----------
+EQUIP_LIST_ORDERING = ('name', 'quantity_total', 'purchase_date')
+EQUIP_LIST_PAGE_SIZE = 24
+IMPORT_ERRORS_SHOWN = 100
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=conditional.catalogue_etag,
+           last_modified_func=conditional.catalogue_last_modified)
 def equip_list(request):
-    """Список оборудования"""
-    equipments = Equipment.objects.all()
-    return render(request, 'equipment/equip_list.html', {'equipments': equipments})
+    """Список оборудования с поиском, сортировкой и keyset‑пагинацией"""
+    paginator = equip_list_paginator(request)
+    page = _keyset_page(request, paginator)
+    cards = fragments.equipment_cards(page.object_list)
+    return render(request, 'equipment/equip_list.html', equip_list_context(page, cards))
+
+
+def equip_list_paginator(request):
+    """Пагинатор списка оборудования по GET‑параметрам (общий с async_views)."""
+    # Теги нужны только для карточек, которых нет в кэше фрагментов
+    equipments = Equipment.objects.with_availability().prefetch_related(None)
+
+    query = request.GET.get('search', '').strip()
+    ordering = request.GET.get('ordering')
+    if query and not ordering:
+        # Поиск без явной сортировки – по релевантности
+        equipments = search.rank_queryset(equipments, query)
+        return KeysetPaginator(equipments, '-search_rank', EQUIP_LIST_PAGE_SIZE,
+                               field=FloatField())
+    if query:
+        equipments = search.filter_queryset(equipments, query)
+
+    # Сортируем только по разрешённым полям, остальное – по названию
+    ordering = ordering or 'name'
+    if ordering.lstrip('-') not in EQUIP_LIST_ORDERING:
+        ordering = 'name'
+    return KeysetPaginator(equipments, ordering, EQUIP_LIST_PAGE_SIZE)
+
+
+def equip_list_context(page, cards):
+    return {
+        'equipments': page.object_list,
+        'cards': [(e, cards[e.pk]) for e in page.object_list],
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+    }
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=conditional.equipment_etag,
+           last_modified_func=conditional.equipment_last_modified)
 def equip_detail(request, pk):
-    equipment = get_object_or_404(Equipment, pk=pk)
+    equipment = get_object_or_404(Equipment.objects.with_availability().prefetch_related(None),
+                                  pk=pk)
     # Форма заявки
     if request.method == 'POST':
         form = RequestForm(request.POST)
         if form.is_valid():
-            req = form.save(commit=False)
-            req.user = request.user
-            req.status = Request.Status.PENDING
-            req.save()
-            return redirect('EquipSense:equip_detail', pk=pk)
+            data = form.cleaned_data
+            try:
+                # Повторная проверка и вставка – атомарно, под блокировкой
+                create_reservation(request.user, data['equipment'], data['quantity'],
+                                   data['start_dt'], data['end_dt'], data.get('comment'))
+            except ValidationError as e:
+                # Окно заняли между проверкой формы и вставкой
+                form.add_error(None, e)
+                form.suggest(data['equipment'], data['quantity'],
+                             data['start_dt'], data['end_dt'])
+            except ReservationConflict:
+                messages.error(request, 'Сервер занят, попробуйте отправить заявку ещё раз.')
+            else:
+                return redirect('EquipSense:equip_detail', pk=pk)
     else:
         form = RequestForm(initial={'equipment': equipment})
     # История заявок пользователя к этому оборудованию
@@ -132,6 +218,7 @@ def equip_detail(request, pk):
                                            equipment=equipment).order_by('-created_at')
     return render(request, 'equipment/equip_detail.html',
                   {'equipment': equipment,
+                   'panel': fragments.equipment_panel(equipment),
                    'form': form,
                    'user_requests': user_requests})
 
@@ -147,7 +234,8 @@ def cancel_request(request, pk):
 @login_required
 def return_request(request, pk):
     req = get_object_or_404(Request, pk=pk, user=request.user)
-    if req.status == Request.Status.APPROVED:
+    # После начала окна advance_requests переводит заявку в IN_USE
+    if req.status in (Request.Status.APPROVED, Request.Status.IN_USE):
         req.status = Request.Status.RETURNED
         req.save()
     return redirect('EquipSense:equip_detail', pk=req.equipment.pk)
@@ -158,30 +246,34 @@ def return_request(request, pk):
 def approve_request(request, pk):
     req = get_object_or_404(Request, pk=pk)
 
-    # Можно добавить проверку на существование свободного оборудования,
-    # но пока просто меняем статус.
-    if req.status == 'P':
-        req.status = 'A'
-        req.save()
-        messages.success(request, f'Request #{req.pk} approved.')
+    # Статус меняется только если на окне заявки хватает оборудования
+    try:
+        approve_reservation(req.pk)
+    except ValidationError as e:
+        messages.warning(request, e.messages[0])
+    except ReservationConflict:
+        messages.error(request, 'Сервер занят, попробуйте ещё раз.')
     else:
-        messages.warning(request, 'Only pending requests can be approved.')
+        messages.success(request, f'Request #{req.pk} approved.')
 
     return redirect('EquipSense:request_detail', pk=pk)
 
 
 @login_required
-@user_passes_test(lambda u: u.groups.filter(name='manager').exists() or u.groups.filter(name='administrator').exists())
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
 def reject_request(request, pk):
 
     req = get_object_or_404(Request, pk=pk)
 
-    if req.status == 'P':
-        req.status = 'R'
-        req.save()
-        messages.success(request, f'Request #{req.pk} rejected.')
+    # Статус и уведомление пользователю пишутся одной транзакцией
+    try:
+        reject_reservation(req.pk)
+    except ValidationError as e:
+        messages.warning(request, e.messages[0])
+    except ReservationConflict:
+        messages.error(request, 'Сервер занят, попробуйте ещё раз.')
     else:
-        messages.warning(request, 'Only pending requests can be rejected.')
+        messages.success(request, f'Request #{req.pk} rejected.')
 
     return redirect('EquipSense:request_detail', pk=pk)
 
@@ -209,6 +301,29 @@ class EquipmentUpdateView(UpdateView):
         return ['equipment.change_equipment']
 
 
+@login_required
+@permission_required('EquipSense.add_equipment', raise_exception=True)
+def equip_import(request):
+    """Загрузка CSV/JSONL с оборудованием (потоковый импорт пачками)."""
+    context = {}
+    if request.method == 'POST' and request.FILES.get('file'):
+        upload = request.FILES['file']
+        errors = []
+
+        def on_error(line_no, message):
+            if len(errors) < IMPORT_ERRORS_SHOWN:
+                errors.append((line_no, message))
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            context['stats'] = import_equipment(
+                iter_rows(stream, detect_format(upload.name)), on_error=on_error)
+        except (UnicodeDecodeError, csv.Error) as e:
+            context['read_error'] = str(e)
+        context['errors'] = errors
+    return render(request, 'equipment/equip_import.html', context)
+
+
 @login_required
 @permission_required('equipment.delete_equipment')
 def equip_delete(request, pk):
@@ -233,16 +348,192 @@ def request_review(request):
         action = request.POST.get('action')
         req_id = request.POST.get('id')
         req = get_object_or_404(Request, pk=req_id)
-        if action == 'approve' and req.status == Request.Status.PENDING:
-            req.status = Request.Status.APPROVED
-            req.save()
-        elif action == 'reject' and req.status == Request.Status.PENDING:
-            req.status = Request.Status.REJECTED
-            req.save()
-        return redirect('request_review')
+        # Как approve_request/reject_request: проверка свободного количества
+        # под блокировкой и уведомление в outbox той же транзакцией
+        decide = {'approve': (approve_reservation, 'approved'),
+                  'reject': (reject_reservation, 'rejected')}.get(action)
+        if decide:
+            service, verb = decide
+            try:
+                service(req.pk)
+            except ValidationError as e:
+                messages.warning(request, e.messages[0])
+            except ReservationConflict:
+                messages.error(request, 'Сервер занят, попробуйте ещё раз.')
+            else:
+                messages.success(request, f'Request #{req.pk} {verb}.')
+        return redirect('EquipSense:request_review')
     return render(request, 'equipment/request_review.html', {'requests': pending})
 
 
+@login_required
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
+@require_POST
+def request_review_bulk(request):
+    """
+    Массовое рассмотрение заявок.
+    Тело запроса – JSON: {"items": [{"id": 12, "action": "approve"}, ...]}.
+    Ответ – результат по каждой заявке: {"results": {"12": "approved", ...}}.
+    """
+    try:
+        items = json.loads(request.body)['items']
+        decisions = {int(item['id']): item['action'] for item in items}
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Ожидается {"items": [{"id": ..., "action": ...}]}'},
+                            status=400)
+    try:
+        results = bulk_review(decisions)
+    except ReservationConflict:
+        return JsonResponse({'error': 'Сервер занят, попробуйте ещё раз.'}, status=409)
+    return JsonResponse({'results': {str(pk): result for pk, result in results.items()}})
+
+
+TIMELINE_MAX_DAYS = 366
+
+
+def _timeline_response(request, equipments):
+    """JSON со шкалой занятости для ``equipments`` на окне ?from=&to= (даты)."""
+    try:
+        start = date.fromisoformat(request.GET['from'])
+        end = date.fromisoformat(request.GET['to'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Укажите from и to в формате YYYY-MM-DD')
+    if not 0 < (end - start).days <= TIMELINE_MAX_DAYS:
+        return HttpResponseBadRequest(f'Диапазон – от 1 до {TIMELINE_MAX_DAYS} дней')
+
+    tz = timezone.get_current_timezone()
+    window_start = datetime.combine(start, time.min, tzinfo=tz)
+    window_end = datetime.combine(end, time.min, tzinfo=tz)
+    equipments = list(equipments)
+    segments = timeline.occupancy([e.pk for e in equipments], window_start, window_end)
+    return JsonResponse({
+        'from': window_start.isoformat(),
+        'to': window_end.isoformat(),
+        'equipment': [
+            {'id': e.pk, 'name': e.name, 'quantity_total': e.quantity_total,
+             'segments': [{'start': s.isoformat(), 'end': f.isoformat(), 'units': units}
+                          for s, f, units in segments[e.pk]]}
+            for e in equipments
+        ],
+    })
+
+
+@login_required
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
+def equip_timeline(request, pk):
+    """Шкала занятости одного оборудования."""
+    equipment = get_object_or_404(Equipment.objects.only('pk', 'name', 'quantity_total'), pk=pk)
+    return _timeline_response(request, [equipment])
+
+
+@login_required
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
+def category_timeline(request, pk):
+    """Шкала занятости всего оборудования категории."""
+    category = get_object_or_404(Category, pk=pk)
+    return _timeline_response(
+        request, category.equipments.order_by('name').only('pk', 'name', 'quantity_total'))
+
+
+MAINTENANCE_PAGE_SIZE = 50
+MAINTENANCE_DEFAULT_DAYS = 14
+WARRANTY_DEFAULT_DAYS = 30
+REPORT_MAX_DAYS = 366
+
+
+def _horizon_days(request, default):
+    """Горизонт отчёта ?days=N (1..REPORT_MAX_DAYS), иначе ``default``."""
+    try:
+        days = int(request.GET.get('days', default))
+    except ValueError:
+        return default
+    return min(max(days, 1), REPORT_MAX_DAYS)
+
+
+def _keyset_page(request, paginator):
+    try:
+        return paginator.page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+@login_required
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
+def maintenance_queue(request):
+    """Плановое обслуживание на ближайшие N дней (включая просроченное) по всем складам."""
+    days = _horizon_days(request, MAINTENANCE_DEFAULT_DAYS)
+    today = timezone.localdate()
+    equipments = (Equipment.objects.maintenance_due(today + timedelta(days=days))
+                  .select_related('category'))
+    page = _keyset_page(request, KeysetPaginator(equipments, 'next_maintenance_due',
+                                                 MAINTENANCE_PAGE_SIZE))
+    return render(request, 'equipment/maintenance_queue.html', {
+        'equipments': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'days': days,
+        'today': today,
+    })
+
+
+@login_required
+@user_passes_test(lambda u: in_group(u, 'manager', 'administrator'))
+def warranty_report(request):
+    """Оборудование, гарантия которого истекает в ближайшие N дней."""
+    days = _horizon_days(request, WARRANTY_DEFAULT_DAYS)
+    today = timezone.localdate()
+    equipments = (Equipment.objects.warranty_expiring(today, today + timedelta(days=days))
+                  .select_related('category'))
+    page = _keyset_page(request, KeysetPaginator(equipments, 'warranty_expiry',
+                                                 MAINTENANCE_PAGE_SIZE))
+    return render(request, 'equipment/warranty_report.html', {
+        'equipments': page.object_list,
+        'page_obj': page,
+        'is_paginated': page.has_other_pages(),
+        'days': days,
+    })
+
+
+# ---------- Выгрузки ----------
+@login_required
+@permission_required('EquipSense.view_request', raise_exception=True)
+def requests_export(request):
+    """
+    Потоковая выгрузка заявок. Фильтры (GET): status, equipment,
+    date_from/date_to (дата создания, YYYY-MM-DD), format=csv|json.
+    """
+    params = request.GET
+    queryset = Request.objects.all()
+    # Даты – границы суток в текущем часовом поясе: диапазон по created_at
+    # идёт по индексу, в отличие от created_at::date
+    tz = timezone.get_current_timezone()
+    try:
+        if params.get('status'):
+            queryset = queryset.filter(status__in=params.getlist('status'))
+        if params.get('equipment'):
+            queryset = queryset.filter(equipment_id=int(params['equipment']))
+        if params.get('date_from'):
+            day = date.fromisoformat(params['date_from'])
+            queryset = queryset.filter(created_at__gte=datetime.combine(day, time.min, tzinfo=tz))
+        if params.get('date_to'):
+            day = date.fromisoformat(params['date_to']) + timedelta(days=1)
+            queryset = queryset.filter(created_at__lt=datetime.combine(day, time.min, tzinfo=tz))
+    except ValueError:
+        return HttpResponseBadRequest('Неверный фильтр выгрузки')
+    return export_requests(queryset, params.get('format', 'csv'))
+
+
+@login_required
+@permission_required('EquipSense.view_equipment', raise_exception=True)
+def equipment_export(request):
+    """Потоковая выгрузка оборудования (формат совпадает с импортом)."""
+    queryset = Equipment.objects.all()
+    if request.GET.get('status'):
+        queryset = queryset.filter(status__in=request.GET.getlist('status'))
+    return export_equipment(queryset, request.GET.get('format', 'csv'))
+
+
 # ---------- Администратор ----------
 @login_required
 @permission_required('auth.add_user')
@@ -253,9 +544,11 @@ def create_manager(request):
     if request.method == "POST":
         form = ManagerCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()          # сохраняем пользователя
-            manager_group, _ = Group.objects.get_or_create(name='manager')
-            user.groups.add(manager_group)  # добавляем в группу
+            # Пользователь, его группа и счётчик пользователей – одной транзакцией
+            with transaction.atomic():
+                user = form.save()          # сохраняем пользователя
+                manager_group, _ = Group.objects.get_or_create(name='manager')
+                user.groups.add(manager_group)  # добавляем в группу
             return redirect("EquipSense:user_list")   # или куда хотите перейти
     else:
         form = ManagerCreationForm()
@@ -291,7 +584,8 @@ def delete_user(request, user_id):
     user_obj = get_object_or_404(User, pk=user_id)
 
     if request.method == "POST":
-        user_obj.delete()
+        with transaction.atomic():
+            user_obj.delete()
         return redirect("EquipSense:user_list")
 
     # Если GET – показать страницу подтверждения
@@ -303,9 +597,10 @@ def register(request):
     if request.method == "POST":
         form = RegistrationForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            group = Group.objects.get(name='employee')
-            user.groups.add(group)
+            with transaction.atomic():
+                user = form.save()
+                group = Group.objects.get(name='employee')
+                user.groups.add(group)
             login(request, user)
             return redirect("EquipSense:equip_list")  # замените на нужный вам url
     else:
@@ -0,0 +1,74 @@
+# equipment/warmup.py
+"""
+Прогрев процесса до первого запроса.
+
+Без прогрева первый пользователь после холодного старта платит за импорт
+urls.py со всеми представлениями, построение таблиц reverse() и компиляцию
+шаблонов. ``warm(templates)`` делает это заранее для шаблонов первых
+запросов: wsgi.py вызывает её при импорте приложения (EQUIPSENSE_WARMUP,
+EQUIPSENSE_WARMUP_TEMPLATES) – компилировать при старте все шаблоны значит
+удлинять холодный старт ради страниц, которые откроют позже, если вообще
+откроют. Команда ``warmup`` при сборке компилирует все шаблоны проекта,
+чтобы ошибки в шаблонах и маршрутах ломали сборку, а не первый запрос.
+
+Шаблоны попадают в кэширующий загрузчик (в Django ≥ 4.1 он включён и при
+DEBUG), поэтому скомпилированные шаблоны живут до конца процесса.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.template import engines
+from django.urls import get_resolver
+
+TEMPLATE_SUFFIXES = ('.html', '.txt')
+
+
+def _populate(resolver):
+    """Таблицы reverse() корневого резолвера и всех вложенных пространств имён."""
+    count = len(resolver.reverse_dict)
+    for _, namespaced in resolver.namespace_dict.values():
+        count += _populate(namespaced)
+    return count
+
+
+def _template_dirs(engine):
+    # Каталоги берутся у загрузчиков: при явном OPTIONS['loaders'] APP_DIRS выключен
+    loaders = getattr(getattr(engine, 'engine', None), 'template_loaders', None)
+    if loaders is None:
+        return engine.template_dirs
+    return [directory for loader in loaders for directory in loader.get_dirs()]
+
+
+def project_templates(engine):
+    """Имена шаблонов из каталогов проекта (шаблоны сторонних пакетов не трогаем)."""
+    root = os.path.realpath(settings.BASE_DIR)
+    for directory in _template_dirs(engine):
+        directory = os.path.realpath(directory)
+        if not directory.startswith(root + os.sep):
+            continue
+        for base, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(TEMPLATE_SUFFIXES):
+                    path = os.path.join(base, name)
+                    yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def warm(templates=None):
+    """
+    Построить маршруты, загрузить контекст‑процессоры и скомпилировать
+    шаблоны ``templates`` (None – все шаблоны проекта).
+    Возвращает {'routes', 'templates', 'ms'}.
+    """
+    started = time.perf_counter()
+    routes = _populate(get_resolver())
+    compiled = 0
+    for engine in engines.all():
+        # Контекст‑процессоры импортируются лениво при первом рендеринге
+        getattr(engine, 'engine', engine).template_context_processors
+        names = sorted(set(project_templates(engine))) if templates is None else templates
+        for name in names:
+            engine.get_template(name)
+            compiled += 1
+    return {'routes': routes, 'templates': compiled,
+            'ms': round((time.perf_counter() - started) * 1000, 1)}
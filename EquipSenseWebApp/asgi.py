@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EquipSenseWebApp.settings')
+# Читающие страницы – в async‑версиях (EquipSense/async_views.py)
+os.environ.setdefault('EQUIPSENSE_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
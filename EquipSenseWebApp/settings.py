@@ -11,10 +11,6 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
 from pathlib import Path
-from dotenv import load_dotenv
-
-import EquipSense.middleware
-from EquipSense import context_processors, middleware
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'EquipSense.middleware.QueryInstrumentationMiddleware',
+    'EquipSense.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,9 +56,34 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'EquipSenseWebApp.urls'
 
+# Права пользователя берутся из кэша ролей EquipSense (см. EquipSense/roles.py)
+AUTHENTICATION_BACKENDS = ['EquipSense.roles.CachedPermissionBackend']
+ROLE_CACHE_TIMEOUT = 60 * 60
+
+# Доля запросов, для которых считаются SQL/шаблоны (заголовок Server-Timing,
+# предупреждения о N+1 в логгере EquipSense.sql)
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('SQL_INSTRUMENTATION_SAMPLE_RATE', 0.05))
+SQL_N_PLUS_ONE_THRESHOLD = 5
+
+# Асинхронные версии читающих страниц (EquipSense/async_views.py);
+# asgi.py включает их по умолчанию
+EQUIPSENSE_ASYNC_VIEWS = os.getenv('EQUIPSENSE_ASYNC_VIEWS', '0') == '1'
+
+# Прогрев маршрутов и шаблонов при импорте wsgi.py (EquipSense/warmup.py);
+# включён в облегчённом профиле settings_lean.py. Прогреваются только шаблоны
+# первых запросов после холодного старта: / → /equipment/ → вход → список
+EQUIPSENSE_WARMUP = os.getenv('EQUIPSENSE_WARMUP', '0') == '1'
+EQUIPSENSE_WARMUP_TEMPLATES = [
+    'equipment/base.html',
+    'registration/login.html',
+    'equipment/equip_list.html',
+    'equipment/_equip_card.html',
+    'equipment/_keyset_pagination.html',
+]
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'EquipSense.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -79,22 +102,68 @@ WSGI_APPLICATION = 'EquipSenseWebApp.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
-load_dotenv()
+
+# .env нужен только локально; на сервере переменные задаёт окружение,
+# и python-dotenv при холодном старте не импортируется
+if any(p.exists() for p in (BASE_DIR / '.env', BASE_DIR / 'EquipSenseWebApp' / '.env')):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Соединения (EquipSense/db): по умолчанию постоянные, с проверкой перед
+# повторным использованием – запрос не платит за TCP+TLS+аутентификацию.
+# DB_POOL=1 включает пул psycopg (нужен psycopg[pool] 3.x вместо
+# psycopg2); при пуле CONN_MAX_AGE должен быть 0.
+DB_POOL = os.getenv('DB_POOL', '0') == '1'
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+}
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'EquipSense.db.postgresql',
         'NAME': os.getenv('PGDATABASE'),
         'USER': os.getenv('PGUSER'),
         'PASSWORD': os.getenv('PGPASSWORD'),
         'HOST': os.getenv('PGHOST'),
         'PORT': os.getenv('PGPORT', 5432),
-         'OPTIONS': {
-             'sslmode': 'require',
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'sslmode': 'require',
+            **({'pool': DB_POOL_OPTIONS} if DB_POOL else {}),
         }
     }
 }
 
+# Реплики для чтения (EquipSense/routers.py): PGREPLICA_HOSTS=host1,host2 –
+# те же база и учётные данные, другой хост. В тестах реплики зеркалят default.
+DATABASE_REPLICAS = []
+for _number, _host in enumerate(filter(None, os.getenv('PGREPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica{_number}'] = {**DATABASES['default'], 'HOST': _host.strip(),
+                                      'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{_number}')
+
+DATABASE_ROUTERS = ['EquipSense.routers.ReplicaRouter']
+
+# Кэш Django. По умолчанию у каждого процесса свой LocMemCache, и тогда
+# роли между запросами не кэшируются (EquipSense/caching.py):
+# сброс по сигналу дошёл бы только до одного процесса. Общий кэш, например
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# CACHE_LOCATION=redis://host:6379/0 (нужен пакет redis), включает это.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Сколько секунд после записи заявки пользователь читает только основную БД
+READ_AFTER_WRITE_SECONDS = int(os.getenv('READ_AFTER_WRITE_SECONDS', 15))
+READ_AFTER_WRITE_COOKIE = 'equipsense_primary'
 
 
 # Password validation
@@ -142,3 +211,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGOUT_REDIRECT_URL = 'login'
 LOGIN_REDIRECT_URL = '/'
+
+# Уведомления по заявкам (outbox.py, команда send_notifications).
+# По умолчанию письма печатаются в консоль; SMTP – EMAIL_BACKEND и EMAIL_*.
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '0') == '1'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'equipsense@localhost')
@@ -0,0 +1,42 @@
+"""
+Облегчённый профиль настроек для serverless‑развёртывания
+(vercel.json → wsgi.py), где холодный старт ждёт живой пользователь.
+
+Отличия от settings.py (замеры – ``manage.py profile_startup``):
+
+* админка остаётся; отключается только явно: EQUIPSENSE_ADMIN=0 (10–30 мс
+  холодного старта, но /admin/ перестаёт существовать);
+* без QueryInstrumentationMiddleware, пока SQL_INSTRUMENTATION_SAMPLE_RATE
+  равен нулю (по умолчанию здесь так и есть);
+* кэширующий загрузчик шаблонов задан явно, не зависит от DEBUG;
+* при импорте wsgi.py прогреваются маршруты и только шаблоны первых
+  запросов (EQUIPSENSE_WARMUP_TEMPLATES, см. EquipSense/warmup.py);
+  остальные компилируются по мере надобности, а все целиком проверяет
+  команда ``warmup`` при сборке.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+if os.getenv('EQUIPSENSE_ADMIN', '1') == '0':
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app != 'django.contrib.admin']
+
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.getenv('SQL_INSTRUMENTATION_SAMPLE_RATE', 0))
+if not SQL_INSTRUMENTATION_SAMPLE_RATE:
+    MIDDLEWARE = [m for m in MIDDLEWARE
+                  if m != 'EquipSense.middleware.QueryInstrumentationMiddleware']
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    },
+}]
+
+EQUIPSENSE_WARMUP = os.getenv('EQUIPSENSE_WARMUP', '1') == '1'
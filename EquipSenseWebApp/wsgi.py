@@ -7,11 +7,33 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
-from django.core.wsgi import get_wsgi_application
+# Холодный старт создаёт десятки тысяч долгоживущих объектов (модули,
+# классы, шаблоны), и сборщик мусора больше сотни раз обходит их впустую.
+# На время старта он выключен; после прогрева всё созданное переносится
+# в постоянное поколение (gc.freeze) и сборщик включается снова.
+# EQUIPSENSE_GC_FREEZE=0 – не трогать сборщик.
+FREEZE_GC = os.getenv('EQUIPSENSE_GC_FREEZE', '1') == '1'
+if FREEZE_GC:
+    gc.disable()
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EquipSenseWebApp.settings')
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+
+# Serverless‑развёртывание (vercel.json): облегчённый профиль, см. settings_lean.py
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EquipSenseWebApp.settings_lean')
 
 application = get_wsgi_application()
-app = application
\ No newline at end of file
+app = application
+
+from django.conf import settings  # noqa: E402
+
+if settings.EQUIPSENSE_WARMUP:
+    from EquipSense.warmup import warm
+
+    warm(settings.EQUIPSENSE_WARMUP_TEMPLATES)
+
+if FREEZE_GC:
+    gc.freeze()
+    gc.enable()
@@ -12,4 +12,8 @@ pip install -r requirements.txt
 # collect static files using the Python interpreter from venv
 python manage.py collectstatic --noinput
 
+# compile templates and build URL resolvers with the deployed settings profile;
+# a broken template or urls.py fails the build instead of the first request
+python manage.py warmup --settings=EquipSenseWebApp.settings_lean
+
 echo "BUILD END"
\ No newline at end of file